@@ -0,0 +1,95 @@
+"""Benchmark of the per-path overhead of IrodsPath.
+
+Creates child paths of a collection with joinpath and converts them to
+strings, as the transfer code does for every file, and compares this with the
+original IrodsPath, which recomputed the absolute path on every str and
+intercepted every attribute access. No iRODS server is needed.
+
+Usage (with ibridges installed): python benchmarks/bench_irodspath.py [n_paths]
+"""
+import sys
+import time
+from pathlib import PurePosixPath
+
+from ibridges import IrodsPath
+
+
+class MockSession:  # pylint: disable=too-few-public-methods
+    """Session with only the attributes IrodsPath needs."""
+    home = "/testZone/home/testuser"
+    irods_session = None
+
+
+class UncachedIrodsPath():
+    """The path operations of the original IrodsPath, without slots or caching."""
+
+    def __init__(self, session, *args):
+        self.session = session
+        assert hasattr(session, "irods_session")
+        args = [a._path if isinstance(a, UncachedIrodsPath) else a for a in args]
+        self._path = PurePosixPath(*args)
+
+    def absolute_path(self) -> str:
+        """Absolute path, computed from the parts on every call."""
+        if len(self._path.parts) == 0:
+            return self.session.home
+        if self._path.parts[0] == "~" or self._path.parts[0] == ".":
+            begin, end = self.session.home, self._path.parts[1:]
+        elif self._path.parts[0] == "/":
+            begin, end = "/", self._path.parts[1:]
+        else:
+            begin, end = self.session.home, self._path.parts
+        return str(PurePosixPath(begin, *end))
+
+    def __str__(self) -> str:
+        return self.absolute_path()
+
+    def __getattribute__(self, attr):
+        if attr in ["name", "parts"]:
+            return self._path.__getattribute__(attr)
+        return super().__getattribute__(attr)
+
+    def joinpath(self, *args):
+        """Concatenate another path to this one."""
+        return UncachedIrodsPath(self.session, self._path, *args)
+
+
+def run(path_class: type, n_paths: int) -> dict[str, float]:
+    """Wall-clock times of the path operations on `n_paths` child paths."""
+    parent = path_class(MockSession(), "~", "collection")
+    str(parent)
+    times = {}
+    start = time.perf_counter()
+    paths = [parent.joinpath(f"file_{i}.dat") for i in range(n_paths)]
+    times["joinpath"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        str(path)
+    times["first str"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        str(path)
+        str(path)
+    times["2x repeated str"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        _ = path.name
+    times["name"] = time.perf_counter() - start
+    return times
+
+
+def main():
+    n_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    baseline = run(UncachedIrodsPath, n_paths)
+    times = run(IrodsPath, n_paths)
+    print(f"{'operation':16s} {'uncached':>12s} {'IrodsPath':>12s}")
+    for operation, seconds in times.items():
+        print(f"{operation:16s} {baseline[operation] / n_paths * 1e9:9.0f} ns "
+              f"{seconds / n_paths * 1e9:9.0f} ns  "
+              f"({baseline[operation] / seconds:.1f}x faster)")
+    print(f"{'total':16s} {sum(baseline.values()):10.2f} s {sum(times.values()):10.2f} s  "
+          f"({sum(baseline.values()) / sum(times.values()):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
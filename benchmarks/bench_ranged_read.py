@@ -0,0 +1,57 @@
+"""Benchmark of a ranged read of a data object against a full download.
+
+Reads `length` bytes at a few offsets of a large data object with
+IrodsPath.read_range and compares this with downloading the whole object
+and reading the same ranges from the local copy. This needs an iRODS server
+and a cached password (iinit) for the environment file.
+
+Usage (with ibridges installed):
+    python benchmarks/bench_ranged_read.py <irods data object> [length]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ibridges import IrodsPath, Session
+from ibridges.irodsconnector.data_operations import download
+
+N_RANGES = 4
+
+
+def ranged_read(ipath: IrodsPath, offsets: list[int], length: int) -> float:
+    """Wall-clock time of reading the ranges from the server."""
+    start = time.perf_counter()
+    for offset in offsets:
+        ipath.read_range(offset, length)
+    return time.perf_counter() - start
+
+
+def full_download(session: Session, ipath: IrodsPath, offsets: list[int], length: int) -> float:
+    """Wall-clock time of downloading the object and reading the ranges locally."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = Path(tmp_dir, ipath.name)
+        start = time.perf_counter()
+        download(session, ipath, local_path)
+        with open(local_path, "rb") as handle:
+            for offset in offsets:
+                handle.seek(offset)
+                handle.read(length)
+        return time.perf_counter() - start
+
+
+def main():
+    session = Session(irods_env_path="~/.irods/irods_environment.json")
+    ipath = IrodsPath(session, sys.argv[1])
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 2**16
+    size = session.irods_session.data_objects.get(str(ipath)).size
+    offsets = [i * max(0, size - length) // (N_RANGES - 1) for i in range(N_RANGES)]
+    print(f"{ipath}: {size} bytes, {N_RANGES} ranges of {length} bytes")
+    ranged = ranged_read(ipath, offsets, length)
+    full = full_download(session, ipath, offsets, length)
+    print(f"read_range:    {ranged:.3f}s")
+    print(f"full download: {full:.3f}s ({full / ranged:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark of the order of a skewed collection transfer.
+
+A few large files are found last in discovery order, after many small files.
+The transfers are simulated with a sleep proportional to the size, so that
+the benchmark measures the scheduling and needs no iRODS server.
+
+Usage (with ibridges installed): python benchmarks/bench_scheduling.py [n_workers]
+"""
+import sys
+import time
+
+from ibridges.irodsconnector.transfer import execute_jobs, largest_first
+
+# Simulated bandwidth per worker in bytes per second.
+BANDWIDTH = 2 * 10**9
+
+
+def skewed_dataset() -> list[tuple[str, str, int]]:
+    """400 files of 10 MB, followed by 3 files of 2 GB."""
+    small = [(f"small_{i}", f"dest/small_{i}", 10**7) for i in range(400)]
+    large = [(f"large_{i}", f"dest/large_{i}", 2 * 10**9) for i in range(3)]
+    return small + large
+
+
+def _transfer(_source: str, _dest: str, size: int):
+    time.sleep(size / BANDWIDTH)
+
+
+def run(jobs: list[tuple[str, str, int]], n_workers: int) -> float:
+    """Wall-clock time of the simulated transfer of `jobs`."""
+    start = time.perf_counter()
+    execute_jobs(_transfer, jobs, n_workers)
+    return time.perf_counter() - start
+
+
+def main():
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    jobs = skewed_dataset()
+    total = sum(size for _, _, size in jobs) / BANDWIDTH
+    print(f"{len(jobs)} files, serial time {total:.2f}s, "
+          f"lower bound with {n_workers} workers {total / n_workers:.2f}s")
+    discovery = run(jobs, n_workers)
+    lpt = run(largest_first(jobs), n_workers)
+    print(f"discovery order:     {discovery:.2f}s")
+    print(f"largest first (LPT): {lpt:.2f}s ({discovery / lpt:.2f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+""" asyncio interface for data operations
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from ibridges.irodsconnector import data_operations
+from ibridges.irodsconnector.meta import MetaData
+from ibridges.irodsconnector.session import Session
+from ibridges.irodsconnector.transfer import TransferStats
+from ibridges.search import search
+from ibridges.utils.path import IrodsPath
+
+
+class AsyncSession():
+    """Run the blocking iBridges operations of a session without blocking the event loop.
+
+    Every call is executed in a thread pool that is owned by the AsyncSession.
+    Each thread draws its own connection from the connection pool of the
+    iRODS session, so the number of threads is also the maximum number of
+    connections that are in use at the same time. Operations that are awaited
+    while all threads are busy are queued.
+
+    Examples
+    --------
+    >>> async with AsyncSession(session, max_workers=16) as asession:
+    ...     sizes = await asyncio.gather(*(asession.get_size(path) for path in paths))
+    """
+
+    def __init__(self, session: Session, max_workers: int = 8):
+        """Create the thread pool.
+
+        Parameters
+        ----------
+        session : Session
+            The iRODS session whose connections are used.
+        max_workers : int
+            Maximum number of operations that run at the same time.
+        """
+        if max_workers < 1:
+            raise ValueError(f"Number of workers should be at least 1, not {max_workers}.")
+        self.session = session
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="ibridges-aio")
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Call `func(session, *args, **kwargs)` in the thread pool and return its result.
+
+        This can be used for any function that takes the session as its first argument,
+        e.g. the functions in `ibridges.irodsconnector.data_operations`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, self.session, *args, **kwargs))
+
+    async def upload(self, local_path: Union[str, Path], irods_path: Union[str, IrodsPath],
+                     **kwargs) -> TransferStats:
+        """Upload a local directory or file to iRODS, see `data_operations.upload`."""
+        return await self.run(data_operations.upload, local_path, irods_path, **kwargs)
+
+    async def download(self, irods_path: Union[str, IrodsPath], local_path: Union[str, Path],
+                       **kwargs) -> TransferStats:
+        """Download a collection or data object, see `data_operations.download`."""
+        return await self.run(data_operations.download, irods_path, local_path, **kwargs)
+
+    async def get_size(self, irods_path: Union[str, IrodsPath]) -> int:
+        """Total size in bytes of a data object or of all data objects in a collection."""
+        return await self.run(_get_size, irods_path)
+
+    async def search(self, path: Optional[Union[str, IrodsPath]] = None,
+                     checksum: Optional[str] = None,
+                     key_vals: Optional[dict] = None, **filters) -> list[dict]:
+        """Search for collections and data objects, see `ibridges.search.search`."""
+        return await self.run(search, path, checksum, key_vals, **filters)
+
+    async def get_metadata(self, irods_path: Union[str, IrodsPath]) -> list[tuple]:
+        """All metadata of a collection or data object as (name, value, units) tuples."""
+        return await self.run(_get_metadata, irods_path)
+
+    async def add_metadata(self, irods_path: Union[str, IrodsPath], key: str, value: str,
+                           units: Optional[str] = None):
+        """Add a metadata entry, see `MetaData.add`."""
+        await self.run(_update_metadata, irods_path, "add", key, value, units)
+
+    async def set_metadata(self, irods_path: Union[str, IrodsPath], key: str, value: str,
+                           units: Optional[str] = None):
+        """Replace all metadata entries with `key` by a single entry, see `MetaData.set`."""
+        await self.run(_update_metadata, irods_path, "set", key, value, units)
+
+    async def delete_metadata(self, irods_path: Union[str, IrodsPath], key: str,
+                              value: Optional[str], units: Optional[str] = None):
+        """Delete metadata entries, see `MetaData.delete`."""
+        await self.run(_update_metadata, irods_path, "delete", key, value, units)
+
+    def close(self):
+        """Wait for the running operations and stop the thread pool."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+def _get_item(session: Session, irods_path: Union[str, IrodsPath]):
+    irods_path = IrodsPath(session, irods_path)
+    if irods_path.collection_exists():
+        return data_operations.get_collection(session, irods_path)
+    return data_operations.get_dataobject(session, irods_path)
+
+def _get_size(session: Session, irods_path: Union[str, IrodsPath]) -> int:
+    return data_operations.get_size(session, _get_item(session, irods_path))
+
+def _get_metadata(session: Session, irods_path: Union[str, IrodsPath]) -> list[tuple]:
+    return [(meta.name, meta.value, meta.units)
+            for meta in MetaData(_get_item(session, irods_path))]
+
+def _update_metadata(session: Session, irods_path: Union[str, IrodsPath], action: str,
+                     *args):
+    getattr(MetaData(_get_item(session, irods_path)), action)(*args)
@@ -0,0 +1,158 @@
+""" local download cache keyed by iRODS checksums
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Union
+
+from ibridges.utils.checksum import local_checksum
+
+
+class DownloadCache():  # pylint: disable=too-many-instance-attributes
+    """Local directory with copies of downloaded data objects, keyed by their checksum.
+
+    Data objects with the same checksum have the same content, so a data object
+    that was downloaded before, from any path, can be copied from the cache
+    instead of over the network. The least recently used copies are evicted
+    when the cache grows beyond `max_size`. The time of last use is the
+    modification time of the cached file, so the order survives restarts.
+
+    With `hardlink` the destination files are hard links to the cached copies,
+    which costs no space, but modifying a downloaded file in place then also
+    modifies the cached copy. Hard links that are not possible, e.g. across file
+    systems, fall back to copies. Cached copies are verified against their
+    checksum before they are used, and modified copies are dropped.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = 10 * 2**30,
+                 hardlink: bool = False):
+        """Open or create a cache.
+
+        Parameters
+        ----------
+        cache_dir : str or Path
+            Directory of the cached files.
+        max_size : int
+            Size budget of the cache in bytes.
+        hardlink : bool
+            Hard link downloads to the cache instead of copying them.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hardlink = hardlink
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # cache file name -> (size, time of last use)
+        self._entries: dict[str, tuple[int, float]] = {}
+        for entry in self.cache_dir.iterdir():
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                self._entries[entry.name] = (stat.st_size, stat.st_mtime)
+
+    @property
+    def size(self) -> int:
+        """Total size in bytes of the cached files."""
+        return sum(size for size, _ in self._entries.values())
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (f"DownloadCache({self.cache_dir}, files={len(self)}, size={self.size}, "
+                f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})")
+
+    @staticmethod
+    def _key(checksum: str) -> str:
+        # iRODS checksums can contain '/', e.g. sha2:<base64 digest>.
+        return hashlib.sha256(checksum.encode()).hexdigest()
+
+    def fetch(self, checksum: str, local_path: Union[str, Path]) -> bool:
+        """Place the cached copy with `checksum` at `local_path`, if there is one.
+
+        An existing file at `local_path` is replaced. A cached copy whose content
+        no longer matches `checksum` is removed from the cache.
+
+        Returns
+        -------
+        bool
+            Whether the file was found in the cache.
+        """
+        key = self._key(checksum)
+        cache_path = self.cache_dir / key
+        with self._lock:
+            found = key in self._entries
+        try:
+            # The copy can be modified after it was cached, e.g. through a hard link.
+            found = found and local_checksum(cache_path, checksum) == checksum
+            if found:
+                os.utime(cache_path)
+                self._place(cache_path, Path(local_path))
+        except FileNotFoundError:
+            # Evicted by another thread in the meantime.
+            found = False
+        with self._lock:
+            if not found:
+                self.misses += 1
+                if self._entries.pop(key, None) is not None:
+                    cache_path.unlink(missing_ok=True)
+                return False
+            self.hits += 1
+            if key in self._entries:
+                self._entries[key] = (self._entries[key][0], time.time())
+        return True
+
+    def store(self, checksum: str, local_path: Union[str, Path]):
+        """Add a downloaded file with `checksum` to the cache and evict old entries.
+
+        Files that are larger than the whole budget are not cached.
+        """
+        key = self._key(checksum)
+        local_path = Path(local_path)
+        size = local_path.stat().st_size
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+        self._place(local_path, self.cache_dir / key)
+        with self._lock:
+            self._entries[key] = (size, time.time())
+            self._evict()
+
+    def _evict(self):
+        """Remove the least recently used files until the cache fits in its budget."""
+        total = self.size
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_size:
+                break
+            (self.cache_dir / key).unlink(missing_ok=True)
+            del self._entries[key]
+            total -= size
+            self.evictions += 1
+
+    def _place(self, source: Path, dest: Path):
+        """Link or copy `source` to `dest` atomically, replacing `dest` if it exists."""
+        tmp_path = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+        try:
+            if self.hardlink:
+                try:
+                    os.link(source, tmp_path)
+                except OSError:
+                    shutil.copyfile(source, tmp_path)
+            else:
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, dest)
+        finally:
+            tmp_path.unlink(missing_ok=True)
@@ -1,9 +1,9 @@
 """ collections and data objects
 """
 import os
-import warnings
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
 
 import irods.collection
 import irods.data_object
@@ -11,9 +11,29 @@ import irods.exception
 from irods.models import DataObject
 
 from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.cache import DownloadCache
+from ibridges.irodsconnector.journal import CHECKPOINT_SIZE, TransferJournal
+from ibridges.irodsconnector.query import IrodsQuery, tree_condition
 from ibridges.irodsconnector.session import Session
+from ibridges.irodsconnector.stat_cache import COLLECTION, DATAOBJECT, invalidate
+from ibridges.irodsconnector.stats import size_totals
+from ibridges.irodsconnector.transfer import (
+    SizeThreadStrategy,
+    StreamBudget,
+    ThreadStrategy,
+    TransferHook,
+    TransferPlan,
+    TransferStats,
+    execute_jobs,
+    largest_first,
+    track_transfer,
+)
+from ibridges.utils.checksum import local_checksum
 from ibridges.utils.path import IrodsPath
 
+# Maximum number of values in the IN filter of a single query.
+STAT_BATCH_SIZE = 100
+
 
 def get_dataobject(session: Session,
                    path: Union[str, IrodsPath]) -> irods.data_object.iRODSDataObject:
@@ -101,8 +121,87 @@ def is_collection(item) -> bool:
     """
     return isinstance(item, irods.collection.iRODSCollection)
 
+class IrodsStat(NamedTuple):
+    """Type and system metadata of an iRODS path, as returned by stat_many."""
+    type: str
+    size: int
+    checksum: Optional[str]
+    modify_time: Optional[datetime]
+
+
+def stat_many(session: Session, paths: Iterable[Union[str, IrodsPath]]
+              ) -> dict[str, Optional[IrodsStat]]:
+    """Retrieve the type, size, checksum and modification time of many paths at once.
+
+    The paths are grouped by parent collection and resolved with IN queries on
+    batches of STAT_BATCH_SIZE collections and names, instead of several queries
+    per path. If the session has a stat cache, the answers are added to it.
+
+    Parameters
+    ----------
+    paths : Iterable
+        iRODS paths of data objects and/or collections.
+
+    Returns
+    -------
+    dict
+        Absolute path -> IrodsStat with type 'collection' or 'dataobject', None for
+        paths that do not exist. Collections have size 0 and no checksum.
+    """
+    abs_paths = list(dict.fromkeys(str(IrodsPath(session, path)) for path in paths))
+    stats: dict[str, Optional[IrodsStat]] = dict.fromkeys(abs_paths)
+    for i_batch in range(0, len(abs_paths), STAT_BATCH_SIZE):
+        batch = abs_paths[i_batch:i_batch+STAT_BATCH_SIZE]
+        coll_query = IrodsQuery(session, kw.COLL_NAME, kw.COLL_MODIFY_TIME)
+        for res in coll_query.filter(kw.IN(kw.COLL_NAME, batch)):
+            stats[res[kw.COLL_NAME]] = IrodsStat(
+                "collection", 0, None, res[kw.COLL_MODIFY_TIME].replace(tzinfo=timezone.utc))
+
+    names_by_parent: dict[str, set[str]] = {}
+    for path in abs_paths:
+        if stats[path] is None and path != "/":
+            parent, name = path.rsplit("/", 1)
+            names_by_parent.setdefault(parent or "/", set()).add(name)
+    parents = sorted(names_by_parent)
+    for i_batch in range(0, len(parents), STAT_BATCH_SIZE):
+        parent_batch = parents[i_batch:i_batch+STAT_BATCH_SIZE]
+        names = sorted(set().union(*(names_by_parent[parent] for parent in parent_batch)))
+        for i_names in range(0, len(names), STAT_BATCH_SIZE):
+            data_query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME, kw.DATA_SIZE,
+                                    kw.DATA_CHECKSUM, kw.DATA_MODIFY_TIME)
+            data_query = data_query.filter(
+                kw.IN(kw.COLL_NAME, parent_batch),
+                kw.IN(kw.DATA_NAME, names[i_names:i_names+STAT_BATCH_SIZE]))
+            for coll_name, data_name, size, checksum, modify_time in (
+                    res.values() for res in data_query):
+                # The IN filters also match names of other requested collections.
+                path = coll_name.rstrip("/") + "/" + data_name
+                if path in stats and stats[path] is None:
+                    stats[path] = IrodsStat("dataobject", int(size), checksum or None,
+                                            modify_time.replace(tzinfo=timezone.utc))
+
+    if getattr(session, "stat_cache", None) is not None:
+        for path, stat in stats.items():
+            if stat is None:
+                session.stat_cache.put(path, COLLECTION, False)
+                session.stat_cache.put(path, DATAOBJECT, False)
+            else:
+                session.stat_cache.put(path, stat.type, True)
+    return stats
+
+def exists_many(session: Session, paths: Iterable[Union[str, IrodsPath]]) -> dict[str, bool]:
+    """Check the existence of many paths at once, see stat_many.
+
+    Returns
+    -------
+    dict
+        Absolute path -> whether it is an existing collection or data object.
+    """
+    return {path: stat is not None for path, stat in stat_many(session, paths).items()}
+
 def _obj_put(session: Session, local_path: Union[str, Path], irods_path: Union[str, IrodsPath],
-             overwrite: bool = False, resc_name: str = '', options: Optional[dict] = None):
+             overwrite: bool = False, resc_name: str = '', options: Optional[dict] = None,
+             obj_exists: Optional[bool] = None, num_threads: int = kw.NUM_THREADS):
     """Upload `local_path` to `irods_path` following iRODS `options`.
 
     Parameters
@@ -113,6 +212,11 @@ def _obj_put(session: Session, local_path: Union[str, Path], irods_path: Union[s
         Path of iRODS data object or collection.
     resc_name : str
         Optional resource name.
+    obj_exists : bool
+        Whether the destination data object already exists, if this is known
+        beforehand. By default this is checked on the iRODS server.
+    num_threads : int
+        Maximum number of streams PRC uses for a large file.
 
     """
     local_path = Path(local_path)
@@ -122,13 +226,14 @@ def _obj_put(session: Session, local_path: Union[str, Path], irods_path: Union[s
         raise ValueError("local_path must be a file.")
 
     # Check if irods object already exists
-    obj_exists = IrodsPath(session,
-                           irods_path / local_path.name).dataobject_exists() \
-                 or irods_path.dataobject_exists()
+    if obj_exists is None:
+        obj_exists = IrodsPath(session,
+                               irods_path / local_path.name).dataobject_exists() \
+                     or irods_path.dataobject_exists()
 
     options = {
         kw.ALL_KW: '',
-        kw.NUM_THREADS_KW: kw.NUM_THREADS,
+        kw.NUM_THREADS_KW: num_threads,
         kw.REG_CHKSUM_KW: '',
         kw.VERIFY_CHKSUM_KW: ''
     }
@@ -136,11 +241,14 @@ def _obj_put(session: Session, local_path: Union[str, Path], irods_path: Union[s
         options[kw.RESC_NAME_KW] = resc_name
     if overwrite or not obj_exists:
         session.irods_session.data_objects.put(local_path, str(irods_path), **options)
+        invalidate(session, irods_path)
     else:
         raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
 
-def _obj_get(session: Session, irods_path: Union[str, IrodsPath], local_path: Union[str, Path],
-             overwrite: bool = False, options: Optional[dict] = None):
+def _obj_get(session: Session, irods_path: Union[str, IrodsPath], local_path: Union[str, Path],  # pylint: disable=too-many-arguments
+             overwrite: bool = False, options: Optional[dict] = None,
+             num_threads: int = kw.NUM_THREADS, cache: Optional[DownloadCache] = None,
+             checksum: Optional[str] = None, obj_exists: Optional[bool] = None):
     """Download `irods_path` to `local_path` following iRODS `options`.
 
     Parameters
@@ -151,15 +259,34 @@ def _obj_get(session: Session, irods_path: Union[str, IrodsPath], local_path: Un
         Path of local file or directory/folder.
     options : dict
         iRODS transfer options.
+    num_threads : int
+        Maximum number of streams PRC uses for a large data object.
+    cache : DownloadCache
+        Local cache to take the data object from if its checksum is found, and to
+        add it to after the download. Data objects without checksum are not cached.
+    checksum : str
+        Checksum of the data object, if this is known beforehand, an empty string if
+        it has none. By default it is retrieved from the server when a cache is used.
+    obj_exists : bool
+        Whether the data object exists, if this is known beforehand. By default
+        this is checked on the iRODS server.
 
     """
     irods_path = IrodsPath(session, irods_path)
-    if not irods_path.dataobject_exists():
+    if cache is not None:
+        if checksum is None:
+            checksum = get_dataobject(session, irods_path).checksum
+        if checksum:
+            _obj_get_cached(session, irods_path, Path(local_path), overwrite, options,
+                            num_threads, cache, checksum)
+            return
+    if obj_exists is None:
+        obj_exists = irods_path.dataobject_exists()
+    if not obj_exists:
         raise ValueError("irods_path must be a data object.")
-    if options is None:
-        options = {}
+    options = {} if options is None else dict(options)
     options.update({
-        kw.NUM_THREADS_KW: kw.NUM_THREADS,
+        kw.NUM_THREADS_KW: num_threads,
         kw.VERIFY_CHKSUM_KW: '',
         })
     if overwrite:
@@ -167,6 +294,66 @@ def _obj_get(session: Session, irods_path: Union[str, IrodsPath], local_path: Un
 
     session.irods_session.data_objects.get(str(irods_path), local_path, **options)
 
+def _obj_get_cached(session: Session, irods_path: IrodsPath, local_path: Path,  # pylint: disable=too-many-arguments
+                    overwrite: bool, options: Optional[dict], num_threads: int,
+                    cache: DownloadCache, checksum: str):
+    """Download `irods_path` through the cache, see _obj_get."""
+    if local_path.is_dir():
+        local_path = local_path / irods_path.name
+    if local_path.exists() and not overwrite:
+        raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+    if cache.fetch(checksum, local_path):
+        return
+    _obj_get(session, irods_path, local_path, overwrite, options, num_threads, obj_exists=True)
+    cache.store(checksum, local_path)
+
+def _obj_get_journaled(session: Session, irods_path: IrodsPath, local_path: Path,  # pylint: disable=too-many-arguments
+                       journal: TransferJournal, hook: Optional[TransferHook] = None,
+                       checksum: Optional[str] = None):
+    """Download `irods_path` to `local_path`, recording the progress in `journal`.
+
+    The data object is streamed sequentially, so that a partial download can be
+    continued from the last offset that was recorded in the journal. The progress
+    is also reported to `hook`. Like a normal download, the complete local file is
+    verified against the checksum of the data object, if it has one.
+
+    Parameters
+    ----------
+    checksum : str
+        Checksum of the data object, if this is known beforehand, an empty string if
+        it has none. By default it is retrieved from the server.
+    """
+    hook = hook or TransferHook()
+    if checksum is None:
+        checksum = get_dataobject(session, irods_path).checksum
+    source = str(irods_path)
+    offset = journal.offset(source) or 0
+    if not local_path.is_file() or local_path.stat().st_size < offset:
+        offset = 0
+    journal.start(source)
+    with session.irods_session.data_objects.open(source, 'r') as irods_file, \
+            open(local_path, 'r+b' if offset else 'wb') as local_file:
+        irods_file.seek(offset)
+        local_file.seek(offset)
+        local_file.truncate()
+        for chunk in iter(lambda: irods_file.read(CHECKPOINT_SIZE), b''):
+            local_file.write(chunk)
+            local_file.flush()
+            offset += len(chunk)
+            journal.progress(source, offset)
+            hook.on_progress(source, len(chunk))
+    if checksum and local_checksum(local_path, checksum) != checksum:
+        # The local file cannot be continued, the next attempt starts over.
+        journal.progress(source, 0)
+        raise irods.exception.USER_CHKSUM_MISMATCH(
+            f"Checksum of '{local_path}' does not match the checksum of '{source}'.")
+
+def _stream_budget(max_streams: Optional[int], n_workers: int) -> StreamBudget:
+    """Global cap on the streams of all workers, by default kw.NUM_THREADS per worker."""
+    if max_streams is None:
+        max_streams = n_workers * kw.NUM_THREADS
+    return StreamBudget(max_streams)
+
 def _create_irods_dest(local_path: Path, irods_path: IrodsPath):
     """ Assmbles the irods destination paths for upload of a folder
     """
@@ -181,10 +368,86 @@ def _create_irods_dest(local_path: Path, irods_path: IrodsPath):
 
     return source_to_dest
 
-def _upload_collection(session: Session, local_path: Union[str, Path],
+def _remote_dataobjects(session: Session, irods_path: IrodsPath) -> set[str]:
+    """Retrieve the paths of all data objects in `irods_path` and its subcollections.
+
+    A single paged query is used for the whole tree, so that existence checks
+    for many destination paths can be answered without going to the server.
+
+    Returns
+    -------
+    set of str
+        Absolute paths of all data objects in the tree.
+    """
+    data_query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME)
+    data_query = data_query.filter(tree_condition(str(irods_path)))
+    return {coll_name.rstrip("/")+"/"+data_name
+            for coll_name, data_name in (res.values() for res in data_query)}
+
+def _collection_levels(irods_path: IrodsPath, dest_paths: Iterable[IrodsPath],
+                       n_workers: int = 1) -> list[list[IrodsPath]]:
+    """Group the collections that have to be created for `dest_paths` by depth.
+
+    Creating a collection also creates its missing parents, so only the parents
+    of the destination paths below `irods_path` are included. For more than one
+    worker, collections with several subcollections are included as well, so
+    that the collections of one level are created after their common parents
+    and never race to create them.
+
+    Returns
+    -------
+    list of lists
+        Collections to create, shallowest level first.
+    """
+    root = str(irods_path)
+    parents = {str(dest.parent) for dest in dest_paths}
+    # collection -> (IrodsPath, paths of its subcollections)
+    tree: dict[str, tuple[IrodsPath, set[str]]] = {}
+    for parent in parents:
+        coll, child = IrodsPath(irods_path.session, parent), None
+        while str(coll) != root and str(coll).startswith(root):
+            known = str(coll) in tree
+            subcolls = tree.setdefault(str(coll), (coll, set()))[1]
+            if child is not None:
+                subcolls.add(child)
+            if known:
+                break
+            coll, child = coll.parent, str(coll)
+    levels: dict[int, list[IrodsPath]] = {}
+    for path, (coll, subcolls) in tree.items():
+        if path in parents or (n_workers > 1 and len(subcolls) > 1):
+            levels.setdefault(len(coll.parts), []).append(coll)
+    return [sorted(levels[depth], key=str) for depth in sorted(levels)]
+
+def _missing_collections(session: Session,
+                         coll_levels: list[list[IrodsPath]]) -> list[list[IrodsPath]]:
+    """Leave the collections that already exist out of `coll_levels`, see exists_many."""
+    exists = exists_many(session, (coll for level in coll_levels for coll in level))
+    levels = [[coll for coll in level if not exists[str(coll)]] for level in coll_levels]
+    return [level for level in levels if level]
+
+def _create_collections(session: Session, coll_levels: list[list[IrodsPath]],
+                        n_workers: int = 1) -> int:
+    """Create collections level by level, the collections of one level in parallel.
+
+    Returns
+    -------
+    int
+        Number of create calls, one per collection.
+    """
+    for level in coll_levels:
+        execute_jobs(lambda coll: create_collection(session, coll),
+                     [(coll,) for coll in level], n_workers)
+    return sum(len(level) for level in coll_levels)
+
+def _upload_collection(session: Session, local_path: Union[str, Path],  # pylint: disable=too-many-arguments
                        irods_path: Union[str, IrodsPath],
                        overwrite: bool = False, resc_name: str = '',
-                       options: Optional[dict] = None):
+                       options: Optional[dict] = None, n_workers: int = 1,
+                       journal: Optional[Union[str, Path]] = None,
+                       max_streams: Optional[int] = None,
+                       thread_strategy: Optional[ThreadStrategy] = None,
+                       hook: Optional[TransferHook] = None) -> TransferStats:
     """Upload a local directory to iRODS
 
     Parameters
@@ -199,6 +462,25 @@ def _upload_collection(session: Session, local_path: Union[str, Path],
         Name of the resource to which data is uploaded, by default the server will decide
     options : dict
         More options for the upload
+    n_workers : int
+        Number of files that are uploaded concurrently. Each worker draws its own
+        connection from the connection pool of the session. With more than one
+        worker the largest files are started first.
+    journal : str or Path
+        Journal file to resume an interrupted upload from. Files that were uploaded
+        completely are skipped, files that were interrupted are uploaded again.
+    max_streams : int
+        Cap on the total number of data streams of all workers together.
+        By default the cap is n_workers * kw.NUM_THREADS.
+    thread_strategy : ThreadStrategy
+        Policy for the number of streams per file, by default SizeThreadStrategy.
+    hook : TransferHook
+        Receiver of progress events.
+
+    Returns
+    -------
+    TransferStats
+        Number of uploaded and skipped files, bytes and throughput.
     """
     local_path = Path(local_path)
     irods_path = IrodsPath(session, irods_path)
@@ -206,16 +488,63 @@ def _upload_collection(session: Session, local_path: Union[str, Path],
     if not local_path.is_dir():
         raise ValueError("local_path must be a directory.")
 
-    source_to_dest = _create_irods_dest(local_path, irods_path)
-    for source, dest in source_to_dest:
-        _ = create_collection(session, dest.parent)
-        try:
-            _obj_put(session, source, dest, overwrite, resc_name, options)
-        except irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG:
-            warnings.warn(f'Upload: Object already exists\n\tSkipping {source}')
+    stats = TransferStats()
+    tjournal = None if journal is None else TransferJournal(journal)
+    budget = _stream_budget(max_streams, n_workers)
+    thread_strategy = thread_strategy or SizeThreadStrategy()
+    hook = hook or TransferHook()
+
+    def _upload_file(source: Path, dest: IrodsPath, size: int):
+        # An interrupted upload of our own is overwritten.
+        resumed = tjournal is not None and tjournal.offset(str(source)) is not None
+        if tjournal is not None:
+            tjournal.start(str(source))
+        with track_transfer(stats, hook, source, dest, size, 'Upload: Object already exists'):
+            with budget.reserve(size, thread_strategy) as num_threads:
+                _obj_put(session, source, dest, overwrite or resumed, resc_name, options,
+                         obj_exists=str(dest) in remote_objs, num_threads=num_threads)
+        if tjournal is not None:
+            tjournal.done(str(source))
+
+    job = (str(local_path.absolute()), str(irods_path))
+    planned = None if tjournal is None else tjournal.resume_plan(*job)
+    if planned is not None:
+        source_to_dest = [(Path(source), IrodsPath(session, dest), size)
+                          for source, dest, size in planned
+                          if not tjournal.is_done(source)]
+        remote_objs = tjournal.existing
+    else:
+        source_to_dest = [(source, dest, source.stat().st_size)
+                          for source, dest in _create_irods_dest(local_path, irods_path)]
+        # Answer all existence checks from a single listing of the destination.
+        remote_objs = set()
+        if not overwrite:
+            remote_objs = _remote_dataobjects(session, irods_path.joinpath(local_path.name))
+        if tjournal is not None:
+            tjournal.plan(*job, ((str(source), str(dest), size)
+                                 for source, dest, size in source_to_dest), remote_objs)
+    # Create every missing destination collection once, instead of once per file.
+    coll_levels = _missing_collections(session, _collection_levels(
+        irods_path, (dest for _, dest, _ in source_to_dest), n_workers))
+    stats.n_collections = _create_collections(session, coll_levels, n_workers)
+    stats.round_trips_saved = max(0, len(source_to_dest) - stats.n_collections)
+    stats.total_files = len(source_to_dest)
+    stats.total_bytes = sum(size for _, _, size in source_to_dest)
+    hook.on_job_start(stats)
+    if n_workers > 1:
+        source_to_dest = largest_first(source_to_dest)
+    execute_jobs(_upload_file, source_to_dest, n_workers)
+    stats.stop()
+    hook.on_job_finish(stats)
+    return stats
 
 def _create_local_dest(session: Session, irods_path: IrodsPath, local_path: Path):
     """Assmbles the local destination paths for download of a collection
+
+    Returns
+    -------
+    list of tuples
+        [(source IrodsPath, destination Path, size, checksum of the data object)]
     """
     # get all data objects
     coll = get_collection(session, irods_path)
@@ -225,14 +554,21 @@ def _create_local_dest(session: Session, irods_path: IrodsPath, local_path: Path
     source_to_dest = [(IrodsPath(session, subcoll_path, obj_name),
                       Path(download_path,
                            subcoll_path.removeprefix(str(irods_path)).lstrip('/'),
-                           obj_name))
-                      for subcoll_path, obj_name, _, _ in all_objs]
+                           obj_name),
+                       size, checksum)
+                      for subcoll_path, obj_name, size, checksum in all_objs]
 
     return source_to_dest
 
 
-def _download_collection(session: Session, irods_path: Union[str, IrodsPath], local_path: Path,
-                         overwrite: bool = False, options: Optional[dict] = None):
+def _download_collection(session: Session,  # pylint: disable=too-many-arguments
+                         irods_path: Union[str, IrodsPath], local_path: Path,
+                         overwrite: bool = False, options: Optional[dict] = None,
+                         n_workers: int = 1, max_streams: Optional[int] = None,
+                         journal: Optional[Union[str, Path]] = None,
+                         thread_strategy: Optional[ThreadStrategy] = None,
+                         hook: Optional[TransferHook] = None,
+                         cache: Optional[DownloadCache] = None) -> TransferStats:
     """Download a collection to the local filesystem
 
     Parameters
@@ -245,25 +581,95 @@ def _download_collection(session: Session, irods_path: Union[str, IrodsPath], lo
         Overwrite existing local data
     options : dict
         More options for the download
+    n_workers : int
+        Number of data objects that are downloaded concurrently. Each worker draws its
+        own connection from the connection pool of the session. With more than one
+        worker the largest data objects are started first.
+    max_streams : int
+        Cap on the total number of data streams of all workers together.
+        By default the cap is n_workers * kw.NUM_THREADS.
+    journal : str or Path
+        Journal file to resume an interrupted download from. Data objects are then
+        streamed sequentially, and interrupted downloads continue at the last
+        recorded offset.
+    thread_strategy : ThreadStrategy
+        Policy for the number of streams per data object, by default SizeThreadStrategy.
+    hook : TransferHook
+        Receiver of progress events.
+    cache : DownloadCache
+        Local cache of data objects by checksum. It is not used for journaled downloads.
+
+    Returns
+    -------
+    TransferStats
+        Number of downloaded and skipped files, bytes and throughput.
     """
 
     irods_path = IrodsPath(session, irods_path)
     if not irods_path.collection_exists():
         raise ValueError("irods_path must be a collection.")
-
-    source_to_dest = _create_local_dest(session, irods_path, local_path)
-
-    for source, dest in source_to_dest:
+    budget = _stream_budget(max_streams, n_workers)
+    thread_strategy = thread_strategy or SizeThreadStrategy()
+    stats = TransferStats()
+    tjournal = None if journal is None else TransferJournal(journal)
+    hook = hook or TransferHook()
+    skip_warning = 'Download: File already exists'
+
+    def _download_file(source: IrodsPath, dest: Path, size: int):
         # ensure local folder exists
-        if not dest.parent.is_dir():
-            os.makedirs(dest)
-        try:
-            _obj_get(session, source, dest, overwrite, options)
-        except irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG:
-            warnings.warn(f'Download: File already exists\n\tSkipping {source}')
-
-def upload(session: Session, local_path: Union[str, Path], irods_path: Union[str, IrodsPath],
-           overwrite: bool = False, resc_name: str = '', options: Optional[dict] = None):
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if tjournal is not None:
+            _download_journaled(source, dest, size)
+            return
+        with track_transfer(stats, hook, source, dest, size, skip_warning):
+            with budget.reserve(size, thread_strategy) as num_threads:
+                _obj_get(session, source, dest, overwrite, options, num_threads, cache,
+                         checksums.get(str(source), ""))
+
+    def _download_journaled(source: IrodsPath, dest: Path, size: int):
+        resumed = tjournal.offset(str(source)) is not None
+        with track_transfer(stats, hook, source, dest, size, skip_warning,
+                            report_progress=False):
+            if dest.exists() and not (overwrite or resumed):
+                raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+            _obj_get_journaled(session, source, dest, tjournal, hook,
+                               checksums.get(str(source), ""))
+        tjournal.done(str(source))
+
+    job = (str(irods_path), str(Path(local_path).absolute()))
+    planned = None if tjournal is None else tjournal.resume_plan(*job)
+    if planned is not None:
+        # The checksums were recorded with the plan, the source is not listed again.
+        checksums = tjournal.checksums
+        source_to_dest = [(IrodsPath(session, source), Path(dest), size)
+                          for source, dest, size in planned
+                          if not tjournal.is_done(source)]
+    else:
+        # The checksums for the cache and the verification of journaled downloads.
+        items = _create_local_dest(session, irods_path, local_path)
+        checksums = {str(source): checksum for source, _, _, checksum in items if checksum}
+        source_to_dest = [(source, dest, size) for source, dest, size, _ in items]
+        if tjournal is not None:
+            tjournal.plan(*job, ((str(source), str(dest), size)
+                                 for source, dest, size in source_to_dest),
+                          checksums=checksums)
+    stats.total_files = len(source_to_dest)
+    stats.total_bytes = sum(size for _, _, size in source_to_dest)
+    hook.on_job_start(stats)
+    if n_workers > 1:
+        source_to_dest = largest_first(source_to_dest)
+    execute_jobs(_download_file, source_to_dest, n_workers)
+    stats.stop()
+    hook.on_job_finish(stats)
+    return stats
+
+def upload(session: Session, local_path: Union[str, Path],  # pylint: disable=too-many-arguments
+           irods_path: Union[str, IrodsPath],
+           overwrite: bool = False, resc_name: str = '', options: Optional[dict] = None,
+           n_workers: int = 1, journal: Optional[Union[str, Path]] = None,
+           max_streams: Optional[int] = None,
+           thread_strategy: Optional[ThreadStrategy] = None,
+           hook: Optional[TransferHook] = None) -> TransferStats:
     """Upload a local directory  or file to iRODS
 
     Parameters
@@ -278,20 +684,57 @@ def upload(session: Session, local_path: Union[str, Path], irods_path: Union[str
         Name of the resource to which data is uploaded, by default the server will decide
     options : dict
         More options for the upload
+    n_workers : int
+        Number of files of a directory that are uploaded concurrently.
+    journal : str or Path
+        Journal file that records the progress of a directory upload. Running the
+        upload again with the same journal resumes it. A journal of an upload with
+        another source or destination raises a ValueError.
+    max_streams : int
+        Cap on the total number of data streams of all workers together.
+    thread_strategy : ThreadStrategy
+        Policy for the number of streams per file, by default SizeThreadStrategy.
+    hook : TransferHook
+        Receiver of progress events, e.g. for monitoring.
+
+    Returns
+    -------
+    TransferStats
+        Number of uploaded and skipped files, bytes and throughput.
     """
 
     local_path = Path(local_path)
     try:
         if local_path.is_dir():
-            _upload_collection(session, local_path, irods_path, overwrite, resc_name, options)
-        else:
-            _obj_put(session, local_path, irods_path, overwrite, resc_name, options)
+            return _upload_collection(session, local_path, irods_path, overwrite, resc_name,
+                                      options, n_workers, journal, max_streams, thread_strategy,
+                                      hook)
+        if not local_path.is_file():
+            raise ValueError("local_path must be a file.")
+        stats = TransferStats()
+        hook = hook or TransferHook()
+        stats.total_files, stats.total_bytes = 1, local_path.stat().st_size
+        hook.on_job_start(stats)
+        with track_transfer(stats, hook, local_path, irods_path, stats.total_bytes):
+            with _stream_budget(max_streams, 1).reserve(
+                    stats.total_bytes, thread_strategy or SizeThreadStrategy()) as num_threads:
+                _obj_put(session, local_path, irods_path, overwrite, resc_name, options,
+                         num_threads=num_threads)
+        stats.stop()
+        hook.on_job_finish(stats)
+        return stats
     except irods.exception.CUT_ACTION_PROCESSED_ERR as exc:
         raise irods.exception.CUT_ACTION_PROCESSED_ERR(
             f"During upload operation to '{irods_path}': iRODS server forbids action.") from exc
 
-def download(session: Session, irods_path: Union[str, IrodsPath], local_path: Union[str, Path],
-             overwrite: bool = False, _resc_name: str = '', options: Optional[dict] = None):
+def download(session: Session, irods_path: Union[str, IrodsPath],  # pylint: disable=too-many-arguments
+             local_path: Union[str, Path],
+             overwrite: bool = False, _resc_name: str = '', options: Optional[dict] = None,
+             n_workers: int = 1, max_streams: Optional[int] = None,
+             journal: Optional[Union[str, Path]] = None,
+             thread_strategy: Optional[ThreadStrategy] = None,
+             hook: Optional[TransferHook] = None,
+             cache: Optional[DownloadCache] = None) -> TransferStats:
     """Download a collection or data object to the local filesystem
 
     Parameters
@@ -304,23 +747,162 @@ def download(session: Session, irods_path: Union[str, IrodsPath], local_path: Un
         Overwrite existing local data
     options : dict
         More options for the download
+    n_workers : int
+        Number of data objects of a collection that are downloaded concurrently.
+    max_streams : int
+        Cap on the total number of data streams of all workers together.
+    journal : str or Path
+        Journal file that records the progress of a collection download. Running the
+        download again with the same journal resumes it. A journal of a download with
+        another source or destination raises a ValueError.
+    thread_strategy : ThreadStrategy
+        Policy for the number of streams per data object, by default SizeThreadStrategy.
+    hook : TransferHook
+        Receiver of progress events, e.g. for monitoring.
+    cache : DownloadCache
+        Local cache of data objects by checksum. Data objects found in the cache
+        are copied from it instead of downloaded, downloaded data objects are added.
+
+    Returns
+    -------
+    TransferStats
+        Number of downloaded and skipped files, bytes and throughput.
     """
     irods_path = IrodsPath(session, irods_path)
     local_path = Path(local_path)
     try:
         if irods_path.collection_exists():
-            _download_collection(session, irods_path, local_path, overwrite, options)
-        else:
-            _obj_get(session, irods_path, local_path, overwrite, options)
+            return _download_collection(session, irods_path, local_path, overwrite, options,
+                                        n_workers, max_streams, journal, thread_strategy, hook,
+                                        cache)
+        try:
+            obj = session.irods_session.data_objects.get(str(irods_path))
+        except irods.exception.DataObjectDoesNotExist as exc:
+            raise ValueError("irods_path must be a data object.") from exc
+        stats = TransferStats()
+        hook = hook or TransferHook()
+        stats.total_files, stats.total_bytes = 1, obj.size
+        hook.on_job_start(stats)
+        with track_transfer(stats, hook, irods_path, local_path, stats.total_bytes):
+            with _stream_budget(max_streams, 1).reserve(
+                    stats.total_bytes, thread_strategy or SizeThreadStrategy()) as num_threads:
+                _obj_get(session, irods_path, local_path, overwrite, options, num_threads, cache,
+                         obj.checksum or "", obj_exists=True)
+        stats.stop()
+        hook.on_job_finish(stats)
+        return stats
     except irods.exception.CUT_ACTION_PROCESSED_ERR as exc:
         raise irods.exception.CUT_ACTION_PROCESSED_ERR(
             f"During download operation from '{irods_path}': iRODS server forbids action."
             ) from exc
 
+def _split_plan(source_to_dest: list[tuple], exists: Callable[[Any], bool],
+                overwrite: bool) -> tuple[list, list, list]:
+    """Divide (source, destination, size) items into new, overwritten and skipped items."""
+    new, replaced, skip = [], [], []
+    for item in source_to_dest:
+        if not exists(item[1]):
+            new.append(item)
+        elif overwrite:
+            replaced.append(item)
+        else:
+            skip.append(item)
+    return new, replaced, skip
+
+def plan_upload(session: Session, local_path: Union[str, Path],
+                irods_path: Union[str, IrodsPath], overwrite: bool = False,
+                n_workers: int = 1) -> TransferPlan:
+    """Determine what an upload would do, without transferring any data.
+
+    The plan lists the files that would be uploaded, overwritten or skipped,
+    the collections that would be created and an estimate of the number of
+    server round trips, e.g. to check the free space of the resource first.
+
+    Parameters
+    ----------
+    local_path : str or Path
+        Absolute path to the directory or file to upload
+    irods_path : str or IrodsPath
+        Absolute irods destination path
+    overwrite : bool
+        If data already exists on iRODS, overwrite
+    n_workers : int
+        Number of workers of the upload; parallel uploads can create more collections.
+
+    Returns
+    -------
+    TransferPlan
+        The work list of the upload.
+    """
+    local_path = Path(local_path)
+    irods_path = IrodsPath(session, irods_path)
+    if local_path.is_dir():
+        source_to_dest = [(source, dest, source.stat().st_size)
+                          for source, dest in _create_irods_dest(local_path, irods_path)]
+        remote_objs = _remote_dataobjects(session, irods_path.joinpath(local_path.name))
+        coll_levels = _collection_levels(irods_path, (dest for _, dest, _ in source_to_dest),
+                                         n_workers)
+        n_colls = sum(len(level) for level in coll_levels)
+        new, replaced, skip = _split_plan(source_to_dest, lambda dest: str(dest) in remote_objs,
+                                          overwrite)
+        # Like the upload, only missing collections are created. stat_many needs at most
+        # a collection and a data object query per batch.
+        return TransferPlan(True, new, replaced, skip,
+                            [coll for level in _missing_collections(session, coll_levels)
+                             for coll in level],
+                            1 + 2 * -(-n_colls // STAT_BATCH_SIZE))
+    if not local_path.is_file():
+        raise ValueError("local_path must be a file or directory.")
+    dest = irods_path
+    if irods_path.collection_exists():
+        dest = irods_path.joinpath(local_path.name)
+    new, replaced, skip = _split_plan([(local_path, dest, local_path.stat().st_size)],
+                                      lambda dest: dest.dataobject_exists(), overwrite)
+    return TransferPlan(True, new, replaced, skip, [], 2)
+
+def plan_download(session: Session, irods_path: Union[str, IrodsPath],
+                  local_path: Union[str, Path], overwrite: bool = False) -> TransferPlan:
+    """Determine what a download would do, without transferring any data.
+
+    The plan lists the data objects that would be downloaded, overwritten or
+    skipped, the local folders that would be created and an estimate of the
+    number of server round trips. For a collection, the number of bytes of
+    the whole plan equals `get_size` of the collection.
+
+    Parameters
+    ----------
+    irods_path : str or IrodsPath
+        Absolute irods source path
+    local_path : str or Path
+        Absolute path to the destination directory
+    overwrite : bool
+        Overwrite existing local data
+
+    Returns
+    -------
+    TransferPlan
+        The work list of the download.
+    """
+    irods_path = IrodsPath(session, irods_path)
+    local_path = Path(local_path)
+    if irods_path.collection_exists():
+        source_to_dest = [(source, dest, size) for source, dest, size, _
+                          in _create_local_dest(session, irods_path, local_path)]
+        folders = sorted({dest.parent for _, dest, _ in source_to_dest if not dest.parent.is_dir()},
+                         key=lambda folder: len(folder.parts))
+        n_queries = 4
+    else:
+        dest = local_path.joinpath(irods_path.name) if local_path.is_dir() else local_path
+        source_to_dest = [(irods_path, dest, get_dataobject(session, irods_path).size)]
+        folders = []
+        n_queries = 2
+    new, replaced, skip = _split_plan(source_to_dest, lambda dest: dest.exists(), overwrite)
+    return TransferPlan(False, new, replaced, skip, folders, n_queries)
+
 def get_size(session: Session, item: Union[irods.data_object.iRODSDataObject,
                                irods.collection.iRODSCollection]) -> int:
     """Collect the sizes of a data object or a
-    collection.
+    collection. The sizes in a collection are summed by the server.
 
     Parameters
     ----------
@@ -335,8 +917,7 @@ def get_size(session: Session, item: Union[irods.data_object.iRODSDataObject,
     """
     if is_dataobject(item):
         return item.size
-    all_objs = _get_data_objects(session, item)
-    return sum(size for _, _, size, _ in all_objs)
+    return sum(size for size, _ in size_totals(session, item.path).values())
 
 def _get_data_objects(session: Session,
                       coll: irods.collection.iRODSCollection) -> list[str, str, int, str]:
@@ -358,10 +939,10 @@ def _get_data_objects(session: Session,
             for obj in coll.data_objects]
 
     # all objects in subcollections
-    data_query = session.irods_session.query(kw.COLL_NAME, kw.DATA_NAME,
-                                                  DataObject.size, DataObject.checksum)
+    data_query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME,
+                            DataObject.size, DataObject.checksum)
     data_query = data_query.filter(kw.LIKE(kw.COLL_NAME, coll.path+"/%"))
-    for res in data_query.get_results():
+    for res in data_query:
         path, name, size, checksum = res.values()
         objs.append((path, name, size, checksum))
 
@@ -377,8 +958,10 @@ def create_collection(session: Session,
         Collection path
     """
     try:
-        return session.irods_session.collections.create(str(coll_path))
+        coll = session.irods_session.collections.create(str(coll_path))
     except irods.exception.CUT_ACTION_PROCESSED_ERR as exc:
         raise irods.exception.CUT_ACTION_PROCESSED_ERR(
                 f"While creating collection at '{coll_path}': iRODS server forbids action."
               ) from exc
+    invalidate(session, coll_path)
+    return coll
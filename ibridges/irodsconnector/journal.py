@@ -0,0 +1,171 @@
+""" transfer journal for resumable uploads and downloads
+"""
+import itertools
+import json
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+# Number of bytes between two recorded offsets of a journaled download.
+CHECKPOINT_SIZE = 64 * 2**20
+
+
+class TransferJournal():  # pylint: disable=too-many-instance-attributes
+    """Record of the progress of a collection upload or download.
+
+    The journal is a JSON-lines file with one event per line: the source and
+    destination of the job, the planned (source, destination, size) items with,
+    for downloads, the checksums of the sources, the end of the plan, the start
+    of a transfer, the number of bytes transferred so far and the completion of
+    a transfer. When a transfer is run again with the
+    same journal, the plan is read from the journal instead of listing the source
+    again and completed items are not transferred again. A plan that was not
+    written completely is discarded, so that the job is planned again.
+
+    Events are flushed to disk immediately, so that the journal survives a crash
+    of the process. A line that was only partially written is ignored.
+    """
+
+    def __init__(self, journal_path: Union[str, Path]):
+        """Open an existing journal or create a new one.
+
+        Parameters
+        ----------
+        journal_path : str or Path
+            Location of the journal file.
+        """
+        self.journal_path = Path(journal_path)
+        self._job: Optional[tuple[str, str]] = None
+        self._planned: Optional[list[tuple[str, str, int]]] = None
+        self._existing: set[str] = set()
+        self._checksums: dict[str, str] = {}
+        self._offsets: dict[str, int] = {}
+        self._done: set[str] = set()
+        self._lock = threading.Lock()
+        if self.journal_path.is_file():
+            self._load()
+
+    def _load(self):
+        line = "\n"
+        # The plan that is being read, it only counts once it is complete.
+        job, planned, existing, checksums = None, [], set(), {}
+        with open(self.journal_path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if event["event"] == "plan_start":
+                    job, planned = (event["source"], event["dest"]), []
+                    existing, checksums = set(), {}
+                elif event["event"] == "plan":
+                    planned.append((event["source"], event["dest"], event["size"]))
+                    if event["exists"]:
+                        existing.add(event["dest"])
+                    if event.get("checksum"):
+                        checksums[event["source"]] = event["checksum"]
+                elif event["event"] == "plan_complete" and job is not None:
+                    self._job, self._planned = job, planned
+                    self._existing, self._checksums = existing, checksums
+                elif event["event"] == "start":
+                    self._offsets.setdefault(event["source"], 0)
+                elif event["event"] == "offset":
+                    self._offsets[event["source"]] = event["offset"]
+                elif event["event"] == "done":
+                    self._done.add(event["source"])
+        if not line.endswith("\n"):
+            # Terminate a partially written line, so that new events are readable.
+            with open(self.journal_path, "a", encoding="utf-8") as handle:
+                handle.write("\n")
+
+    def _write(self, events: Iterable[dict]):
+        with self._lock, open(self.journal_path, "a", encoding="utf-8") as handle:
+            for event in events:
+                handle.write(json.dumps(event) + "\n")
+            handle.flush()
+
+    @property
+    def planned(self) -> Optional[list[tuple[str, str, int]]]:
+        """The planned (source, destination, size) items, None if nothing was planned completely."""
+        return self._planned
+
+    def resume_plan(self, source: str, dest: str) -> Optional[list[tuple[str, str, int]]]:
+        """The planned items of the job from `source` to `dest`, see planned.
+
+        Raises
+        ------
+        ValueError
+            If the journal is the plan of a job with another source or destination.
+        """
+        if self._planned is not None and self._job != (source, dest):
+            raise ValueError(f"Journal '{self.journal_path}' records the transfer of "
+                             f"'{self._job[0]}' to '{self._job[1]}', not of '{source}' "
+                             f"to '{dest}'.")
+        return self._planned
+
+    @property
+    def existing(self) -> set[str]:
+        """Destinations that already existed when the transfer was planned."""
+        return self._existing
+
+    @property
+    def checksums(self) -> dict[str, str]:
+        """Source -> checksum of the planned sources that have a checksum."""
+        return self._checksums
+
+    def plan(self, source: str, dest: str, source_to_dest: Iterable[tuple[str, str, int]],
+             existing: Iterable[str] = (), checksums: Optional[dict[str, str]] = None):
+        """Record the planned transfers of the job from `source` to `dest`.
+
+        The plan is followed by a 'plan_complete' event; without it the plan is
+        ignored when the journal is opened again.
+
+        Parameters
+        ----------
+        source : str
+            Source directory or collection of the job.
+        dest : str
+            Destination collection or directory of the job.
+        source_to_dest : Iterable
+            All (source, destination, size in bytes) items of the transfer.
+        existing : Iterable
+            Destinations that already exist before the transfer.
+        checksums : dict
+            Source -> checksum, e.g. of the data objects of a download, so that a
+            resumed download can verify them without listing the source again.
+        """
+        self._job = (source, dest)
+        self._planned = list(source_to_dest)
+        self._existing = set(existing)
+        self._checksums = {item_source: checksum
+                           for item_source, checksum in (checksums or {}).items() if checksum}
+        self._write(itertools.chain(
+            [{"event": "plan_start", "source": source, "dest": dest}],
+            ({"event": "plan", "source": item_source, "dest": item_dest, "size": size,
+              "exists": item_dest in self._existing,
+              "checksum": self._checksums.get(item_source)}
+             for item_source, item_dest, size in self._planned),
+            [{"event": "plan_complete"}]))
+
+    def start(self, source: str):
+        """Record the start of the transfer of `source`."""
+        self._offsets.setdefault(source, 0)
+        self._write([{"event": "start", "source": source}])
+
+    def progress(self, source: str, offset: int):
+        """Record that the first `offset` bytes of `source` have been transferred."""
+        self._offsets[source] = offset
+        self._write([{"event": "offset", "source": source, "offset": offset}])
+
+    def done(self, source: str):
+        """Record that the transfer of `source` is complete."""
+        self._done.add(source)
+        self._write([{"event": "done", "source": source}])
+
+    def is_done(self, source: str) -> bool:
+        """Whether the transfer of `source` has been completed."""
+        return source in self._done
+
+    def offset(self, source: str) -> Optional[int]:
+        """Bytes of `source` transferred so far, None if its transfer never started."""
+        return self._offsets.get(source)
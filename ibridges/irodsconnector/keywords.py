@@ -17,13 +17,25 @@ REG_CHKSUM_KW = kw.REG_CHKSUM_KW
 # Map model names to iquest attribute names
 COLL_NAME = imodels.Collection.name
 COLL_ID = imodels.Collection.id
+COLL_PARENT_NAME = imodels.Collection.parent_name
+COLL_MODIFY_TIME = imodels.Collection.modify_time
 DATA_NAME = imodels.DataObject.name
 DATA_ID = imodels.DataObject.id
+DATA_COLL_ID = imodels.DataObject.collection_id
 DATA_CHECKSUM = imodels.DataObject.checksum
+DATA_SIZE = imodels.DataObject.size
+DATA_MODIFY_TIME = imodels.DataObject.modify_time
+DATA_REPL_NUM = imodels.DataObject.replica_number
+META_COLL_ATTR_ID = imodels.CollectionMeta.id
 META_COLL_ATTR_NAME = imodels.CollectionMeta.name
 META_COLL_ATTR_VALUE = imodels.CollectionMeta.value
+META_COLL_ATTR_UNITS = imodels.CollectionMeta.units
+META_COLL_MODIFY_TIME = imodels.CollectionMeta.modify_time
+META_DATA_ATTR_ID = imodels.DataObjectMeta.id
 META_DATA_ATTR_NAME = imodels.DataObjectMeta.name
 META_DATA_ATTR_VALUE = imodels.DataObjectMeta.value
+META_DATA_ATTR_UNITS = imodels.DataObjectMeta.units
+META_DATA_MODIFY_TIME = imodels.DataObjectMeta.modify_time
 RESC_NAME = imodels.Resource.name
 RESC_PARENT = imodels.Resource.parent
 RESC_STATUS = imodels.Resource.status
@@ -33,6 +45,7 @@ USER_NAME = imodels.User.name
 USER_TYPE = imodels.User.type
 # Query operators
 LIKE = cm.Like
+IN = cm.In
 # ASCII colors
 BLUE = '\x1b[1;34m'
 DEFAULT = '\x1b[0m'
@@ -0,0 +1,250 @@
+""" query builder for the iRODS catalog
+"""
+from __future__ import annotations
+
+import copy
+import time
+from contextlib import closing
+from typing import Iterator, NamedTuple, Optional
+
+from irods.column import Criterion
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.session import Session
+
+# Maximum number of rows the server returns per page.
+MAX_PAGE_SIZE = 500
+AGGREGATES = ("count", "sum", "min", "max", "avg")
+
+
+class AnyOf(Criterion):  # pylint: disable=too-few-public-methods
+    """Conditions on one column of which at least one should hold (OR).
+
+    The disjunction is evaluated by the server. GenQuery can only combine
+    conditions on the same column with OR; conditions on different columns
+    are always combined with AND.
+    """
+
+    def __init__(self, *criteria: Criterion):
+        if not criteria:
+            raise ValueError("AnyOf needs at least one condition.")
+        column = criteria[0].query_key
+        if any(criterion.query_key is not column for criterion in criteria):
+            raise ValueError("GenQuery can only combine conditions on the same column with OR.")
+        super().__init__(criteria[0].op, column, None)
+        self.criteria = criteria
+
+    @property
+    def value(self):
+        # A condition is sent as '<op> <value>', alternatives are separated by '||'.
+        return " || ".join([self.criteria[0].value]
+                           + [f"{criterion.op} {criterion.value}"
+                              for criterion in self.criteria[1:]])
+
+
+def tree_condition(root: str) -> AnyOf:
+    """Condition on COLL_NAME for the collection `root` and all its subcollections.
+
+    Unlike LIKE '<root>%' it does not match siblings whose name starts with the
+    name of `root`, e.g. 'run10' for 'run1'.
+    """
+    return AnyOf(kw.COLL_NAME == root, kw.LIKE(kw.COLL_NAME, root.rstrip("/") + "/%"))
+
+
+class QueryStats(NamedTuple):
+    """Measurements of a finished query, passed to the query hook of the session."""
+    explain: str
+    n_rows: int
+    n_pages: int
+    seconds: float
+
+
+class IrodsQuery():
+    """Query on the iRODS catalog, built up step by step.
+
+    Every step returns a new query, so a partially built query can be reused.
+    The rows are dictionaries from the selected columns to their values; like
+    all GenQueries only distinct rows are returned.
+
+    If the session has a `query_hook`, it is called with the QueryStats of every
+    query when its rows are exhausted or the iteration stops. The time is the
+    time spent waiting for the server, not the time spent on the rows.
+
+    Examples
+    --------
+    >>> query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME, kw.DATA_SIZE)
+    >>> query = query.filter(kw.LIKE(kw.COLL_NAME, "/zone/home/%"))
+    >>> for row in query.order_by(kw.DATA_SIZE, descending=True).limit(10):
+    ...     print(row[kw.DATA_NAME], row[kw.DATA_SIZE])
+    """
+
+    def __init__(self, session: Session, *columns):
+        """Select columns.
+
+        Parameters
+        ----------
+        session : Session
+            The session whose catalog is queried.
+        columns
+            Columns (e.g. keywords.COLL_NAME) or models (e.g. irods.models.DataObject)
+            to select.
+        """
+        if not columns:
+            raise ValueError("A query needs at least one column.")
+        self.session = session
+        self.columns = columns
+        self.conditions: tuple = ()
+        self.ordering: tuple = ()
+        self.aggregates: dict = {}
+        self._limit: Optional[int] = None
+        self._page_size = MAX_PAGE_SIZE
+
+    def _copy(self, **attributes) -> IrodsQuery:
+        new_query = copy.copy(self)
+        for name, value in attributes.items():
+            setattr(new_query, name, value)
+        return new_query
+
+    def filter(self, *conditions: Criterion) -> IrodsQuery:
+        """Add conditions that should all hold (AND), use AnyOf for OR."""
+        return self._copy(conditions=self.conditions + conditions)
+
+    def order_by(self, column, descending: bool = False) -> IrodsQuery:
+        """Sort the rows on the server by `column`, after the previous orderings.
+
+        A column that is not selected is added to the selection.
+        """
+        return self._copy(ordering=self.ordering + ((column, descending),))
+
+    def limit(self, limit: int) -> IrodsQuery:
+        """Return at most `limit` rows; the server query is closed when they are read."""
+        if limit < 0:
+            raise ValueError(f"Limit should not be negative, not {limit}.")
+        return self._copy(_limit=limit)
+
+    def page_size(self, page_size: int) -> IrodsQuery:
+        """Number of rows the server sends per round trip."""
+        if not 0 < page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"Page size should be between 1 and {MAX_PAGE_SIZE}, "
+                             f"not {page_size}.")
+        return self._copy(_page_size=page_size)
+
+    def aggregate(self, function: str, column) -> IrodsQuery:
+        """Replace the values of `column` by an aggregate of them.
+
+        The rows are grouped by the other selected columns.
+
+        Parameters
+        ----------
+        function : str
+            One of 'count', 'sum', 'min', 'max' and 'avg'.
+        column
+            Column to aggregate, it is added to the selection if needed.
+        """
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{function}', choose from {AGGREGATES}.")
+        return self._copy(aggregates={**self.aggregates, column: function})
+
+    def count(self, column) -> IrodsQuery:
+        """Count the values of `column`, see aggregate."""
+        return self.aggregate("count", column)
+
+    def sum(self, column) -> IrodsQuery:
+        """Sum the values of `column`, see aggregate."""
+        return self.aggregate("sum", column)
+
+    def min(self, column) -> IrodsQuery:
+        """Minimum of the values of `column`, see aggregate."""
+        return self.aggregate("min", column)
+
+    def max(self, column) -> IrodsQuery:
+        """Maximum of the values of `column`, see aggregate."""
+        return self.aggregate("max", column)
+
+    def avg(self, column) -> IrodsQuery:
+        """Average of the values of `column`, see aggregate."""
+        return self.aggregate("avg", column)
+
+    def explain(self) -> str:
+        """Description of the query in iquest-like syntax."""
+        # Columns compare to criteria with ==, so they are compared by identity.
+        columns = list(self.columns)
+        for col in list(self.aggregates) + [col for col, _ in self.ordering]:
+            if not any(col is other for other in columns):
+                columns.append(col)
+        select = [f"{self.aggregates[col].upper()}({_name(col)})" if col in self.aggregates
+                  else _name(col) for col in columns]
+        text = "SELECT " + ", ".join(select)
+        if self.conditions:
+            text += " WHERE " + " AND ".join(
+                f"{_name(cond.query_key)} {cond.op} {cond.value}" for cond in self.conditions)
+        if self.ordering:
+            text += " ORDER BY " + ", ".join(
+                _name(col) + (" DESC" if descending else "")
+                for col, descending in self.ordering)
+        if self._limit is not None:
+            text += f" LIMIT {self._limit}"
+        return text
+
+    def _prc_query(self):
+        """Build a fresh query of the python-irodsclient."""
+        query = self.session.irods_session.query(*self.columns)
+        for condition in self.conditions:
+            query = query.filter(condition)
+        for column, function in self.aggregates.items():
+            query = getattr(query, function)(column)
+        for column, descending in self.ordering:
+            query = query.order_by(column, "desc" if descending else "asc")
+        page_size = self._page_size if self._limit is None else min(self._page_size,
+                                                                      self._limit)
+        if page_size != MAX_PAGE_SIZE:
+            query = query.limit(page_size)
+        return query
+
+    def batches(self) -> Iterator[list[dict]]:
+        """Iterate over the rows page by page, as they are sent by the server.
+
+        When the iteration stops early, the query is closed on the server.
+        """
+        if self._limit == 0:
+            return
+        n_rows, n_pages, seconds = 0, 0, 0.0
+        pages = self._prc_query().get_batches()
+        try:
+            while self._limit is None or n_rows < self._limit:
+                start = time.perf_counter()
+                result_set = next(pages, None)
+                seconds += time.perf_counter() - start
+                if result_set is None:
+                    break
+                n_pages += 1
+                rows = list(result_set)
+                if self._limit is not None:
+                    rows = rows[:self._limit-n_rows]
+                n_rows += len(rows)
+                if rows:
+                    yield rows
+        finally:
+            start = time.perf_counter()
+            pages.close()
+            seconds += time.perf_counter() - start
+            hook = getattr(self.session, "query_hook", None)
+            if hook is not None:
+                hook(QueryStats(self.explain(), n_rows, n_pages, seconds))
+
+    def __iter__(self) -> Iterator[dict]:
+        for rows in self.batches():
+            yield from rows
+
+    def all(self) -> list[dict]:
+        """All rows."""
+        return list(self)
+
+    def first(self) -> Optional[dict]:
+        """The first row, or None if there are no rows."""
+        with closing(iter(self.limit(1))) as rows:
+            return next(rows, None)
+
+
+def _name(column) -> str:
+    return getattr(column, "icat_key", getattr(column, "__name__", str(column)))
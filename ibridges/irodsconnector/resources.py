@@ -6,6 +6,7 @@ import irods.exception
 import irods.resource
 
 from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.query import IrodsQuery
 from ibridges.irodsconnector.session import Session
 
 
@@ -121,10 +122,10 @@ class Resources():
 
         """
         if self._resources is None or update:
-            query = self.session.irods_session.query(
-                kw.RESC_NAME, kw.RESC_PARENT, kw.RESC_STATUS, kw.RESC_CONTEXT)
+            query = IrodsQuery(self.session, kw.RESC_NAME, kw.RESC_PARENT, kw.RESC_STATUS,
+                               kw.RESC_CONTEXT)
             resc_list = []
-            for item in query.get_results():
+            for item in query:
                 name, parent, status, context = item.values()
                 free_space = 0
                 if parent is None:
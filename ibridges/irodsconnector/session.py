@@ -3,12 +3,13 @@
 import json
 import os
 import warnings
-from typing import Optional
+from typing import Callable, Optional
 
 import irods.session
 from irods.exception import NetworkException
 
 from ibridges.irodsconnector.keywords import exceptions
+from ibridges.irodsconnector.stat_cache import StatCache
 
 
 class Session:
@@ -44,6 +45,9 @@ class Session:
 
 
         self._password = password
+        self.stat_cache: Optional[StatCache] = None
+        # Called with the QueryStats of every IrodsQuery, e.g. to time queries.
+        self.query_hook: Optional[Callable] = None
         self._irods_env = irods_env
         self._irods_env_path = irods_env_path
         self._irods_session = self.connect()
@@ -69,6 +73,26 @@ class Session:
     def home(self, value):
         self._irods_env["irods_home"] = value
 
+    def enable_stat_cache(self, ttl: float = 60.0) -> StatCache:
+        """Cache the existence checks of IrodsPaths of this session.
+
+        Parameters
+        ----------
+        ttl : float
+            Number of seconds an answer of the server stays valid.
+
+        Returns
+        -------
+        StatCache
+            The cache, with its hit and miss counters.
+        """
+        self.stat_cache = StatCache(ttl)
+        return self.stat_cache
+
+    def disable_stat_cache(self):
+        """Stop caching existence checks."""
+        self.stat_cache = None
+
     def __del__(self):
         del self.irods_session
 
@@ -0,0 +1,121 @@
+""" time-limited cache of existence checks
+"""
+import threading
+import time
+from typing import Iterator, Optional
+
+COLLECTION = "collection"
+DATAOBJECT = "dataobject"
+
+
+class StatCache():
+    """Cache of the answers of collection_exists and dataobject_exists of a session.
+
+    Answers are kept for `ttl` seconds. Writes done through iBridges (uploads,
+    removal and creation of collections) invalidate the paths they touch, but
+    changes by other clients are only seen after the answers expire.
+
+    Every hit saves one round trip to the server.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        """Create an empty cache.
+
+        Parameters
+        ----------
+        ttl : float
+            Number of seconds an answer stays valid.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # path -> {COLLECTION or DATAOBJECT: (exists, expiry time)}
+        self._entries: dict[str, dict[str, tuple[bool, float]]] = {}
+        # collection path -> paths directly below it that are cached or have
+        # cached paths below them, so that a tree is invalidated without a scan
+        self._children: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def round_trips_saved(self) -> int:
+        """Number of server round trips that were saved."""
+        return self.hits
+
+    def __len__(self) -> int:
+        return sum(len(kinds) for kinds in self._entries.values())
+
+    def __repr__(self) -> str:
+        return (f"StatCache(ttl={self.ttl}, entries={len(self)}, hits={self.hits}, "
+                f"misses={self.misses})")
+
+    def get(self, path: str, kind: str) -> Optional[bool]:
+        """Cached answer whether `path` is a `kind`, None if it is not known (anymore)."""
+        with self._lock:
+            entry = self._entries.get(path, {}).get(kind)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, path: str, kind: str, exists: bool):
+        """Store whether `path` is a `kind`.
+
+        A path that is a collection is not a data object and vice versa,
+        so a positive answer is stored for both kinds.
+        """
+        expiry = time.monotonic() + self.ttl
+        with self._lock:
+            kinds = self._entries.setdefault(path, {})
+            kinds[kind] = (exists, expiry)
+            if exists:
+                other = DATAOBJECT if kind == COLLECTION else COLLECTION
+                kinds[other] = (False, expiry)
+            # Link the path to its parents, up to the first parent that is already linked.
+            child = path
+            for parent in _parents(path):
+                siblings = self._children.get(parent)
+                if siblings is not None:
+                    siblings.add(child)
+                    break
+                self._children[parent] = {child}
+                child = parent
+
+    def invalidate(self, path: str):
+        """Forget `path`, everything below it and all its parents.
+
+        The parents are included, since writes can create missing collections.
+        The cost depends on the depth of `path` and the number of cached paths
+        below it, not on the size of the cache.
+        """
+        with self._lock:
+            for parent in _parents(path):
+                self._entries.pop(parent, None)
+            parent = next(_parents(path), None)
+            if parent in self._children:
+                self._children[parent].discard(path)
+            tree = [path]
+            while tree:
+                tree_path = tree.pop()
+                self._entries.pop(tree_path, None)
+                tree.extend(self._children.pop(tree_path, ()))
+
+    def clear(self):
+        """Forget all answers."""
+        with self._lock:
+            self._entries.clear()
+            self._children.clear()
+
+
+def _parents(path: str) -> Iterator[str]:
+    """Parent collections of `path`, from the closest one up to the root."""
+    while path not in ("/", ""):
+        path = path.rsplit("/", 1)[0] or "/"
+        yield path
+
+
+def invalidate(session, path):
+    """Invalidate `path` in the stat cache of `session`, if it has one."""
+    stat_cache = getattr(session, "stat_cache", None)
+    if stat_cache is not None:
+        stat_cache.invalidate(str(path))
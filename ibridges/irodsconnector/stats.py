@@ -0,0 +1,98 @@
+""" aggregate statistics of collection trees
+"""
+from typing import NamedTuple, Optional, Union
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.query import IrodsQuery, tree_condition
+from ibridges.irodsconnector.session import Session
+from ibridges.utils.path import IrodsPath
+
+
+class CollectionStats(NamedTuple):
+    """Totals of the data objects in a collection tree, as returned by collection_stats."""
+    total_size: int
+    n_dataobjects: int
+    largest_size: int
+    largest_path: Optional[str]
+    per_collection: Optional[dict[str, tuple[int, int]]] = None
+
+
+def collection_stats(session: Session, irods_path: Union[str, IrodsPath],
+                     per_collection: bool = False) -> CollectionStats:
+    """Compute the total size, the number of data objects and the largest data object of a tree.
+
+    The totals are computed by the server with an aggregate query, so that the
+    data objects themselves are not transferred. The largest data object is
+    found with a second query that returns a single row.
+
+    Parameters
+    ----------
+    irods_path : str or IrodsPath
+        Collection of which the tree is summarized.
+    per_collection : bool
+        Also return the totals of the data objects directly in each collection.
+
+    Returns
+    -------
+    CollectionStats
+        Total size in bytes, number of data objects, size and path of the largest
+        data object and, if requested, collection path -> (total size, number of
+        data objects).
+    """
+    root = str(IrodsPath(session, irods_path))
+    totals = size_totals(session, root, per_collection)
+    n_dataobjects = sum(count for _, count in totals.values())
+    largest = None
+    if n_dataobjects:
+        largest = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME, kw.DATA_SIZE).filter(
+            tree_condition(root)).order_by(kw.DATA_SIZE, descending=True).first()
+    if largest is None:
+        largest_size, largest_path = 0, None
+    else:
+        largest_size = int(largest[kw.DATA_SIZE])
+        largest_path = largest[kw.COLL_NAME].rstrip("/") + "/" + largest[kw.DATA_NAME]
+    return CollectionStats(sum(size for size, _ in totals.values()), n_dataobjects,
+                           largest_size, largest_path, totals if per_collection else None)
+
+def size_totals(session: Session, irods_path: Union[str, IrodsPath],
+                per_collection: bool = False) -> dict[str, tuple[int, int]]:
+    """Total size and number of data objects of a tree, or of each of its collections.
+
+    SUM and COUNT aggregate over replicas, so the totals are grouped by replica
+    number. Only if a group turns out to contain data objects with several
+    replicas, the sizes of the data objects are retrieved instead and every
+    data object is counted once.
+
+    Returns
+    -------
+    dict
+        Collection path (only `irods_path` itself if not `per_collection`) ->
+        (total size, number of data objects).
+    """
+    root = str(IrodsPath(session, irods_path))
+    group_by = (kw.COLL_NAME, kw.DATA_REPL_NUM) if per_collection else (kw.DATA_REPL_NUM,)
+    query = IrodsQuery(session, *group_by).sum(kw.DATA_SIZE).count(kw.DATA_ID).filter(
+        tree_condition(root))
+    totals: dict[str, tuple[int, int]] = {}
+    replicated = False
+    for res in query:
+        # An empty tree gives a single row without values.
+        if not res[kw.DATA_ID]:
+            continue
+        coll_name = res[kw.COLL_NAME] if per_collection else root
+        replicated = replicated or coll_name in totals
+        total_size, count = totals.get(coll_name, (0, 0))
+        totals[coll_name] = (total_size + int(res[kw.DATA_SIZE]), count + int(res[kw.DATA_ID]))
+
+    if replicated:
+        # data id -> (collection, size), replicas have the same data id.
+        sizes = {}
+        query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_ID, kw.DATA_SIZE)
+        for res in query.filter(tree_condition(root)):
+            sizes[res[kw.DATA_ID]] = (res[kw.COLL_NAME] if per_collection else root,
+                                      int(res[kw.DATA_SIZE]))
+        totals = {}
+        for coll_name, size in sizes.values():
+            total_size, count = totals.get(coll_name, (0, 0))
+            totals[coll_name] = (total_size + size, count + 1)
+    return totals
@@ -6,6 +6,7 @@ import irods.ticket
 from irods.models import TicketQuery
 
 import ibridges.irodsconnector.keywords as kw
+from ibridges.irodsconnector.query import IrodsQuery
 from ibridges.irodsconnector.session import Session
 
 
@@ -94,7 +95,7 @@ class Tickets():
         user = self.session.username
         if update or self._all_tickets is None:
             self._all_tickets = []
-            for row in self.session.irods_session.query(TicketQuery.Ticket).filter(
+            for row in IrodsQuery(self.session, TicketQuery.Ticket).filter(
                     TicketQuery.Owner.name == user):
                 self._all_tickets.append((row[TicketQuery.Ticket.string],
                                           row[TicketQuery.Ticket.type],
@@ -130,15 +131,11 @@ class Tickets():
             collection or data object path
             returns '' if the identifier does not exist any longer
         """
-        data_query = self.session.irods_session.query(kw.COLL_NAME, kw.DATA_NAME)
-        data_query = data_query.filter(kw.DATA_ID == itemid)
-
-        if len(list(data_query)) > 0:
-            res = next(data_query.get_results())
-            return list(res.values())[0] + "/" + list(res.values())[1]
-        coll_query = self.session.irods_session.query(kw.COLL_NAME)
-        coll_query = coll_query.filter(kw.COLL_ID == itemid)
-        if len(list(coll_query)) > 0:
-            res = next(coll_query.get_results())
-            return list(res.values())[0]
+        res = IrodsQuery(self.session, kw.COLL_NAME, kw.DATA_NAME).filter(
+            kw.DATA_ID == itemid).first()
+        if res is not None:
+            return res[kw.COLL_NAME] + "/" + res[kw.DATA_NAME]
+        res = IrodsQuery(self.session, kw.COLL_NAME).filter(kw.COLL_ID == itemid).first()
+        if res is not None:
+            return res[kw.COLL_NAME]
         return ''
@@ -0,0 +1,385 @@
+""" transfer bookkeeping and concurrency
+"""
+import abc
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+import irods.exception
+
+
+class TransferStats():  # pylint: disable=too-many-instance-attributes
+    """Aggregate counters of an upload or download.
+
+    The counters are protected by a lock, so that they can be updated
+    from several worker threads at once. `total_files` and `total_bytes` are
+    the size of the whole job; for a collection download `total_bytes` equals
+    `get_size` of the collection. For uploads, `n_collections` is the
+    number of create calls for the destination collections, made up front, and
+    `round_trips_saved` the number of create calls saved compared to creating
+    the parent collection for every file. Parallel uploads of sparse trees can
+    need more create calls than files; `round_trips_saved` is then 0.
+    """
+
+    def __init__(self):
+        self.total_files = 0
+        self.total_bytes = 0
+        self.n_files = 0
+        self.n_bytes = 0
+        self.n_skipped = 0
+        self.n_errors = 0
+        self.n_collections = 0
+        self.round_trips_saved = 0
+        self.elapsed = 0.0
+        self._start = time.monotonic()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def add_transferred(self, size: int):
+        """Register a transferred file of `size` bytes."""
+        with self._lock:
+            self.n_files += 1
+            self.n_bytes += size
+
+    def add_skipped(self):
+        """Register a file that was skipped, e.g. because it already exists."""
+        with self._lock:
+            self.n_skipped += 1
+
+    def add_error(self):
+        """Register a file that could not be transferred."""
+        with self._lock:
+            self.n_errors += 1
+
+    def stop(self):
+        """Stop the clock of the transfer."""
+        self.elapsed = time.monotonic() - self._start
+        self._stopped = True
+
+    def _elapsed(self) -> float:
+        if self._stopped:
+            return self.elapsed
+        return time.monotonic() - self._start
+
+    @property
+    def throughput(self) -> float:
+        """Aggregate throughput in bytes per second."""
+        elapsed = self._elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return self.n_bytes / elapsed
+
+    @property
+    def files_per_second(self) -> float:
+        """Number of transferred files per second."""
+        elapsed = self._elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return self.n_files / elapsed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated number of seconds until the job is done, None if unknown."""
+        throughput = self.throughput
+        if throughput <= 0:
+            return None
+        return max(0, self.total_bytes - self.n_bytes) / throughput
+
+    def __repr__(self) -> str:
+        return (f"TransferStats(files={self.n_files}, bytes={self.n_bytes}, "
+                f"skipped={self.n_skipped}, elapsed={self._elapsed():.2f}s, "
+                f"throughput={self.throughput:.0f}B/s)")
+
+
+# Estimated server round trips of a single file transfer, excluding the data itself.
+# put: collection check, open, close and replication of the new object.
+ROUND_TRIPS_PER_PUT = 4
+# get: existence check (collection and object query), collection lookup, open and close.
+ROUND_TRIPS_PER_GET = 5
+# create_collection: create and retrieve.
+ROUND_TRIPS_PER_COLLECTION = 2
+
+
+class TransferPlan():
+    """Work list of an upload or download, computed without transferring data.
+
+    `new`, `overwrite` and `skip` contain (source, destination, size) tuples of
+    files whose destination does not exist yet, will be overwritten or will be
+    skipped because it exists. `collections` are the destination collections
+    (upload) or folders (download) that are created, shallowest first.
+    `n_queries` is the number of queries that were needed for the plan.
+    """
+
+    def __init__(self, upload: bool, new: list, overwrite: list, skip: list,
+                 collections: list, n_queries: int):
+        self.upload = upload
+        self.new = new
+        self.overwrite = overwrite
+        self.skip = skip
+        self.collections = collections
+        self.n_queries = n_queries
+
+    @property
+    def n_files(self) -> int:
+        """Number of files that are transferred."""
+        return len(self.new) + len(self.overwrite)
+
+    @property
+    def total_bytes(self) -> int:
+        """Number of bytes that are transferred, e.g. to check the free space of a resource."""
+        return sum(size for _, _, size in self.new + self.overwrite)
+
+    @property
+    def round_trips(self) -> int:
+        """Rough estimate of the number of server round trips of the transfer.
+
+        This includes the queries for the plan, but not the round trips that
+        carry the data of large files.
+        """
+        if self.upload:
+            return self.n_queries + ROUND_TRIPS_PER_PUT * self.n_files \
+                + ROUND_TRIPS_PER_COLLECTION * len(self.collections)
+        return self.n_queries + ROUND_TRIPS_PER_GET * self.n_files
+
+    def __repr__(self) -> str:
+        return (f"TransferPlan(new={len(self.new)}, overwrite={len(self.overwrite)}, "
+                f"skip={len(self.skip)}, bytes={self.total_bytes}, "
+                f"collections={len(self.collections)}, round_trips={self.round_trips})")
+
+
+class TransferHook():
+    """Receiver of the events of an upload or download.
+
+    All methods do nothing by default; override the ones you need, e.g. to feed
+    a monitoring system. For collection transfers with several workers the
+    methods are called from the worker threads. The number of bytes is reported
+    per file once it is transferred, since PRC does not report progress within
+    a file; journaled downloads report progress for every checkpoint.
+    """
+
+    def on_job_start(self, stats: TransferStats):
+        """Called once the job is planned; `stats` holds the job totals and live counters."""
+
+    def on_start(self, source: str, dest: str, size: int):
+        """Called before the transfer of a file of `size` bytes starts."""
+
+    def on_progress(self, source: str, n_bytes: int):
+        """Called when another `n_bytes` bytes of `source` are transferred."""
+
+    def on_finish(self, source: str, dest: str, size: int):
+        """Called after a file has been transferred successfully."""
+
+    def on_skip(self, source: str, dest: str):
+        """Called when a file is skipped because its destination already exists."""
+
+    def on_error(self, source: str, dest: str, error: Exception):
+        """Called when the transfer of a file fails; the error is raised afterwards."""
+
+    def on_job_finish(self, stats: TransferStats):
+        """Called when all files have been handled."""
+
+
+@contextmanager
+def track_transfer(stats: TransferStats, hook: TransferHook, source, dest, size: int,
+                   skip_warning: Optional[str] = None, report_progress: bool = True):
+    """Report the transfer of a single file, done in the body, to `stats` and `hook`.
+
+    Parameters
+    ----------
+    stats : TransferStats
+        Counters of the job.
+    hook : TransferHook
+        Receiver of the events.
+    source, dest
+        Source and destination paths of the file.
+    size : int
+        Size of the file in bytes.
+    skip_warning : str
+        If given, a destination that already exists is not an error: the file is
+        skipped with this warning.
+    report_progress : bool
+        Report all bytes as progress when the file is done. Disable this if the
+        body reports the progress itself.
+    """
+    hook.on_start(str(source), str(dest), size)
+    try:
+        yield
+    except irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG as error:
+        if skip_warning is None:
+            stats.add_error()
+            hook.on_error(str(source), str(dest), error)
+            raise
+        warnings.warn(f'{skip_warning}\n\tSkipping {source}')
+        stats.add_skipped()
+        hook.on_skip(str(source), str(dest))
+    except Exception as error:
+        stats.add_error()
+        hook.on_error(str(source), str(dest), error)
+        raise
+    else:
+        stats.add_transferred(size)
+        if report_progress:
+            hook.on_progress(str(source), size)
+        hook.on_finish(str(source), str(dest), size)
+
+
+class ThreadStrategy(abc.ABC):  # pylint: disable=too-few-public-methods
+    """Policy for the number of streams (PRC `num_threads`) of a single transfer.
+
+    Subclass it and override `n_threads` to tune the policy, e.g. for WAN links.
+    """
+
+    @abc.abstractmethod
+    def n_threads(self, size: int, available: int) -> int:
+        """Choose the number of streams for a transfer.
+
+        Parameters
+        ----------
+        size : int
+            Size of the file or data object in bytes.
+        available : int
+            Number of streams that are currently available in the global budget.
+
+        Returns
+        -------
+        int
+            Number of streams to use, at least 1.
+        """
+
+
+class SizeThreadStrategy(ThreadStrategy):  # pylint: disable=too-few-public-methods
+    """Give small files a single stream and large files one stream per `bytes_per_thread`.
+
+    The number of streams is capped by `max_threads` and by what is left
+    in the global budget.
+    """
+
+    def __init__(self, single_stream_size: int = 32 * 2**20,
+                 bytes_per_thread: int = 128 * 2**20, max_threads: int = 16):
+        """Initialize the strategy.
+
+        Parameters
+        ----------
+        single_stream_size : int
+            Files up to this size in bytes are transferred with one stream.
+        bytes_per_thread : int
+            Number of bytes per stream for larger files.
+        max_threads : int
+            Maximum number of streams of a single transfer.
+        """
+        self.single_stream_size = single_stream_size
+        self.bytes_per_thread = bytes_per_thread
+        self.max_threads = max_threads
+
+    def n_threads(self, size: int, available: int) -> int:
+        if size <= self.single_stream_size:
+            return 1
+        n_threads = min(self.max_threads, -(-size // self.bytes_per_thread), available)
+        return max(1, n_threads)
+
+
+class StreamBudget():
+    """Global cap on the number of data streams of concurrent transfers.
+
+    Every transfer asks for a number of streams (PRC `num_threads`) and gets
+    what is still available, but always at least one. If no stream is
+    available at all, the transfer waits until another transfer releases
+    its streams.
+    """
+
+    def __init__(self, max_streams: int):
+        if max_streams < 1:
+            raise ValueError(f"Maximum number of streams should be at least 1, not {max_streams}.")
+        self.max_streams = max_streams
+        self._available = max_streams
+        self._cond = threading.Condition()
+
+    def acquire(self, n_streams: int) -> int:
+        """Reserve up to `n_streams` streams and return the number granted."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._available > 0)
+            granted = max(1, min(n_streams, self._available))
+            self._available -= granted
+            return granted
+
+    def release(self, n_streams: int):
+        """Give back `n_streams` streams obtained with acquire."""
+        with self._cond:
+            self._available += n_streams
+            self._cond.notify_all()
+
+    @property
+    def available(self) -> int:
+        """Number of streams that are not in use."""
+        return self._available
+
+    @contextmanager
+    def reserve(self, size: int, strategy: ThreadStrategy) -> Iterator[int]:
+        """Reserve streams for the transfer of `size` bytes, as chosen by `strategy`.
+
+        Yields
+        ------
+        int
+            The number of streams that the transfer can use.
+        """
+        n_streams = self.acquire(strategy.n_threads(size, self.available))
+        try:
+            yield n_streams
+        finally:
+            self.release(n_streams)
+
+
+def largest_first(jobs: Iterable[tuple]) -> list[tuple]:
+    """Order transfer jobs by decreasing size (longest processing time first).
+
+    Starting the largest files first prevents a large file from being left for
+    the end, where it would run alone while the other workers are idle; the
+    small files fill up the workers that finish early.
+
+    Parameters
+    ----------
+    jobs : Iterable[tuple]
+        Transfer jobs, with the size in bytes as the last element.
+
+    Returns
+    -------
+    list of tuples
+        The jobs, largest first.
+    """
+    return sorted(jobs, key=lambda job: job[-1], reverse=True)
+
+
+def execute_jobs(func: Callable, jobs: Iterable[tuple], n_workers: int = 1):
+    """Call `func(*job)` for all jobs, using a pool of `n_workers` threads.
+
+    With a single worker the jobs are executed in order in the calling thread.
+    If one of the jobs raises an exception, the jobs that have not started yet
+    are cancelled and the exception is raised again.
+
+    Parameters
+    ----------
+    func : Callable
+        Function executing a single job.
+    jobs : Iterable[tuple]
+        Arguments for each of the calls to `func`.
+    n_workers : int
+        Maximum number of jobs that run at the same time.
+    """
+    if n_workers < 1:
+        raise ValueError(f"Number of workers should be at least 1, not {n_workers}.")
+    if n_workers == 1:
+        for job in jobs:
+            func(*job)
+        return
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(func, *job) for job in jobs]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
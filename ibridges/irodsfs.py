@@ -0,0 +1,218 @@
+""" fsspec filesystem for iRODS
+
+Registers the 'irods' protocol, so that pandas, xarray, Dask and pyarrow can
+read data objects in place, e.g.
+
+>>> import pandas as pd
+>>> pd.read_csv("irods://tempZone/home/rods/table.csv",
+...             storage_options={"session": session})
+
+Paths are absolute iRODS paths; the host and zone come from the session.
+This module needs the optional dependency fsspec (pip install ibridges[fsspec]).
+"""
+from datetime import timezone
+from typing import Optional
+
+try:
+    from fsspec.spec import AbstractBufferedFile, AbstractFileSystem
+except ImportError as exc:
+    raise ImportError("The iRODS filesystem needs fsspec, "
+                      "install it with 'pip install ibridges[fsspec]'.") from exc
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import create_collection
+from ibridges.irodsconnector.query import IrodsQuery, tree_condition
+from ibridges.irodsconnector.session import Session
+from ibridges.utils.path import IrodsPath
+
+
+class IrodsFileSystem(AbstractFileSystem):  # pylint: disable=abstract-method
+    """fsspec filesystem on top of an iBridges session.
+
+    Listings are retrieved with one query per kind of item (collections and data
+    objects), `find` with a single query for the whole tree. Files are read with
+    ranged reads on one open iRODS file per fsspec file, through the block cache
+    of fsspec (read-ahead by default).
+    """
+
+    protocol = "irods"
+    root_marker = "/"
+
+    def __init__(self, session: Optional[Session] = None,
+                 irods_env_path: Optional[str] = None, password: Optional[str] = None,
+                 **storage_options):
+        """Create the filesystem.
+
+        Parameters
+        ----------
+        session : Session
+            The iRODS session, if not given it is created from `irods_env_path`
+            and `password`.
+        irods_env_path : str
+            The irods_environment.json file, by default the one of the icommands.
+        password : str
+            Password for a new session, by default the cached password is used.
+        """
+        super().__init__(**storage_options)
+        if session is None:
+            session = Session(irods_env_path=irods_env_path or "~/.irods/irods_environment.json",
+                              password=password)
+        self.session = session
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        path = super()._strip_protocol(path)
+        if isinstance(path, list):
+            return path
+        return path if path.startswith("/") else "/" + path
+
+    def _dataobject_info(self, coll_name: str, data_name: str, size, modify_time,
+                         checksum) -> dict:
+        return {"name": coll_name.rstrip("/") + "/" + data_name, "size": int(size),
+                "type": "file", "checksum": checksum,
+                "mtime": modify_time.replace(tzinfo=timezone.utc).timestamp()}
+
+    def _query_dataobjects(self, *conditions) -> list[dict]:
+        data_query = IrodsQuery(self.session, kw.COLL_NAME, kw.DATA_NAME, kw.DATA_SIZE,
+                                kw.DATA_MODIFY_TIME, kw.DATA_CHECKSUM)
+        # Replicas show up as separate rows.
+        infos = {}
+        for res in data_query.filter(*conditions):
+            info = self._dataobject_info(*res.values())
+            infos.setdefault(info["name"], info)
+        return list(infos.values())
+
+    def ls(self, path, detail=True, **kwargs):
+        path = self._strip_protocol(path)
+        if not self.session.irods_session.collections.exists(path):
+            info = self.info(path)
+            return [info] if detail else [info["name"]]
+        coll_query = IrodsQuery(self.session, kw.COLL_NAME).filter(kw.COLL_PARENT_NAME == path)
+        entries = [{"name": res[kw.COLL_NAME], "size": 0, "type": "directory"}
+                   for res in coll_query if res[kw.COLL_NAME] != path]
+        entries.extend(self._query_dataobjects(kw.COLL_NAME == path))
+        entries.sort(key=lambda entry: entry["name"])
+        return entries if detail else [entry["name"] for entry in entries]
+
+    def info(self, path, **kwargs):
+        path = self._strip_protocol(path)
+        if self.session.irods_session.collections.exists(path):
+            return {"name": path, "size": 0, "type": "directory"}
+        ipath = IrodsPath(self.session, path)
+        infos = self._query_dataobjects(kw.COLL_NAME == str(ipath.parent),
+                                        kw.DATA_NAME == ipath.name)
+        if not infos:
+            raise FileNotFoundError(path)
+        return infos[0]
+
+    def find(self, path, maxdepth=None, withdirs=False, detail=False, **kwargs):
+        if maxdepth is not None:
+            return super().find(path, maxdepth=maxdepth, withdirs=withdirs, detail=detail,
+                                **kwargs)
+        path = self._strip_protocol(path)
+        if not self.session.irods_session.collections.exists(path):
+            return super().find(path, withdirs=withdirs, detail=detail, **kwargs)
+        root = path.rstrip("/")
+        entries = self._query_dataobjects(tree_condition(path))
+        if withdirs:
+            coll_query = IrodsQuery(self.session, kw.COLL_NAME).filter(
+                kw.LIKE(kw.COLL_NAME, root + "/%"))
+            entries.extend({"name": res[kw.COLL_NAME], "size": 0, "type": "directory"}
+                           for res in coll_query)
+        entries.sort(key=lambda entry: entry["name"])
+        if detail:
+            return {entry["name"]: entry for entry in entries}
+        return [entry["name"] for entry in entries]
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        ipath = IrodsPath(self.session, self._strip_protocol(path))
+        if start is None and end is None:
+            return bytes(ipath.read_bytes())
+        with self.open(path, "rb") as handle:
+            return handle.read_range(start, end)
+
+    def cat_ranges(self, paths, starts, ends, max_gap=None, on_error="return", **kwargs):
+        """Read byte ranges of one or more data objects, opening each data object once."""
+        if not len(paths) == len(starts) == len(ends):
+            raise ValueError("paths, starts and ends should have the same length.")
+        handles = {}
+        results = []
+        try:
+            for path, start, end in zip(paths, starts, ends):
+                try:
+                    if path not in handles:
+                        handles[path] = self.open(path, "rb")
+                    results.append(handles[path].read_range(start, end))
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    if on_error == "raise":
+                        raise
+                    results.append(error)
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return results
+
+    def mkdir(self, path, create_parents=True, **kwargs):
+        create_collection(self.session, self._strip_protocol(path))
+
+    def makedirs(self, path, exist_ok=False):
+        path = self._strip_protocol(path)
+        if not exist_ok and self.exists(path):
+            raise FileExistsError(path)
+        create_collection(self.session, path)
+
+    def rm_file(self, path):
+        IrodsPath(self.session, self._strip_protocol(path)).remove()
+
+    def rmdir(self, path):
+        IrodsPath(self.session, self._strip_protocol(path)).remove()
+
+    def _open(self, path, mode="rb", block_size=None, autocommit=True, cache_options=None,
+              **kwargs):
+        return IrodsFile(self, path, mode, block_size, autocommit,
+                         cache_options=cache_options, **kwargs)
+
+
+class IrodsFile(AbstractBufferedFile):
+    """Buffered file on a data object, with a single iRODS file handle for all reads."""
+
+    def __init__(self, fs, path, mode="rb", block_size="default", autocommit=True,
+                 cache_type="readahead", cache_options=None, **kwargs):
+        self.ipath = IrodsPath(fs.session, fs._strip_protocol(path))  # pylint: disable=protected-access
+        self._handle = None
+        super().__init__(fs, path, mode, block_size, autocommit, cache_type=cache_type,
+                         cache_options=cache_options, **kwargs)
+
+    def read_range(self, start: Optional[int], end: Optional[int]) -> bytes:
+        """Read the bytes from `start` to `end` (exclusive), negative values count from the end."""
+        start = 0 if start is None else start
+        end = self.size if end is None else end
+        if start < 0:
+            start = max(0, self.size + start)
+        if end < 0:
+            end = self.size + end
+        self.seek(start)
+        return self.read(max(0, end - start))
+
+    def _fetch_range(self, start, end):
+        if self._handle is None:
+            self._handle = self.ipath.open("r")
+        self._handle.seek(start)
+        return self._handle.read(end - start)
+
+    def _initiate_upload(self):
+        if "x" in self.mode and self.ipath.exists():
+            raise FileExistsError(str(self.ipath))
+        self._handle = self.ipath.open("a" if "a" in self.mode else "w")
+        if "a" in self.mode:
+            self._handle.seek(0, 2)
+
+    def _upload_chunk(self, final=False):
+        self._handle.write(self.buffer.getvalue())
+        return True
+
+    def close(self):
+        super().close()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
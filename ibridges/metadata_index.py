@@ -0,0 +1,402 @@
+""" local SQLite index of the metadata of a collection tree
+"""
+import itertools
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+from irods.column import Column
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.query import IrodsQuery, tree_condition
+from ibridges.irodsconnector.session import Session
+from ibridges.search import ORDER_COLUMNS, SearchResult, as_dicts
+from ibridges.utils.path import IrodsPath
+
+# Number of ids per IN condition when changed items are fetched.
+FETCH_BATCH_SIZE = 100
+# Number of seconds a refresh looks back before the previous refresh, for clock differences.
+REFRESH_OVERLAP = 60.0
+# Values of order_by and the columns they sort on.
+_ORDER_COLUMNS = {"size": "size", "modify_time": "data_objects.modify_time", "name": "data_name"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS collections (
+    coll_id INTEGER PRIMARY KEY, coll_name TEXT NOT NULL, modify_time REAL);
+CREATE INDEX IF NOT EXISTS coll_name_index ON collections (coll_name);
+CREATE TABLE IF NOT EXISTS data_objects (
+    data_id INTEGER PRIMARY KEY, coll_id INTEGER NOT NULL, data_name TEXT NOT NULL,
+    checksum TEXT, size INTEGER, modify_time REAL);
+CREATE INDEX IF NOT EXISTS data_coll_index ON data_objects (coll_id, data_name);
+CREATE INDEX IF NOT EXISTS data_checksum_index ON data_objects (checksum);
+CREATE TABLE IF NOT EXISTS avus (
+    meta_id INTEGER PRIMARY KEY, name TEXT NOT NULL, value TEXT, units TEXT);
+CREATE INDEX IF NOT EXISTS avu_index ON avus (name, value);
+CREATE TABLE IF NOT EXISTS data_avus (
+    item_id INTEGER, meta_id INTEGER, PRIMARY KEY (item_id, meta_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS data_avus_meta_index ON data_avus (meta_id);
+CREATE TABLE IF NOT EXISTS coll_avus (
+    item_id INTEGER, meta_id INTEGER, PRIMARY KEY (item_id, meta_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS coll_avus_meta_index ON coll_avus (meta_id);
+"""
+
+
+class _AvuTable(NamedTuple):
+    """Tables of the index and columns of the iCAT of the AVUs of data objects or collections."""
+    link_table: str
+    item_table: str
+    item_key: str
+    item_column: Column
+    id_column: Column
+    name_column: Column
+    value_column: Column
+    units_column: Column
+    time_column: Column
+    # Columns that make the rows of the links of a data object distinct per replica.
+    repl_columns: tuple = ()
+
+
+_DATA_AVUS = _AvuTable("data_avus", "data_objects", "data_id", kw.DATA_ID, kw.META_DATA_ATTR_ID,
+                       kw.META_DATA_ATTR_NAME, kw.META_DATA_ATTR_VALUE, kw.META_DATA_ATTR_UNITS,
+                       kw.META_DATA_MODIFY_TIME, (kw.DATA_REPL_NUM,))
+_COLL_AVUS = _AvuTable("coll_avus", "collections", "coll_id", kw.COLL_ID, kw.META_COLL_ATTR_ID,
+                       kw.META_COLL_ATTR_NAME, kw.META_COLL_ATTR_VALUE, kw.META_COLL_ATTR_UNITS,
+                       kw.META_COLL_MODIFY_TIME)
+
+
+class MetadataIndex():
+    """Local copy of the paths, checksums, sizes, modification times and AVUs of a tree.
+
+    The index answers searches in the same way as `ibridges.search.search`, but from
+    an SQLite database instead of the iCAT. It only knows the collection tree
+    below `root`. When the last refresh is older than `max_age` seconds, a search
+    first refreshes the index.
+
+    A refresh is incremental: only items that were modified since the previous
+    refresh are retrieved, and the ids of the items in the tree are only retrieved
+    if their number shows that items were removed, see `refresh`.
+
+    Examples
+    --------
+    >>> index = MetadataIndex(session, "~/project", "project_index.sqlite", max_age=600)
+    >>> index.search(key_vals={"experiment": "2024-%"})
+    """
+
+    def __init__(self, session: Session, root: Union[str, IrodsPath],
+                 db_path: Union[str, Path] = ":memory:", max_age: float = 300.0):
+        """Open or create an index.
+
+        Parameters
+        ----------
+        session : Session
+            Session used to refresh the index.
+        root : str or IrodsPath
+            Collection of which the tree is indexed.
+        db_path : str or Path
+            SQLite database file, by default the index is kept in memory.
+        max_age : float
+            Number of seconds after which searches refresh the index first.
+        """
+        self.session = session
+        self.root = str(IrodsPath(session, root))
+        self.max_age = max_age
+        self._db = sqlite3.connect(str(db_path))
+        # iRODS LIKE conditions are case sensitive.
+        self._db.execute("PRAGMA case_sensitive_like = ON")
+        self._db.executescript(_SCHEMA)
+        indexed_root = self._get_state("root")
+        if indexed_root is None:
+            with self._db:
+                self._set_state("root", self.root)
+        elif indexed_root != self.root:
+            raise ValueError(f"Database '{db_path}' is an index of '{indexed_root}', "
+                             f"not of '{self.root}'.")
+
+    def __repr__(self) -> str:
+        return f"MetadataIndex({self.root}, age={self.age:.1f}s)"
+
+    @property
+    def age(self) -> float:
+        """Number of seconds since the last refresh, infinite if it was never refreshed."""
+        last_refresh = self._get_state("last_refresh")
+        return float("inf") if last_refresh is None else time.time() - last_refresh
+
+    def _get_state(self, key: str):
+        row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_state(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, value))
+
+    def refresh(self, full: bool = False) -> int:
+        """Bring the index up to date with the iCAT.
+
+        Only the collections, data objects and AVUs that were modified since the
+        last refresh are retrieved. Removals are detected by counting the items in
+        the tree on the server; only if the count differs from what is expected,
+        the ids in the tree are retrieved to find the removed items and the AVU
+        links that do not change a modification time. Changes that neither update a
+        modification time nor a count, such as renames, are found by a full refresh.
+
+        Parameters
+        ----------
+        full : bool
+            Retrieve the whole tree instead of only the changes.
+
+        Returns
+        -------
+        int
+            Number of collections, data objects, AVUs and AVU links that were added,
+            changed or removed.
+        """
+        # Changes during the refresh may be missed, so the refresh counts from the start.
+        start = time.time()
+        last_refresh = None if full else self._get_state("last_refresh")
+        since = None
+        if last_refresh is not None:
+            # Modification times in the iCAT are UTC without timezone, like `since`.
+            since = datetime.fromtimestamp(last_refresh - REFRESH_OVERLAP,
+                                           timezone.utc).replace(tzinfo=None)
+        with self._db:
+            n_changes = self._refresh_collections(since)
+            n_changes += self._refresh_data_objects(since)
+            n_changes += self._refresh_avus(since, _DATA_AVUS)
+            n_changes += self._refresh_avus(since, _COLL_AVUS)
+            self._db.execute("DELETE FROM avus WHERE meta_id NOT IN "
+                             "(SELECT meta_id FROM data_avus UNION SELECT meta_id FROM coll_avus)")
+            self._set_state("last_refresh", start)
+        return n_changes
+
+    def _query(self, *columns) -> IrodsQuery:
+        return IrodsQuery(self.session, *columns).filter(tree_condition(self.root))
+
+    def _count(self, column) -> int:
+        """Number of rows of `column` in the tree, data objects count once per replica."""
+        res = self._query(column).count(column).first()
+        return int(res[column] or 0) if res is not None else 0
+
+    def _unexpected_count(self, key: str, column, n_new_rows: int) -> bool:
+        """Update the stored count of `column` and check whether it grew by `n_new_rows`."""
+        expected = self._get_state(key)
+        count = self._count(column)
+        self._set_state(key, count)
+        return expected is None or count != expected + n_new_rows
+
+    def _refresh_collections(self, since: Optional[datetime]) -> int:
+        local = {coll_id: (coll_name, modify_time) for coll_id, coll_name, modify_time
+                 in self._db.execute("SELECT * FROM collections")}
+        remote = {}
+        query = self._query(kw.COLL_ID, kw.COLL_NAME, kw.COLL_MODIFY_TIME)
+        for res in _modified(query, kw.COLL_MODIFY_TIME, since):
+            remote[int(res[kw.COLL_ID])] = (res[kw.COLL_NAME],
+                                            _timestamp(res[kw.COLL_MODIFY_TIME]))
+        unexpected = self._unexpected_count("count_collections", kw.COLL_ID,
+                                            len(remote.keys() - local.keys()))
+        if since is None:
+            removed = local.keys() - remote.keys()
+        elif unexpected:
+            removed = local.keys() - {int(res[kw.COLL_ID]) for res in self._query(kw.COLL_ID)}
+        else:
+            removed = set()
+        changed = [(coll_id, *values) for coll_id, values in remote.items()
+                   if local.get(coll_id) != values]
+        self._db.executemany("INSERT OR REPLACE INTO collections VALUES (?, ?, ?)", changed)
+        self._db.executemany("DELETE FROM collections WHERE coll_id = ?",
+                             [(coll_id,) for coll_id in removed])
+        self._db.executemany("DELETE FROM data_objects WHERE coll_id = ?",
+                             [(coll_id,) for coll_id in removed])
+        return len(changed) + len(removed)
+
+    def _refresh_data_objects(self, since: Optional[datetime]) -> int:
+        local = {data_id: tuple(row) for data_id, *row
+                 in self._db.execute("SELECT * FROM data_objects")}
+        # data id -> (collection id, name, checksum, size, modification time)
+        remote: dict[int, tuple] = {}
+        n_new_rows = 0
+        query = self._query(kw.DATA_ID, kw.DATA_REPL_NUM, kw.DATA_COLL_ID, kw.DATA_NAME,
+                            kw.DATA_CHECKSUM, kw.DATA_SIZE, kw.DATA_MODIFY_TIME)
+        for res in _modified(query, kw.DATA_MODIFY_TIME, since):
+            data_id = int(res[kw.DATA_ID])
+            n_new_rows += data_id not in local
+            row = [int(res[kw.DATA_COLL_ID]), res[kw.DATA_NAME], res[kw.DATA_CHECKSUM] or None,
+                   int(res[kw.DATA_SIZE]), _timestamp(res[kw.DATA_MODIFY_TIME])]
+            if data_id in remote:
+                # Replicas show up as separate rows, keep a checksum and the latest time.
+                row[2] = row[2] or remote[data_id][2]
+                row[4] = max(row[4], remote[data_id][4])
+            remote[data_id] = tuple(row)
+        unexpected = self._unexpected_count("count_data_objects", kw.DATA_ID, n_new_rows)
+        if since is None:
+            removed = local.keys() - remote.keys()
+        elif unexpected:
+            removed = local.keys() - {int(res[kw.DATA_ID]) for res in self._query(kw.DATA_ID)}
+        else:
+            removed = set()
+        changed = [(data_id, *row) for data_id, row in remote.items() if local.get(data_id) != row]
+        self._db.executemany("INSERT OR REPLACE INTO data_objects VALUES (?, ?, ?, ?, ?, ?)",
+                             changed)
+        self._db.executemany("DELETE FROM data_objects WHERE data_id = ?",
+                             [(data_id,) for data_id in removed])
+        return len(changed) + len(removed)
+
+    def _refresh_avus(self, since: Optional[datetime], table: _AvuTable) -> int:
+        # The links of removed items are removed with them.
+        n_orphans = self._db.execute(
+            f"DELETE FROM {table.link_table} WHERE item_id NOT IN "
+            f"(SELECT {table.item_key} FROM {table.item_table})").rowcount
+        local = set(self._db.execute(f"SELECT item_id, meta_id FROM {table.link_table}"))
+        known = {meta_id: (meta_id, *avu)
+                 for meta_id, *avu in self._db.execute("SELECT * FROM avus")}
+        avu_columns = [table.item_column, table.id_column, table.name_column,
+                       table.value_column, table.units_column]
+        # The replica number is selected to count the rows like the count of the tree.
+        query = self._query(*avu_columns, *table.repl_columns)
+        remote, avus, n_new_rows = set(), {}, 0
+        for res in _modified(query, table.time_column, since):
+            link = (int(res[table.item_column]), int(res[table.id_column]))
+            n_new_rows += link not in local
+            remote.add(link)
+            avus[link[1]] = (link[1], res[table.name_column], res[table.value_column],
+                             res[table.units_column] or None)
+        unexpected = self._unexpected_count("count_" + table.link_table, table.id_column,
+                                            n_new_rows)
+        if since is None:
+            removed = local - remote
+        elif unexpected:
+            links = {(int(res[table.item_column]), int(res[table.id_column]))
+                     for res in self._query(table.item_column, table.id_column)}
+            removed = local - links
+            # Links to existing AVUs do not change their modification time.
+            remote |= links - local
+            new_ids = sorted({meta_id for _, meta_id in links - local} - known.keys()
+                             - avus.keys())
+            query = IrodsQuery(self.session, *avu_columns)
+            for res in _fetch(query, table.id_column, new_ids, tree_condition(self.root)):
+                avus[int(res[table.id_column])] = (
+                    int(res[table.id_column]), res[table.name_column], res[table.value_column],
+                    res[table.units_column] or None)
+        else:
+            removed = set()
+        added = remote - local
+        changed = [avu for meta_id, avu in avus.items() if known.get(meta_id) != avu]
+        self._db.executemany("INSERT OR REPLACE INTO avus VALUES (?, ?, ?, ?)", changed)
+        self._db.executemany(f"INSERT INTO {table.link_table} VALUES (?, ?)", added)
+        self._db.executemany(
+            f"DELETE FROM {table.link_table} WHERE item_id = ? AND meta_id = ?", removed)
+        # New AVUs are counted with their links, changed AVUs on their own.
+        return n_orphans + len(added) + len(removed) + len(
+            [avu for avu in changed if avu[0] in known])
+
+    def search_iter(self, path: Optional[Union[str, IrodsPath]] = None,  # pylint: disable=too-many-arguments
+                    checksum: Optional[str] = None, key_vals: Optional[dict] = None,
+                    limit: Optional[int] = None, offset: int = 0,
+                    min_size: Optional[int] = None, max_size: Optional[int] = None,
+                    modified_after: Optional[datetime] = None,
+                    modified_before: Optional[datetime] = None,
+                    order_by: Optional[str] = None,
+                    descending: bool = False) -> Iterator[SearchResult]:
+        """Search the index, see `ibridges.search.search_iter`.
+
+        Every attribute in `key_vals` should match an AVU of the item on its own.
+        """
+        after = None if modified_after is None else _timestamp(modified_after)
+        before = None if modified_before is None else _timestamp(modified_before)
+        ranges = [(condition, value) for condition, value in [
+            ("size >= ?", min_size), ("size <= ?", max_size),
+            ("data_objects.modify_time >= ?", after), ("data_objects.modify_time < ?", before)]
+                  if value is not None]
+        if path is None and checksum is None and key_vals is None and not ranges:
+            raise ValueError(
+                "QUERY: Error while searching in the metadata: No query criteria set."
+                " Please supply either a path, checksum, key_vals or a range.")
+        if order_by is not None and order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}', choose from {list(ORDER_COLUMNS)}.")
+        if self.age > self.max_age:
+            self.refresh()
+
+        data_conds, data_args = _avu_conditions("data_avus", "data_objects.data_id", key_vals)
+        coll_conds, coll_args = _avu_conditions("coll_avus", "collections.coll_id", key_vals)
+        if path:
+            data_conds.insert(0, "coll_name LIKE ?")
+            data_args.insert(0, str(path))
+            coll_conds.insert(0, "coll_name LIKE ?")
+            coll_args.insert(0, str(path))
+        if checksum:
+            data_conds.append("checksum LIKE ?")
+            data_args.append(checksum)
+        data_conds.extend(condition for condition, _ in ranges)
+        data_args.extend(value for _, value in ranges)
+        data_sql = _where("SELECT coll_name, data_name, checksum, size, data_objects.modify_time "
+                          "FROM data_objects JOIN collections USING (coll_id)", data_conds)
+        if order_by is not None:
+            data_sql += (f" ORDER BY {_ORDER_COLUMNS[order_by]}"
+                         + (" DESC" if descending else ""))
+
+        results: Iterable[SearchResult] = (
+            SearchResult(coll_name, data_name, data_checksum, size,
+                         datetime.fromtimestamp(modify_time, timezone.utc))
+            for coll_name, data_name, data_checksum, size, modify_time
+            in self._db.execute(data_sql, data_args))
+        if not (checksum or ranges or order_by):
+            coll_rows = self._db.execute(_where("SELECT coll_name FROM collections", coll_conds),
+                                         coll_args)
+            results = itertools.chain(results, (SearchResult(row[0]) for row in coll_rows))
+        yield from itertools.islice(results, offset, None if limit is None else offset + limit)
+
+    def search(self, path: Optional[Union[str, IrodsPath]] = None,
+               checksum: Optional[str] = None, key_vals: Optional[dict] = None,
+               **filters) -> list[dict]:
+        """Search the index, with the same arguments and results as `ibridges.search.search`."""
+        return as_dicts(self.search_iter(path, checksum, key_vals, **filters))
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _timestamp(moment: datetime) -> float:
+    # Times from the iCAT and times without a timezone are UTC.
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def _modified(query: IrodsQuery, time_column, since: Optional[datetime]) -> IrodsQuery:
+    """The rows of `query` that were modified at or after `since`, all rows if it is None."""
+    return query if since is None else query.filter(time_column >= since)
+
+def _fetch(query: IrodsQuery, id_column, ids: list[int], condition) -> Iterator[dict]:
+    """Rows of `query` for the items with `ids`.
+
+    Few items are fetched by id, many items with a single query for the whole tree.
+    """
+    if len(ids) > 2 * FETCH_BATCH_SIZE:
+        wanted = set(ids)
+        yield from (res for res in query.filter(condition) if int(res[id_column]) in wanted)
+        return
+    for i_batch in range(0, len(ids), FETCH_BATCH_SIZE):
+        yield from query.filter(kw.IN(id_column, ids[i_batch:i_batch+FETCH_BATCH_SIZE]))
+
+def _avu_conditions(link_table: str, item_id: str, key_vals: Optional[dict]
+                    ) -> tuple[list[str], list[str]]:
+    conditions, args = [], []
+    for key, value in (key_vals or {}).items():
+        condition = (f"EXISTS (SELECT 1 FROM {link_table} JOIN avus USING (meta_id) "
+                     f"WHERE {link_table}.item_id = {item_id} AND avus.name LIKE ?")
+        args.append(key)
+        if value:
+            condition += " AND avus.value LIKE ?"
+            args.append(value)
+        conditions.append(condition + ")")
+    return conditions, args
+
+def _where(sql: str, conditions: list[str]) -> str:
+    return sql + (" WHERE " + " AND ".join(conditions) if conditions else "")
@@ -1,18 +1,195 @@
 """ Data query
 """
-from typing import Optional, Union
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
 
 from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.query import MAX_PAGE_SIZE, IrodsQuery
 from ibridges.irodsconnector.session import Session
 from ibridges.utils.path import IrodsPath
 
+# Values of order_by and the columns they sort on.
+ORDER_COLUMNS = {"size": kw.DATA_SIZE, "modify_time": kw.DATA_MODIFY_TIME, "name": kw.DATA_NAME}
+
+
+class SearchResult(NamedTuple):
+    """A collection or data object found by search_iter.
+
+    For collections `name`, `checksum`, `size` and `modify_time` are None. For data
+    objects `size` and `modify_time` are only set if the search filters or orders on
+    size or modification time.
+    """
+    collection: str
+    name: Optional[str] = None
+    checksum: Optional[str] = None
+    size: Optional[int] = None
+    modify_time: Optional[datetime] = None
+
+    @property
+    def path(self) -> str:
+        """Absolute path of the collection or data object."""
+        if self.name is None:
+            return self.collection
+        return self.collection.rstrip("/") + "/" + self.name
+
+
+def _search_queries(session: Session, path: Optional[Union[str, IrodsPath]],  # pylint: disable=too-many-arguments
+                    checksum: Optional[str], key_vals: Optional[dict],
+                    min_size: Optional[int] = None, max_size: Optional[int] = None,
+                    modified_after: Optional[datetime] = None,
+                    modified_before: Optional[datetime] = None,
+                    order_by: Optional[str] = None, descending: bool = False):
+    """Create the queries for data objects and, if they can match, collections."""
+    ranges = [(min_size, kw.DATA_SIZE >= min_size), (max_size, kw.DATA_SIZE <= max_size),
+              (modified_after, kw.DATA_MODIFY_TIME >= modified_after),
+              (modified_before, kw.DATA_MODIFY_TIME < modified_before)]
+    range_conditions = [condition for value, condition in ranges if value is not None]
+    if path is None and checksum is None and key_vals is None and not range_conditions:
+        raise ValueError(
+                "QUERY: Error while searching in the metadata: No query criteria set." \
+                        + " Please supply either a path, checksum, key_vals or a range.")
+
+    # create the query for collections; we only want to return the collection name
+    coll_query = IrodsQuery(session, kw.COLL_NAME)
+    # create the query for data objects; we need the collection name, the data name,
+    # its checksum and, to filter or order on them, its size and modification time
+    data_columns = [kw.COLL_NAME, kw.DATA_NAME, kw.DATA_CHECKSUM]
+    if range_conditions or order_by is not None:
+        data_columns += [kw.DATA_SIZE, kw.DATA_MODIFY_TIME]
+    data_query = IrodsQuery(session, *data_columns)
+    if path:
+        coll_query = coll_query.filter(kw.LIKE(kw.COLL_NAME, str(path)))
+        data_query = data_query.filter(kw.LIKE(kw.COLL_NAME, str(path)))
+    if key_vals:
+        for key in key_vals:
+            data_query = data_query.filter(kw.LIKE(kw.META_DATA_ATTR_NAME, key))
+            coll_query = coll_query.filter(kw.LIKE(kw.META_COLL_ATTR_NAME, key))
+            if key_vals[key]:
+                data_query = data_query.filter(kw.LIKE(kw.META_DATA_ATTR_VALUE, key_vals[key]))
+                coll_query = coll_query.filter(kw.LIKE(kw.META_COLL_ATTR_VALUE, key_vals[key]))
+    if checksum:
+        data_query = data_query.filter(kw.LIKE(kw.DATA_CHECKSUM, checksum))
+    data_query = data_query.filter(*range_conditions)
+    if checksum or range_conditions:
+        # collections have no checksum and no size
+        coll_query = None
+    if order_by is not None:
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}', choose from {list(ORDER_COLUMNS)}.")
+        data_query = data_query.order_by(ORDER_COLUMNS[order_by], descending)
+        coll_query = None
+    return data_query, coll_query
+
+def _data_result(res: dict, with_stats: bool) -> SearchResult:
+    """Convert a row of the data object query to a SearchResult."""
+    if not with_stats:
+        return SearchResult(res[kw.COLL_NAME], res[kw.DATA_NAME], res[kw.DATA_CHECKSUM])
+    return SearchResult(res[kw.COLL_NAME], res[kw.DATA_NAME], res[kw.DATA_CHECKSUM],
+                        int(res[kw.DATA_SIZE]),
+                        res[kw.DATA_MODIFY_TIME].replace(tzinfo=timezone.utc))
+
+def search_iter(session: Session, path: Optional[Union[str, IrodsPath]] = None,  # pylint: disable=too-many-arguments
+                checksum: Optional[str] = None, key_vals: Optional[dict] = None,
+                limit: Optional[int] = None, offset: int = 0,
+                min_size: Optional[int] = None, max_size: Optional[int] = None,
+                modified_after: Optional[datetime] = None,
+                modified_before: Optional[datetime] = None,
+                order_by: Optional[str] = None,
+                descending: bool = False) -> Iterator[SearchResult]:
+    """Stream the data objects and collections that match the search criteria.
+
+    Results are fetched from the server page by page while they are consumed:
+    first the data objects, then the collections. When the iteration stops,
+    because `limit` is reached or the caller stops early, the open query is
+    closed on the server and no further pages are fetched. Filtering and
+    ordering on size and modification time are done by the server, so e.g. the
+    100 largest data objects take a single round trip of 100 rows.
+    Wildcard: %
+
+    Parameters
+    ----------
+    path: str
+        (Partial) path or IrodsPath
+    checksum: str
+        (Partial) checksum, only data objects are found.
+    key_vals : dict
+        Attribute name mapping to values.
+    limit : int
+        Maximum number of results.
+    offset : int
+        Number of results to skip.
+    min_size : int
+        Minimum size in bytes, only data objects are found.
+    max_size : int
+        Maximum size in bytes, only data objects are found.
+    modified_after : datetime
+        Only data objects modified at or after this time are found. Times
+        without a timezone are UTC.
+    modified_before : datetime
+        Only data objects modified before this time are found.
+    order_by : str
+        Sort the data objects on 'size', 'modify_time' or 'name'; collections are
+        then not found.
+    descending : bool
+        Sort in descending order, e.g. largest or most recently modified first.
+
+    Yields
+    ------
+    SearchResult
+        (collection, name, checksum, size, modification time) of each data object
+        and (collection, None, None, None, None) of each collection. The size and
+        modification time are None unless the search filters or orders on them.
+    """
+    data_query, coll_query = _search_queries(session, path, checksum, key_vals, min_size,
+                                             max_size, modified_after, modified_before,
+                                             order_by, descending)
+    if limit == 0:
+        return
+    if limit is not None:
+        # Without replicas the first page holds all results, the query is closed after it.
+        data_query = data_query.page_size(max(1, min(offset + limit, MAX_PAGE_SIZE)))
+
+    n_skip, n_left = offset, limit
+    with_stats = any(column is kw.DATA_SIZE for column in data_query.columns)
+    # Replicas are separate rows if their checksum, size or modification time differ.
+    # GenQuery orders the rows on the selected columns, which makes replicas adjacent,
+    # unless it orders on size or modification time; then the paths found are kept.
+    previous, found = None, set()
+    for res in data_query:
+        result = _data_result(res, with_stats)
+        if result.path == previous or result.path in found:
+            continue
+        previous = result.path
+        if with_stats:
+            found.add(result.path)
+        if n_skip > 0:
+            n_skip -= 1
+            continue
+        yield result
+        if n_left is not None:
+            n_left -= 1
+            if n_left == 0:
+                return
+    if coll_query is None:
+        return
+    if n_left is not None:
+        coll_query = coll_query.limit(n_skip + n_left)
+    for res in coll_query:
+        if n_skip > 0:
+            n_skip -= 1
+            continue
+        yield SearchResult(res[kw.COLL_NAME])
+
 def search(session: Session, path: Optional[Union[str, IrodsPath]] = None,
-           checksum: Optional[str] = None, key_vals: Optional[dict] = None) -> list[dict]:
+           checksum: Optional[str] = None, key_vals: Optional[dict] = None,
+           **filters) -> list[dict]:
     """Retrieves all collections and data objects (the absolute collection path,
     data object or collection name) to the given user-defined and system metadata.
     By Default all accessible collections and data objects will be returned.
     Wildcard: %
 
+    Use search_iter to stream the results instead.
+
     Parameters
     ----------
     path: str
@@ -21,43 +198,37 @@ def search(session: Session, path: Optional[Union[str, IrodsPath]] = None,
         (Partial) checksum
     key_vals : dict
         Attribute name mapping to values.
+    filters
+        Limit, offset, size and time ranges and ordering, see search_iter.
 
     Returns
     -------
     list: [dict]
         List of dictionaries with keys: COLL_NAME (absolute path of the collection),
-                                        DATA_NAME (name of the data object), 
+                                        DATA_NAME (name of the data object),
                                         D_DATA_CHECKSUM (checksum of the data object)
         The latter two keys are only present of the found item is a data object.
 
     """
-    if path is None and checksum is None and key_vals is None:
-        raise ValueError(
-                "QUERY: Error while searching in the metadata: No query criteria set." \
-                        + " Please supply either a path, checksum or key_vals.")
+    return as_dicts(search_iter(session, path, checksum, key_vals, **filters))
 
-    # create the query for collections; we only want to return the collection name
-    coll_query = session.irods_session.query(kw.COLL_NAME)
-    # create the query for data objects; we need the collection name, the data name and its checksum
-    data_query = session.irods_session.query(kw.COLL_NAME, kw.DATA_NAME,
-                                             kw.DATA_CHECKSUM)
-    if path:
-        coll_query = coll_query.filter(kw.LIKE(kw.COLL_NAME, str(path)))
-        data_query = data_query.filter(kw.LIKE(kw.COLL_NAME, str(path)))
-    if key_vals:
-        for key in key_vals:
-            data_query.filter(kw.LIKE(kw.META_DATA_ATTR_NAME, key))
-            coll_query.filter(kw.LIKE(kw.META_COLL_ATTR_NAME, key))
-            if key_vals[key]:
-                data_query.filter(kw.LIKE(kw.META_DATA_ATTR_VALUE, key_vals[key]))
-                coll_query.filter(kw.LIKE(kw.META_COLL_ATTR_VALUE, key_vals[key]))
-    if checksum:
-        data_query = data_query.filter(kw.LIKE(kw.DATA_CHECKSUM, checksum))
-    # gather results
-    results = [{key.icat_key: val} for res in data_query.get_results()
-                                   for key, val in res.items()]
-    if checksum is None:
-        results.extend([{key.icat_key: val} for res in coll_query.get_results()
-                                            for key, val in res.items()])
+def as_dicts(search_results: Iterable[SearchResult]) -> list[dict]:
+    """Convert search results to the output format of search.
 
+    Parameters
+    ----------
+    search_results : Iterable
+        SearchResults, e.g. from search_iter.
+
+    Returns
+    -------
+    list: [dict]
+        The results in the format of search.
+    """
+    results = []
+    for res in search_results:
+        results.append({kw.COLL_NAME.icat_key: res.collection})
+        if res.name is not None:
+            results.extend([{kw.DATA_NAME.icat_key: res.name},
+                            {kw.DATA_CHECKSUM.icat_key: res.checksum}])
     return results
@@ -0,0 +1,221 @@
+""" Synchronisation of local folders and iRODS collections
+"""
+import os
+from datetime import timezone
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import (
+    _collection_levels,
+    _create_collections,
+    _obj_get,
+    _obj_put,
+)
+from ibridges.irodsconnector.query import IrodsQuery, tree_condition
+from ibridges.irodsconnector.session import Session
+from ibridges.irodsconnector.transfer import execute_jobs
+from ibridges.utils.checksum import local_checksum
+from ibridges.utils.path import IrodsPath
+from ibridges.utils.sync_result import SyncResult
+
+# Relative path -> (size, modification time in seconds since epoch, checksum)
+FileStates = dict[str, tuple[int, float, Optional[str]]]
+
+
+def _local_states(local_path: Path) -> FileStates:
+    """Sizes and modification times of all files in a local folder."""
+    states = {}
+    for root, _, files in os.walk(local_path):
+        for file_name in files:
+            path = Path(root, file_name)
+            stat = path.stat()
+            states[path.relative_to(local_path).as_posix()] = (stat.st_size, stat.st_mtime, None)
+    return states
+
+def _remote_states(session: Session, irods_path: IrodsPath) -> FileStates:
+    """Sizes, modification times and checksums of all data objects in a collection tree.
+
+    All data objects are retrieved with a single paged query.
+    """
+    root = str(irods_path)
+    data_query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME, kw.DATA_SIZE,
+                            kw.DATA_MODIFY_TIME, kw.DATA_CHECKSUM)
+    data_query = data_query.filter(tree_condition(root))
+    states = {}
+    for res in data_query:
+        coll_name, data_name, size, modify_time, checksum = res.values()
+        rel_path = (coll_name+"/"+data_name)[len(root)+1:]
+        mtime = modify_time.replace(tzinfo=timezone.utc).timestamp()
+        # Replicas show up as separate rows, keep the one with a checksum.
+        if rel_path not in states or states[rel_path][2] is None:
+            states[rel_path] = (int(size), mtime, checksum)
+    return states
+
+def _diff(source_states: FileStates, target_states: FileStates,
+          same_content: Callable[[str], bool]) -> list[tuple[str, str]]:
+    """Determine which files of the source differ from the target.
+
+    Files are compared by size first. Files with equal sizes are only compared
+    by checksum if the source is newer than the target, so that unchanged
+    files never have to be read.
+
+    Returns
+    -------
+    list of tuples
+        [(relative path, reason)] with reason 'new', 'size' or 'checksum'.
+    """
+    changed = []
+    for rel_path, (size, mtime, _) in sorted(source_states.items()):
+        if rel_path not in target_states:
+            changed.append((rel_path, "new"))
+            continue
+        target_size, target_mtime, _ = target_states[rel_path]
+        if size != target_size:
+            changed.append((rel_path, "size"))
+        elif mtime > target_mtime and not same_content(rel_path):
+            changed.append((rel_path, "checksum"))
+    return changed
+
+def _checksums_equal(local_path: Path, remote_states: FileStates) -> Callable[[str], bool]:
+    def _same_content(rel_path: str) -> bool:
+        checksum = remote_states[rel_path][2]
+        if checksum is None:
+            return False
+        return local_checksum(local_path / rel_path, checksum) == checksum
+    return _same_content
+
+def _diff_local_irods(session: Session, local_path: Path,
+                      irods_path: IrodsPath) -> list[SyncResult]:
+    if not local_path.is_dir():
+        raise FileNotFoundError(f"Local folder '{local_path}' does not exist; to synchronise "
+                                "from iRODS, pass the collection as an IrodsPath.")
+    local_states = _local_states(local_path)
+    remote_states = _remote_states(session, irods_path)
+    return [SyncResult(str(local_path / rel_path), str(irods_path / rel_path),
+                       local_states[rel_path][0], reason)
+            for rel_path, reason in _diff(local_states, remote_states,
+                                          _checksums_equal(local_path, remote_states))]
+
+def _diff_irods_local(session: Session, irods_path: IrodsPath,
+                      local_path: Path) -> tuple[list[SyncResult], FileStates]:
+    local_states = _local_states(local_path) if local_path.is_dir() else {}
+    remote_states = _remote_states(session, irods_path)
+    results = [SyncResult(str(irods_path / rel_path), str(local_path / rel_path),
+                          remote_states[rel_path][0], reason)
+               for rel_path, reason in _diff(remote_states, local_states,
+                                             _checksums_equal(local_path, remote_states))]
+    return results, remote_states
+
+def diff_local_irods(session: Session, local_path: Union[str, Path],
+                     irods_path: Union[str, IrodsPath]) -> list[SyncResult]:
+    """Determine the files in a local folder that are not present in an iRODS collection
+    or that differ from their counterpart in the collection.
+
+    Parameters
+    ----------
+    session : Session
+        The iRODS session.
+    local_path : str or Path
+        Local source folder.
+    irods_path : str or IrodsPath
+        Target collection, corresponding to `local_path` itself.
+
+    Returns
+    -------
+    list of SyncResult
+        The files that have to be uploaded.
+    """
+    return _diff_local_irods(session, Path(local_path), IrodsPath(session, irods_path))
+
+def diff_irods_local(session: Session, irods_path: Union[str, IrodsPath],
+                     local_path: Union[str, Path]) -> list[SyncResult]:
+    """Determine the data objects in an iRODS collection that are not present in a local
+    folder or that differ from their local counterpart.
+
+    Parameters
+    ----------
+    session : Session
+        The iRODS session.
+    irods_path : str or IrodsPath
+        Source collection.
+    local_path : str or Path
+        Local target folder, corresponding to `irods_path` itself.
+
+    Returns
+    -------
+    list of SyncResult
+        The data objects that have to be downloaded.
+    """
+    return _diff_irods_local(session, IrodsPath(session, irods_path), Path(local_path))[0]
+
+def sync(session: Session, source: Union[str, Path, IrodsPath],
+         target: Union[str, Path, IrodsPath], n_workers: int = 1,
+         dry_run: bool = False) -> list[SyncResult]:
+    """Synchronise the contents of a local folder and an iRODS collection.
+
+    If `source` is an IrodsPath, the collection is synchronised to the local folder
+    `target`, otherwise the local folder `source` is synchronised to the collection
+    `target`. Only new and changed files are transferred; files that only exist in
+    the target are left alone. A local source that is not an existing folder raises
+    a FileNotFoundError.
+
+    Files are compared by size and modification time, and only if the size is the
+    same but the source is newer, by checksum. The modification times of downloaded
+    files are set to those of the data objects, so that a next synchronisation does
+    not need to compute their checksums.
+
+    Parameters
+    ----------
+    session : Session
+        The iRODS session.
+    source : str, Path or IrodsPath
+        Local folder or iRODS collection whose contents are synchronised.
+    target : str, Path or IrodsPath
+        iRODS collection or local folder that will mirror the source.
+    n_workers : int
+        Number of files that are transferred concurrently.
+    dry_run : bool
+        Only determine what has to be transferred.
+
+    Returns
+    -------
+    list of SyncResult
+        The transfers that were (or, for a dry run, would be) done.
+    """
+    if isinstance(source, IrodsPath):
+        results, remote_states = _diff_irods_local(session, source, Path(target))
+        if not dry_run:
+            _sync_download(results, session, remote_states, source, n_workers)
+        return results
+
+    results = _diff_local_irods(session, Path(source), IrodsPath(session, target))
+    if not dry_run:
+        _sync_upload(results, session, IrodsPath(session, target), n_workers)
+    return results
+
+def _sync_upload(results: list[SyncResult], session: Session, irods_path: IrodsPath,
+                 n_workers: int):
+    source_to_dest = [(Path(res.source_path), IrodsPath(session, res.target_path), res.reason)
+                      for res in results]
+    coll_levels = _collection_levels(irods_path, (dest for _, dest, _ in source_to_dest),
+                                     n_workers)
+    if source_to_dest:
+        coll_levels.insert(0, [irods_path])
+    _create_collections(session, coll_levels, n_workers)
+
+    def _upload_file(source: Path, dest: IrodsPath, reason: str):
+        _obj_put(session, source, dest, overwrite=True, obj_exists=reason != "new")
+    execute_jobs(_upload_file, source_to_dest, n_workers)
+
+def _sync_download(results: list[SyncResult], session: Session, remote_states: FileStates,
+                   irods_path: IrodsPath, n_workers: int):
+    root = str(irods_path)
+
+    def _download_file(source: str, dest: str):
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        _obj_get(session, IrodsPath(session, source), dest, overwrite=True)
+        mtime = remote_states[source[len(root)+1:]][1]
+        os.utime(dest, (mtime, mtime))
+    execute_jobs(_download_file, [(res.source_path, res.target_path) for res in results],
+                 n_workers)
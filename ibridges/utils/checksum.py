@@ -0,0 +1,31 @@
+""" checksums of local files in the format of iRODS checksums
+"""
+import base64
+import hashlib
+from pathlib import Path
+from typing import Union
+
+
+def local_checksum(local_path: Union[str, Path], irods_checksum: str) -> str:
+    """Compute the checksum of a local file in the format of an iRODS checksum.
+
+    Parameters
+    ----------
+    local_path : str or Path
+        Local file.
+    irods_checksum : str
+        iRODS checksum to compare with, either 'sha2:<base64 digest>' or an md5 hex digest.
+
+    Returns
+    -------
+    str
+        Checksum of the local file with the same algorithm and format.
+    """
+    sha2 = irods_checksum.startswith("sha2:")
+    digest = hashlib.sha256() if sha2 else hashlib.md5()
+    with open(local_path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(2**20), b""):
+            digest.update(chunk)
+    if sha2:
+        return "sha2:" + base64.b64encode(digest.digest()).decode()
+    return digest.hexdigest()
@@ -3,13 +3,32 @@ A classes to handle iRODS and local (Win, linux) paths.
 """
 from __future__ import annotations
 
+import io
+import re
 from pathlib import PurePosixPath
+from typing import Iterator, Optional, Union
 
 import irods
 
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.query import IrodsQuery
+from ibridges.irodsconnector.stat_cache import COLLECTION, DATAOBJECT, invalidate
+
+# Maximum number of bytes requested from the server in a single read.
+READ_CHUNK_SIZE = 8 * 2**20
+# Maximum number of collections whose children are retrieved in a single query.
+WALK_BATCH_SIZE = 100
+
 
 class IrodsPath():
-    """Extending the posix path functionalities with iRODS functionalities."""
+    """Extending the posix path functionalities with iRODS functionalities.
+
+    The absolute path is computed once, on the first conversion to a string.
+    Paths relative to the home collection are computed again if the home of
+    the session changes.
+    """
+
+    __slots__ = ("session", "_path", "_abs", "_home")
 
     _current_working_path = ""
 
@@ -21,7 +40,8 @@ class IrodsPath():
         args = [a._path if isinstance(a, IrodsPath) else a
                 for a in args]
         self._path = PurePosixPath(*args)
-        super().__init__()
+        self._abs = None
+        self._home = None
 
     def absolute_path(self) -> str:
         """
@@ -34,25 +54,33 @@ class IrodsPath():
         if self._path.parts[0] == "~" or self._path.parts[0] == ".":
             begin, end = self.session.home, self._path.parts[1:]
         elif self._path.parts[0] == "/":
-            begin, end = "/", self._path.parts[1:]
+            return str(self._path)
         else:
             begin, end = self.session.home, self._path.parts
         return str(PurePosixPath(begin, *end))
 
 
     def __str__(self) -> str:
-        return self.absolute_path()
+        if self._abs is None or (self._home is not None and self._home != self.session.home):
+            self._abs = self.absolute_path()
+            self._home = None if self._path.parts[:1] == ("/",) else self.session.home
+        return self._abs
 
     def __repr__(self) -> str:
         return f"IrodsPath({', '.join(self._path.parts)})"
 
     def __truediv__(self, other) -> IrodsPath:
-        return self.__class__(self.session, self._path, other)
+        return self.joinpath(other)
 
-    def __getattribute__(self, attr):
-        if attr in ["name", "parts"]:
-            return self._path.__getattribute__(attr)
-        return super().__getattribute__(attr)
+    @property
+    def name(self) -> str:
+        """The final component of the path."""
+        return self._path.name
+
+    @property
+    def parts(self) -> tuple[str, ...]:
+        """The components of the path."""
+        return self._path.parts
 
     def joinpath(self, *args):
         """Concanate another path to this one.
@@ -61,7 +89,22 @@ class IrodsPath():
         -------
             The concatenated path.
         """
-        return IrodsPath(self.session, self._path, *args)
+        # pylint: disable=protected-access
+        child = self.__class__.__new__(self.__class__)
+        child.session = self.session
+        child._abs = child._home = None
+        if len(args) == 1 and isinstance(args[0], str) and args[0] not in ("", ".") \
+                and "/" not in args[0]:
+            child._path = self._path / args[0]
+            # Extend the absolute path of this path for a plain child name,
+            # instead of computing it again from all parts.
+            if self._abs is not None:
+                child._abs = self._abs.rstrip("/") + "/" + args[0]
+                child._home = self._home
+        else:
+            child._path = self._path.joinpath(*(a._path if isinstance(a, IrodsPath) else a
+                                                for a in args))
+        return child
 
     @property
     def parent(self):
@@ -86,6 +129,8 @@ class IrodsPath():
         except irods.exception.CUT_ACTION_PROCESSED_ERR as exc:
             raise irods.exception.CUT_ACTION_PROCESSED_ERR(
                 f"While removing {self}: iRODS server forbids action.") from exc
+        finally:
+            invalidate(self.session, self)
 
     @staticmethod
     def create_collection(session,  coll_path: str) -> irods.collection.iRODSCollection:
@@ -98,10 +143,12 @@ class IrodsPath():
             The
         """
         try:
-            return session.irods_session.collections.create(str(coll_path))
+            coll = session.irods_session.collections.create(str(coll_path))
         except irods.exception.CUT_ACTION_PROCESSED_ERR as exc:
             raise irods.exception.CUT_ACTION_PROCESSED_ERR(
                 "While creating collection '{coll_path}': iRODS server forbids action.") from exc
+        invalidate(session, coll_path)
+        return coll
 
     def rename(self):
         """
@@ -113,13 +160,27 @@ class IrodsPath():
         """
         Check if the path points to an iRODS collection
         """
-        return self.session.irods_session.collections.exists(str(self))
+        return self._cached_exists(COLLECTION)
 
     def dataobject_exists(self) -> bool:
         """
         Check if the path points to an iRODS data object
         """
-        return self.session.irods_session.data_objects.exists(str(self))
+        return self._cached_exists(DATAOBJECT)
+
+    def _cached_exists(self, kind: str) -> bool:
+        """Answer an existence check from the stat cache of the session, if it has one."""
+        path = str(self)
+        stat_cache = getattr(self.session, "stat_cache", None)
+        exists = None if stat_cache is None else stat_cache.get(path, kind)
+        if exists is None:
+            if kind == COLLECTION:
+                exists = self.session.irods_session.collections.exists(path)
+            else:
+                exists = self.session.irods_session.data_objects.exists(path)
+            if stat_cache is not None:
+                stat_cache.put(path, kind, exists)
+        return exists
 
     def exists(self) -> bool:
         """
@@ -127,13 +188,297 @@ class IrodsPath():
         """
         return self.dataobject_exists() or self.collection_exists()
 
-    def walk(self, depth: int):
+    def read_bytes(self) -> bytearray:
+        """Read the contents of the data object into memory, without a local file.
+
+        Returns
+        -------
+        bytearray
+            The contents of the data object.
         """
-        Walk on a collection.
+        size = self.session.irods_session.data_objects.get(str(self)).size
+        buffer = bytearray(size)
+        n_bytes = self.readinto(buffer)
+        del buffer[n_bytes:]
+        return buffer
+
+    def readinto(self, buffer: Union[bytearray, memoryview]) -> int:
+        """Fill a caller-provided buffer with the first bytes of the data object.
+
+        The data is received straight into the buffer, without intermediate
+        copies.
+
+        Parameters
+        ----------
+        buffer : bytearray or memoryview
+            Writable buffer, at most len(buffer) bytes are read.
+
+        Returns
+        -------
+        int
+            Number of bytes read, less than len(buffer) if the data object is smaller.
+        """
+        with self.open("r") as handle:
+            return _readinto(handle, buffer)
+
+    def read_range(self, offset: int, length: int) -> bytearray:
+        """Read a byte range of the data object, without retrieving the rest.
+
+        Parameters
+        ----------
+        offset : int
+            Position of the first byte to read.
+        length : int
+            Number of bytes to read.
+
+        Returns
+        -------
+        bytearray
+            The bytes of the range, fewer than `length` if the range extends
+            beyond the end of the data object.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError(f"Invalid byte range, offset {offset} and length {length}.")
+        buffer = bytearray(length)
+        with self.open("r") as handle:
+            handle.seek(offset)
+            n_bytes = _readinto(handle, buffer)
+        del buffer[n_bytes:]
+        return buffer
+
+    def open(self, mode: str = "r") -> io.BufferedRandom:
+        """Open the data object as a seekable binary file.
+
+        Only the bytes that are read are transferred, so seek and read can be
+        used to retrieve e.g. the header or index blocks of a large data object.
+
+        Parameters
+        ----------
+        mode : str
+            'r' for reading, 'r+' for reading and writing, 'w' to create or truncate
+            the data object, 'a' to append.
+
+        Returns
+        -------
+        io.BufferedRandom
+            File object, to be used as a context manager or closed by the caller.
+        """
+        if mode not in ("r", "r+", "w", "w+", "a", "a+"):
+            raise ValueError(f"Invalid mode '{mode}' for opening a data object.")
+        handle = self.session.irods_session.data_objects.open(str(self), mode)
+        if mode != "r":
+            invalidate(self.session, self)
+        return handle
+
+    def write_bytes(self, data: Union[bytes, bytearray, memoryview],
+                    overwrite: bool = False) -> int:
+        """Write the contents of a data object from memory, without a local file.
+
+        Parameters
+        ----------
+        data : bytes, bytearray or memoryview
+            The new contents of the data object.
+        overwrite : bool
+            Replace the contents of an existing data object.
+
+        Returns
+        -------
+        int
+            Number of bytes written.
+
+        Raises
+        ------
+        irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+            If the data object exists and overwrite is False.
+        """
+        if not overwrite and self.dataobject_exists():
+            raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+        with self.open("w") as handle:
+            return handle.write(data)
+
+    def glob(self, pattern: str) -> Iterator[IrodsPath]:
+        """Find the collections and data objects below this collection that match `pattern`.
+
+        The pattern is relative to this collection and uses the glob syntax of pathlib:
+        '*' and '?' match within a single name, '[...]' matches a character class and
+        a '**' name matches this collection and all collections below it. The pattern is
+        translated into LIKE filters, so that the whole tree is searched with one paged
+        query for collections and one for data objects. The results are streamed.
+
+        Parameters
+        ----------
+        pattern : str
+            Glob pattern, e.g. '*.h5' or 'raw/**/*.h5'.
+
+        Yields
+        ------
+        IrodsPath
+            The matching collections, followed by the matching data objects.
+        """
+        if not pattern or pattern.startswith("/"):
+            raise ValueError(f"Glob pattern should be relative and not empty, not '{pattern}'.")
+        root = str(self)
+        segments = [seg for seg in pattern.split("/") if seg not in ("", ".")]
+        coll_regex = re.compile(_glob_regex(root, segments))
+        coll_query = IrodsQuery(self.session, kw.COLL_NAME).filter(
+            kw.LIKE(kw.COLL_NAME, _glob_like(root, segments)))
+        for res in coll_query:
+            if coll_regex.fullmatch(res[kw.COLL_NAME]):
+                yield IrodsPath(self.session, res[kw.COLL_NAME])
+
+        # A '**' name only matches collections.
+        if segments[-1] == "**":
+            return
+        parent_regex = re.compile(_glob_regex(root, segments[:-1]))
+        name_regex = re.compile(_segment_regex(segments[-1]))
+        parent_like = _glob_like(root, segments[:-1])
+        data_query = IrodsQuery(self.session, kw.COLL_NAME, kw.DATA_NAME)
+        if any(_is_wildcard(seg) for seg in segments[:-1]):
+            data_query = data_query.filter(kw.LIKE(kw.COLL_NAME, parent_like))
+        else:
+            # Without wildcards in the collection part, the catalog index can be used.
+            data_query = data_query.filter(kw.COLL_NAME == parent_like)
+        data_query = data_query.filter(kw.LIKE(kw.DATA_NAME, _segment_like(segments[-1])))
+        for res in data_query:
+            if parent_regex.fullmatch(res[kw.COLL_NAME]) \
+                    and name_regex.fullmatch(res[kw.DATA_NAME]):
+                yield IrodsPath(self.session, res[kw.COLL_NAME], res[kw.DATA_NAME])
+
+    def rglob(self, pattern: str) -> Iterator[IrodsPath]:
+        """Find matches of `pattern` at any depth below this collection, see glob.
+
+        Yields
+        ------
+        IrodsPath
+            The matching collections, followed by the matching data objects.
+        """
+        return self.glob("**/" + pattern)
+
+    def walk(self, depth: Optional[int] = None
+             ) -> Iterator[tuple[IrodsPath, list[IrodsPath], list[IrodsPath]]]:
+        """
+        Walk on a collection, top-down and one level of the tree at a time.
+
+        The children of all collections of a level are retrieved with one query for
+        subcollections and one for data objects per WALK_BATCH_SIZE collections,
+        instead of queries for every collection. Results are paged by the server
+        and yielded as soon as a batch is complete.
 
         Parameters
         ----------
         depth : int
             Stops after depth many iterations, even if the tree is deeper.
+            Depth 1 only yields the collection itself. By default the whole tree is walked.
+
+        Yields
+        ------
+        tuple
+            (collection, [subcollections], [data objects]) as IrodsPaths.
         """
-        raise NotImplementedError("Walk method not implemented yet.")
+        if not self.collection_exists():
+            raise ValueError(f"Cannot walk '{self}', it is not a collection.")
+        level = [str(self)]
+        cur_depth = 1
+        while level and (depth is None or cur_depth <= depth):
+            next_level = []
+            for i_batch in range(0, len(level), WALK_BATCH_SIZE):
+                batch = level[i_batch:i_batch+WALK_BATCH_SIZE]
+                subcolls = self._children(kw.COLL_PARENT_NAME, kw.COLL_NAME, batch)
+                data_objs = self._children(kw.COLL_NAME, kw.DATA_NAME, batch)
+                for coll in batch:
+                    coll_subcolls = sorted(subcolls.get(coll, ()))
+                    next_level.extend(coll_subcolls)
+                    yield (IrodsPath(self.session, coll),
+                           [IrodsPath(self.session, sub) for sub in coll_subcolls],
+                           [IrodsPath(self.session, coll, name)
+                            for name in sorted(data_objs.get(coll, ()))])
+            level = next_level
+            cur_depth += 1
+
+    def _children(self, parent_column, child_column, parents: list[str]) -> dict[str, set[str]]:
+        """Names of the children (in `child_column`) of all `parents`, with a single query."""
+        query = IrodsQuery(self.session, parent_column, child_column)
+        children: dict[str, set[str]] = {}
+        for res in query.filter(kw.IN(parent_column, parents)):
+            # The root collection is its own parent.
+            if res[child_column] != res[parent_column]:
+                children.setdefault(res[parent_column], set()).add(res[child_column])
+        return children
+
+
+def _readinto(handle: io.BufferedIOBase, buffer: Union[bytearray, memoryview]) -> int:
+    """Fill `buffer` from the current position of `handle`, at most READ_CHUNK_SIZE per read."""
+    view = memoryview(buffer).cast("B")
+    n_bytes = 0
+    while n_bytes < len(view):
+        n_read = handle.readinto(view[n_bytes:n_bytes+READ_CHUNK_SIZE])
+        if not n_read:
+            break
+        n_bytes += n_read
+    return n_bytes
+
+
+def _is_wildcard(segment: str) -> bool:
+    return any(char in segment for char in "*?[")
+
+def _glob_segment_parts(segment: str) -> Iterator[tuple[str, str]]:
+    """Split a glob segment into (kind, text) tokens: '*', '?', '[' (class) or literal."""
+    i_char = 0
+    while i_char < len(segment):
+        char = segment[i_char]
+        if char == "[":
+            end = segment.find("]", i_char + 2)
+            if end != -1:
+                yield "[", segment[i_char+1:end]
+                i_char = end + 1
+                continue
+        if char in "*?":
+            yield char, char
+        else:
+            yield "", char
+        i_char += 1
+
+def _segment_regex(segment: str) -> str:
+    """Regular expression for a single name of a glob pattern."""
+    regex = ""
+    for kind, text in _glob_segment_parts(segment):
+        if kind == "*":
+            regex += "[^/]*"
+        elif kind == "?":
+            regex += "[^/]"
+        elif kind == "[":
+            text = text.replace("\\", "\\\\")
+            if text.startswith("!"):
+                text = "^" + text[1:]
+            elif text.startswith("^"):
+                text = "\\" + text
+            regex += "[" + text + "]"
+        else:
+            regex += re.escape(text)
+    return regex
+
+def _segment_like(segment: str) -> str:
+    """LIKE pattern for a single name of a glob pattern."""
+    return "".join({"*": "%", "?": "_", "[": "_"}.get(kind, text)
+                   for kind, text in _glob_segment_parts(segment))
+
+def _glob_regex(root: str, segments: list[str]) -> str:
+    """Regular expression that matches the paths of a glob pattern exactly."""
+    regex = re.escape(root.rstrip("/"))
+    for segment in segments:
+        regex += "(?:/[^/]+)*" if segment == "**" else "/" + _segment_regex(segment)
+    return regex or "/"
+
+def _glob_like(root: str, segments: list[str]) -> str:
+    """LIKE pattern that matches at least all paths of a glob pattern.
+
+    Literal '%' and '_' also act as wildcards, so the results have to be checked
+    with the regular expression of the pattern.
+    """
+    like = root.rstrip("/")
+    for segment in segments:
+        if segment == "**":
+            like += "%"
+        else:
+            like += ("" if like.endswith("%") else "/") + _segment_like(segment)
+    return like or "/"
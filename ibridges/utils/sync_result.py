@@ -0,0 +1,25 @@
+""" Utilities for synchronising files
+"""
+
+from typing import Optional
+
+
+class SyncResult:  # pylint: disable=too-few-public-methods
+    """
+    Return value object for determining diffs
+    """
+    source_path: Optional[str] = None  # can be both a irods or (local) filesystem
+    target_path: Optional[str] = None  # can be both a irods or (local) filesystem
+    source_file_size: Optional[int] = None  # bytes
+    reason: Optional[str] = None  # why the file has to be transferred
+
+    def __init__(self, source: str, target: str, filesize: int,
+                 reason: Optional[str] = None) -> None:
+        self.source_path = source
+        self.target_path = target
+        self.source_file_size = filesize
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return (f"SyncResult({self.source_path} -> {self.target_path}, "
+                f"{self.source_file_size} bytes, {self.reason})")
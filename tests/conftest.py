@@ -0,0 +1,164 @@
+import operator
+import re
+
+import pytest
+
+from ibridges.irodsconnector.query import MAX_PAGE_SIZE
+
+OPERATORS = {"=": operator.eq, ">": operator.gt, ">=": operator.ge, "<": operator.lt,
+             "<=": operator.le}
+AGGREGATES = {"count": len, "sum": sum, "min": min, "max": max,
+              "avg": lambda values: sum(values) / len(values)}
+
+
+def match(criterion, value):
+    """Whether a catalog value satisfies a criterion of python-irodsclient."""
+    if hasattr(criterion, "criteria"):
+        return any(match(sub, value) for sub in criterion.criteria)
+    if criterion.op == "in":
+        return str(value) in map(str, criterion._value)
+    if criterion.op in ("like", "not like"):
+        regex = "".join({"%": ".*", "_": "."}.get(char, re.escape(char))
+                        for char in str(criterion._value))
+        return (re.fullmatch(regex, str(value), re.DOTALL) is not None) == (criterion.op == "like")
+    if criterion.op == "=":
+        return str(value) == str(criterion._value)
+    return OPERATORS[criterion.op](value, criterion._value)
+
+
+def _is_meta(column):
+    return column.icat_key.startswith("COL_META_")
+
+
+class MockQuery:
+    """GenQuery on the rows of a MockCatalog.
+
+    Only rows that have all selected and filtered columns are found, and rows with
+    AVU columns only if an AVU column is used, as GenQuery only joins the metadata
+    tables when needed. Like GenQuery the rows are distinct and, with aggregates,
+    grouped by the other columns. Without order_by they are ordered on the selected
+    columns.
+    """
+
+    def __init__(self, catalog, columns):
+        self.catalog = catalog
+        # column -> aggregate function, None if the column is not aggregated
+        self.columns = {col: None for col in columns}
+        self.criteria = []
+        self.ordering = []
+        self.page_size = catalog.page_size
+        self.calls = []
+
+    def _call(self, name, *args):
+        self.calls.append((name, *args))
+        return self
+
+    def filter(self, criterion):
+        self.criteria.append(criterion)
+        return self._call("filter", criterion.query_key, criterion.op, criterion.value)
+
+    def order_by(self, column, order="asc"):
+        self.ordering.append((column, order == "desc"))
+        self.columns.setdefault(column, None)
+        return self._call("order_by", column, order)
+
+    def limit(self, limit):
+        self.page_size = limit
+        return self._call("limit", limit)
+
+    def _aggregate(self, function, column):
+        self.columns[column] = AGGREGATES[function]
+        return self._call(function, column)
+
+    def count(self, column):
+        return self._aggregate("count", column)
+
+    def sum(self, column):
+        return self._aggregate("sum", column)
+
+    def min(self, column):
+        return self._aggregate("min", column)
+
+    def max(self, column):
+        return self._aggregate("max", column)
+
+    def avg(self, column):
+        return self._aggregate("avg", column)
+
+    def get_results(self):
+        needed = list(self.columns) + [crit.query_key for crit in self.criteria]
+        with_meta = any(_is_meta(col) for col in needed)
+        rows = [row for row in self.catalog.rows
+                if all(col in row for col in needed)
+                and (with_meta or not any(_is_meta(col) for col in row))
+                and all(match(crit, row[crit.query_key]) for crit in self.criteria)]
+        group_cols = [col for col, func in self.columns.items() if func is None]
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row[col] for col in group_cols), []).append(row)
+        if len(group_cols) < len(self.columns) and not groups:
+            # Aggregates without rows give one row without values.
+            results = [{col: "" for col in self.columns}]
+        else:
+            results = []
+            for key, group in groups.items():
+                result = dict(zip(group_cols, key))
+                for col, func in self.columns.items():
+                    if func is not None:
+                        result[col] = func([row[col] for row in group])
+                results.append(result)
+        if not self.ordering:
+            results.sort(key=lambda res: tuple(str(res[col]) for col in group_cols))
+        for column, descending in reversed(self.ordering):
+            results.sort(key=lambda res, col=column: res[col], reverse=descending)
+        return results
+
+    def get_batches(self):
+        self.catalog.queries.append(self)
+        results = self.get_results()
+        try:
+            for start in range(0, len(results), self.page_size):
+                self.catalog.n_pages += 1
+                yield results[start:start+self.page_size]
+        except GeneratorExit:
+            self.catalog.n_closed += 1
+
+
+class MockCatalog:
+    """Catalog of rows from column to value, which can be queried like an iRODS session.
+
+    The rows are a list or a function that returns the current rows.
+    """
+
+    def __init__(self, rows=(), page_size=MAX_PAGE_SIZE):
+        self._rows = rows
+        self.page_size = page_size
+        self.queries = []
+        self.n_pages = 0
+        self.n_closed = 0
+
+    @property
+    def rows(self):
+        return self._rows() if callable(self._rows) else self._rows
+
+    @property
+    def n_queries(self):
+        return len(self.queries)
+
+    def query(self, *columns):
+        return MockQuery(self, columns)
+
+
+class MockSession:
+    home = "/zone/home/user"
+
+    def __init__(self, rows=(), page_size=MAX_PAGE_SIZE):
+        self.irods_session = MockCatalog(rows, page_size)
+        self.query_hook = None
+        self.stat_cache = None
+
+
+@pytest.fixture
+def mock_session():
+    """Factory of sessions with a MockCatalog of the given rows."""
+    return MockSession
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from pytest import raises
+
+from ibridges.aio import AsyncSession
+
+
+class MockIrodsSession:
+    home = "/testzone/home/testuser"
+    irods_session = None
+
+
+def test_async_session_run():
+    session = MockIrodsSession()
+    loop_thread = threading.get_ident()
+
+    def _operation(cur_session, value, offset=0):
+        assert cur_session is session
+        return value + offset, threading.get_ident()
+
+    async def _main():
+        async with AsyncSession(session, max_workers=4) as asession:
+            return await asyncio.gather(*(asession.run(_operation, i, offset=1)
+                                          for i in range(20)))
+
+    results = asyncio.run(_main())
+    assert [value for value, _ in results] == list(range(1, 21))
+    assert all(thread != loop_thread for _, thread in results)
+    assert len({thread for _, thread in results}) <= 4
+
+
+def test_async_session_error():
+    def _operation(_):
+        raise KeyError("missing")
+
+    async def _main():
+        async with AsyncSession(MockIrodsSession()) as asession:
+            await asession.run(_operation)
+
+    with raises(KeyError):
+        asyncio.run(_main())
+    with raises(ValueError):
+        AsyncSession(MockIrodsSession(), max_workers=0)
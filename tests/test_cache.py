@@ -0,0 +1,61 @@
+import os
+
+from ibridges.irodsconnector.cache import DownloadCache
+from ibridges.utils.checksum import local_checksum
+
+
+def _write(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def _store(cache, path):
+    checksum = local_checksum(path, "sha2:")
+    cache.store(checksum, path)
+    return checksum
+
+
+def test_cache_hit_miss(tmp_path):
+    cache = DownloadCache(tmp_path / "cache", max_size=1000)
+    source = _write(tmp_path / "a.bin", 100)
+    checksum = local_checksum(source, "sha2:")
+    assert not cache.fetch(checksum, tmp_path / "copy.bin")
+    cache.store(checksum, source)
+    assert cache.fetch(checksum, tmp_path / "copy.bin")
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    assert (cache.hits, cache.misses, len(cache), cache.size) == (1, 1, 1, 100)
+    assert cache.hit_rate == 0.5
+
+    # The index is rebuilt from the cache directory.
+    cache = DownloadCache(tmp_path / "cache", max_size=1000)
+    assert len(cache) == 1
+    assert cache.fetch(checksum, tmp_path / "copy2.bin")
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = DownloadCache(tmp_path / "cache", max_size=250)
+    sum_a, sum_b = (_store(cache, _write(tmp_path / name, 100)) for name in ["a", "b"])
+    # Use "a", so that "b" is the least recently used.
+    assert cache.fetch(sum_a, tmp_path / "a.copy")
+    _store(cache, _write(tmp_path / "c", 100))
+    assert cache.evictions == 1
+    assert cache.size == 200
+    assert not cache.fetch(sum_b, tmp_path / "b.copy")
+    assert cache.fetch(sum_a, tmp_path / "a.copy")
+    # Files larger than the budget are not cached.
+    sum_d = _store(cache, _write(tmp_path / "d", 300))
+    assert not cache.fetch(sum_d, tmp_path / "d.copy")
+
+
+def test_cache_hardlink(tmp_path):
+    cache = DownloadCache(tmp_path / "cache", hardlink=True)
+    source = _write(tmp_path / "a.bin", 10)
+    checksum = _store(cache, source)
+    assert cache.fetch(checksum, tmp_path / "copy.bin")
+    assert (tmp_path / "copy.bin").stat().st_ino == source.stat().st_ino
+    # Modifying a downloaded file also modifies the cached copy, which is then dropped.
+    with open(tmp_path / "copy.bin", "ab") as handle:
+        handle.write(b"edit")
+    assert not cache.fetch(checksum, tmp_path / "copy2.bin")
+    assert len(cache) == 0 and not (tmp_path / "copy2.bin").exists()
+    assert (tmp_path / "copy.bin").read_bytes().endswith(b"edit")
@@ -0,0 +1,103 @@
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fsspec")
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsfs import IrodsFileSystem
+
+
+class MockFile(io.BytesIO):
+    def __init__(self, store, path):
+        super().__init__(store.get(path, b""))
+        self.store, self.path = store, path
+
+    def close(self):
+        self.store[self.path] = self.getvalue()
+        super().close()
+
+
+class MockDataObjects:
+    def __init__(self):
+        self.store = {}
+        self.n_opened = 0
+
+    def open(self, path, mode):
+        self.n_opened += 1
+        if mode == "w":
+            self.store[path] = b""
+        return MockFile(self.store, path)
+
+    def exists(self, path):
+        return path in self.store
+
+
+class MockIrodsSession:
+    home = "/testzone/home/testuser"
+
+    def __init__(self):
+        self.irods_session = SimpleNamespace(data_objects=MockDataObjects())
+
+
+class MockFileSystem(IrodsFileSystem):
+    def info(self, path, **kwargs):
+        path = self._strip_protocol(path)
+        data = self.session.irods_session.data_objects.store[path]
+        return {"name": path, "size": len(data), "type": "file"}
+
+
+def test_strip_protocol():
+    assert IrodsFileSystem._strip_protocol("irods://testzone/home/x.csv") == "/testzone/home/x.csv"
+    assert IrodsFileSystem._strip_protocol("irods:///testzone/home/") == "/testzone/home"
+    assert IrodsFileSystem._strip_protocol("/testzone") == "/testzone"
+
+
+def test_write_read():
+    session = MockIrodsSession()
+    fs = MockFileSystem(session=session, skip_instance_cache=True)
+    with fs.open("irods://testzone/home/testuser/data.bin", "wb") as handle:
+        handle.write(b"0123456789")
+    data_objects = session.irods_session.data_objects
+    assert data_objects.store["/testzone/home/testuser/data.bin"] == b"0123456789"
+    with fs.open("/testzone/home/testuser/data.bin", "rb", block_size=4) as handle:
+        handle.seek(3)
+        assert handle.read(4) == b"3456"
+    with pytest.raises(FileExistsError):
+        with fs.open("/testzone/home/testuser/data.bin", "xb") as handle:
+            handle.write(b"new")
+
+    n_opened = data_objects.n_opened
+    ranges = fs.cat_ranges(["/testzone/home/testuser/data.bin"] * 3, [0, 5, -2], [2, 7, None])
+    assert ranges == [b"01", b"56", b"89"]
+    assert data_objects.n_opened == n_opened + 1
+    assert isinstance(fs.cat_ranges(["/testzone/missing"], [0], [1])[0], KeyError)
+
+
+def test_find(mock_session):
+    colls = ["/zone/run1", "/zone/run1/sub", "/zone/run10"]
+    session = mock_session([{kw.COLL_NAME: coll, kw.DATA_NAME: "x.txt", kw.DATA_SIZE: "3",
+                             kw.DATA_MODIFY_TIME: datetime(2024, 1, 1), kw.DATA_CHECKSUM: None}
+                            for coll in colls])
+    session.irods_session.collections = SimpleNamespace(exists=lambda path: path in colls)
+    fs = IrodsFileSystem(session=session, skip_instance_cache=True)
+    assert fs.find("irods:///zone/run1") == ["/zone/run1/sub/x.txt", "/zone/run1/x.txt"]
+    assert fs.find("/zone/run1", withdirs=True) == [
+        "/zone/run1/sub", "/zone/run1/sub/x.txt", "/zone/run1/x.txt"]
+    # The sibling run10 is excluded by the server.
+    assert len(session.irods_session.queries[0].get_results()) == 2
+
+
+def test_info(mock_session):
+    session = mock_session([{kw.COLL_NAME: "/zone/coll", kw.DATA_NAME: f"{i}.txt",
+                             kw.DATA_SIZE: str(i), kw.DATA_MODIFY_TIME: datetime(2024, 1, 1),
+                             kw.DATA_CHECKSUM: None} for i in range(100)])
+    session.irods_session.collections = SimpleNamespace(exists=lambda path: path == "/zone/coll")
+    fs = IrodsFileSystem(session=session, skip_instance_cache=True)
+    assert fs.info("/zone/coll/42.txt")["size"] == 42
+    # Only the row of the data object is retrieved, not the whole collection.
+    assert len(session.irods_session.queries[0].get_results()) == 1
+    with pytest.raises(FileNotFoundError):
+        fs.info("/zone/coll/missing.txt")
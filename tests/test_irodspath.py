@@ -1,10 +1,15 @@
+import io
 from pathlib import PurePosixPath
-from pytest import mark
+from pytest import mark, raises
 import os
 from pathlib import Path
+from types import SimpleNamespace
+
+import irods.exception
 
 from ibridges import IrodsPath
-from ibridges.irodsconnector.data_operations import _create_irods_dest
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import _collection_levels, _create_irods_dest
 
 class MockIrodsSession:
     zone = "testzone"
@@ -76,3 +81,160 @@ def test_create_irods_paths():
         irods_parts = dest.parts[dest.parts.index("testdata"):]
         assert list(local_parts) == list(irods_parts)
         assert str(dest).split("testdata")[0].rstrip("/") == session.home
+
+def test_collection_levels():
+    session = MockIrodsSession()
+    local_path = Path("tests/testdata").absolute()
+    irods_path = IrodsPath(session, "~", "upload")
+    source_to_dest = _create_irods_dest(local_path, irods_path)
+    levels = _collection_levels(irods_path, (dest for _, dest in source_to_dest))
+    assert [[str(coll) for coll in level] for level in levels] == [
+        ["/testzone/home/testuser/upload/testdata"],
+        ["/testzone/home/testuser/upload/testdata/subfolder"],
+    ]
+
+
+def test_collection_levels_sparse():
+    irods_path = IrodsPath(MockIrodsSession(), "/zone/upload")
+    dests = [irods_path / "a/b/c/file", irods_path / "a/x/f1", irods_path / "a/y/f2"]
+    levels = _collection_levels(irods_path, dests)
+    # Missing parents are created with the collections that hold files.
+    assert [[str(coll) for coll in level] for level in levels] == [
+        ["/zone/upload/a/x", "/zone/upload/a/y"], ["/zone/upload/a/b/c"]]
+    # In parallel their common parent is created first.
+    levels = _collection_levels(irods_path, dests, n_workers=4)
+    assert [[str(coll) for coll in level] for level in levels] == [
+        ["/zone/upload/a"], ["/zone/upload/a/x", "/zone/upload/a/y"], ["/zone/upload/a/b/c"]]
+
+
+class MockFile(io.BytesIO):
+    def __init__(self, store, path):
+        super().__init__(store.get(path, b""))
+        self.store, self.path = store, path
+
+    def close(self):
+        self.store[self.path] = self.getvalue()
+        super().close()
+
+
+class MockDataObjects:
+    def __init__(self):
+        self.store = {}
+
+    def open(self, path, mode):
+        if mode == "w":
+            self.store[path] = b""
+        return MockFile(self.store, path)
+
+    def get(self, path):
+        return SimpleNamespace(size=len(self.store[path]))
+
+    def exists(self, path):
+        return path in self.store
+
+
+def test_read_write_bytes():
+    session = MockIrodsSession()
+    session.irods_session = SimpleNamespace(data_objects=MockDataObjects())
+    ipath = IrodsPath(session, "~", "data.bin")
+    assert ipath.write_bytes(b"0123456789") == 10
+    with raises(irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG):
+        ipath.write_bytes(b"abc")
+    assert ipath.read_bytes() == b"0123456789"
+    buffer = bytearray(4)
+    assert ipath.readinto(buffer) == 4
+    assert buffer == b"0123"
+    buffer = bytearray(20)
+    assert ipath.readinto(memoryview(buffer)[5:]) == 10
+    assert buffer[5:15] == b"0123456789"
+    ipath.write_bytes(memoryview(b"abc"), overwrite=True)
+    assert ipath.read_bytes() == b"abc"
+
+
+def test_read_range():
+    session = MockIrodsSession()
+    session.irods_session = SimpleNamespace(data_objects=MockDataObjects())
+    ipath = IrodsPath(session, "~", "data.bin")
+    ipath.write_bytes(b"0123456789")
+    assert ipath.read_range(2, 3) == b"234"
+    assert ipath.read_range(8, 5) == b"89"
+    assert ipath.read_range(20, 5) == b""
+    with raises(ValueError):
+        ipath.read_range(-1, 5)
+    with raises(ValueError):
+        ipath.open("rb")
+    with ipath.open() as handle:
+        handle.seek(5)
+        assert handle.read(2) == b"56"
+
+
+def _tree_session(mock_session, colls, data_objs):
+    rows = [{kw.COLL_NAME: coll, kw.COLL_PARENT_NAME: str(PurePosixPath(coll).parent)}
+            for coll in colls]
+    rows += [{kw.COLL_NAME: coll, kw.DATA_NAME: name} for coll, name in data_objs]
+    session = mock_session(rows)
+    session.irods_session.collections = SimpleNamespace(exists=lambda path: path in colls)
+    return session
+
+
+def test_walk(mock_session):
+    colls = ["/", "/zone", "/zone/a", "/zone/b", "/zone/a/c"]
+    data_objs = [("/zone", "x.txt"), ("/zone/a", "y.txt"), ("/zone/a", "y.txt"),
+                 ("/zone/a/c", "z.txt")]
+    session = _tree_session(mock_session, colls, data_objs)
+    walked = [(str(coll), [str(sub) for sub in subs], [str(obj) for obj in objs])
+              for coll, subs, objs in IrodsPath(session, "/zone").walk()]
+    assert walked == [
+        ("/zone", ["/zone/a", "/zone/b"], ["/zone/x.txt"]),
+        ("/zone/a", ["/zone/a/c"], ["/zone/a/y.txt"]),
+        ("/zone/b", [], []),
+        ("/zone/a/c", [], ["/zone/a/c/z.txt"]),
+    ]
+    # Two queries per level.
+    assert session.irods_session.n_queries == 6
+    assert len(list(IrodsPath(session, "/zone").walk(depth=2))) == 3
+    assert [str(coll) for coll, _, _ in IrodsPath(session, "/").walk(depth=2)] == ["/", "/zone"]
+    with raises(ValueError):
+        next(IrodsPath(session, "/zone/x.txt").walk())
+
+
+def test_cached_absolute_path():
+    session = MockIrodsSession()
+    session.home = "/testzone/home/testuser"
+    ipath = IrodsPath(session, "~", "coll")
+    assert not hasattr(ipath, "__dict__")
+    assert str(ipath) == "/testzone/home/testuser/coll"
+    for name in ["x.txt", "..", "sub/y.txt", "/abs", IrodsPath(session, "z")]:
+        child = ipath / name
+        assert str(child) == child.absolute_path()
+    # Relative paths follow a change of the home collection.
+    session.home = "/testzone/home/other"
+    assert str(ipath) == "/testzone/home/other/coll"
+    assert str(ipath / "x.txt") == "/testzone/home/other/coll/x.txt"
+    assert str(IrodsPath(session, "/abs", "x")) == "/abs/x"
+
+
+def test_glob(mock_session):
+    colls = ["/", "/zone", "/zone/proj", "/zone/proj/raw", "/zone/proj/raw/2024",
+             "/zone/proj/raw.h5", "/zone/project"]
+    data_objs = [("/zone/proj", "a.h5"), ("/zone/proj", "a.txt"), ("/zone/proj", "b_h5"),
+                 ("/zone/proj/raw", "c.h5"), ("/zone/proj/raw/2024", "d.h5"),
+                 ("/zone/proj/raw/2024", "e1.dat"), ("/zone/project", "f.h5")]
+    session = _tree_session(mock_session, colls, data_objs)
+    proj = IrodsPath(session, "/zone/proj")
+
+    def _glob(pattern, recursive=False):
+        paths = proj.rglob(pattern) if recursive else proj.glob(pattern)
+        return sorted(str(path) for path in paths)
+
+    assert _glob("*.h5") == ["/zone/proj/a.h5", "/zone/proj/raw.h5"]
+    assert _glob("*.h5", recursive=True) == [
+        "/zone/proj/a.h5", "/zone/proj/raw.h5", "/zone/proj/raw/2024/d.h5", "/zone/proj/raw/c.h5"]
+    assert _glob("raw/*/*.dat") == ["/zone/proj/raw/2024/e1.dat"]
+    assert _glob("**/e[0-9].dat") == ["/zone/proj/raw/2024/e1.dat"]
+    assert _glob("?_h5") == ["/zone/proj/b_h5"]
+    assert _glob("raw") == ["/zone/proj/raw"]
+    assert _glob("**") == ["/zone/proj", "/zone/proj/raw", "/zone/proj/raw.h5",
+                           "/zone/proj/raw/2024"]
+    with raises(ValueError):
+        _glob("/zone/*")
@@ -0,0 +1,229 @@
+import hashlib
+import io
+import json
+from types import SimpleNamespace
+
+import irods.exception
+from pytest import raises
+
+from ibridges.irodsconnector import data_operations
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import download, upload
+from ibridges.irodsconnector.journal import TransferJournal
+
+PLAN = [("a", "/zone/a", 100), ("b", "/zone/b", 128), ("c", "/zone/c", 1)]
+
+
+def test_journal_resume(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    journal = TransferJournal(journal_path)
+    assert journal.planned is None
+    journal.plan("/local", "/zone", PLAN, {"/zone/c"}, {"a": "sha2:aaa", "b": None})
+    journal.start("a")
+    journal.progress("a", 100)
+    journal.done("a")
+    journal.start("b")
+    journal.progress("b", 64)
+
+    resumed = TransferJournal(journal_path)
+    assert resumed.planned == PLAN
+    assert resumed.resume_plan("/local", "/zone") == PLAN
+    assert resumed.existing == {"/zone/c"}
+    assert resumed.checksums == {"a": "sha2:aaa"}
+    assert resumed.is_done("a")
+    assert not resumed.is_done("b")
+    assert resumed.offset("b") == 64
+    assert resumed.offset("c") is None
+
+    # Restarting a transfer keeps the recorded offset.
+    resumed.start("b")
+    assert TransferJournal(journal_path).offset("b") == 64
+
+    # The journal belongs to a single job.
+    with raises(ValueError):
+        resumed.resume_plan("/local", "/zone/other")
+
+
+def test_journal_partial_line(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    journal = TransferJournal(journal_path)
+    journal.plan("/local", "/zone", [("a", "/zone/a", 0)])
+    with open(journal_path, "a", encoding="utf-8") as handle:
+        handle.write('{"event": "do')
+    resumed = TransferJournal(journal_path)
+    assert resumed.planned == [("a", "/zone/a", 0)]
+    assert not resumed.is_done("a")
+    resumed.done("a")
+    assert TransferJournal(journal_path).is_done("a")
+
+
+def test_journal_truncated_plan(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    TransferJournal(journal_path).plan("/local", "/zone", PLAN)
+    lines = journal_path.read_text(encoding="utf-8").splitlines(keepends=True)
+    # The process crashed while the plan was written.
+    journal_path.write_text("".join(lines[:3]), encoding="utf-8")
+    journal = TransferJournal(journal_path)
+    assert journal.planned is None
+    assert journal.resume_plan("/local", "/other") is None
+    # The job is planned again.
+    journal.plan("/local", "/zone", PLAN)
+    assert TransferJournal(journal_path).planned == PLAN
+
+
+class CrashingDataObjects:
+    """Uploads that crash after `n_puts` files."""
+
+    def __init__(self, n_puts=None):
+        self.n_puts = n_puts
+        self.uploaded = []
+
+    def put(self, local_path, irods_path, **_):
+        if self.n_puts is not None and len(self.uploaded) == self.n_puts:
+            raise RuntimeError("Connection lost")
+        self.uploaded.append(irods_path)
+
+
+def _upload_session(mock_session, data_objects):
+    session = mock_session([])
+    session.irods_session.collections = SimpleNamespace(create=lambda path: None)
+    session.irods_session.data_objects = data_objects
+    return session
+
+
+def _local_dir(tmp_path, n_files=20):
+    local_dir = tmp_path / "data"
+    local_dir.mkdir()
+    for i in range(n_files):
+        (local_dir / f"file_{i:02}.txt").write_text(f"content {i}", encoding="utf-8")
+    return local_dir
+
+
+def test_resume_upload(mock_session, tmp_path):
+    local_dir = _local_dir(tmp_path)
+    journal_path = tmp_path / "journal.jsonl"
+    crashing = CrashingDataObjects(n_puts=5)
+    session = _upload_session(mock_session, crashing)
+    with raises(RuntimeError):
+        upload(session, local_dir, "/zone/home/user", journal=journal_path)
+    assert len(crashing.uploaded) == 5
+
+    data_objects = CrashingDataObjects()
+    session = _upload_session(mock_session, data_objects)
+    stats = upload(session, local_dir, "/zone/home/user", journal=journal_path)
+    # The 15 files that were not done are uploaded, without listing the destination again.
+    assert stats.n_files == 15
+    assert sorted(crashing.uploaded + data_objects.uploaded) == [
+        f"/zone/home/user/data/file_{i:02}.txt" for i in range(20)]
+    # Only the existence of the destination collection is checked, with 2 queries.
+    assert session.irods_session.n_queries == 2
+    assert upload(session, local_dir, "/zone/home/user", journal=journal_path).n_files == 0
+    with raises(ValueError):
+        upload(session, local_dir, "/zone/home/user/other", journal=journal_path)
+
+
+def test_resume_upload_truncated_plan(mock_session, tmp_path):
+    local_dir = _local_dir(tmp_path)
+    journal_path = tmp_path / "journal.jsonl"
+    # Only the first 5 items of the plan were written before the crash.
+    TransferJournal(journal_path).plan(
+        str(local_dir.absolute()), "/zone/home/user",
+        [(str(path), f"/zone/home/user/data/{path.name}", 9) for path in local_dir.iterdir()])
+    lines = journal_path.read_text(encoding="utf-8").splitlines(keepends=True)
+    assert json.loads(lines[-1]) == {"event": "plan_complete"}
+    journal_path.write_text("".join(lines[:6]), encoding="utf-8")
+
+    data_objects = CrashingDataObjects()
+    stats = upload(_upload_session(mock_session, data_objects), local_dir, "/zone/home/user",
+                   journal=journal_path)
+    assert stats.n_files == 20
+    assert len(data_objects.uploaded) == 20
+
+
+class MockReader(io.BytesIO):
+    """Data object opened for reading, which breaks down after `n_reads` reads."""
+
+    def __init__(self, content, n_reads=None):
+        super().__init__(content)
+        self.n_reads = n_reads
+        self.offset = 0
+
+    def seek(self, offset, *args):
+        self.offset = offset
+        return super().seek(offset, *args)
+
+    def read(self, *args):
+        if self.n_reads is not None:
+            if self.n_reads == 0:
+                raise RuntimeError("Connection lost")
+            self.n_reads -= 1
+        return super().read(*args)
+
+
+class MockReadDataObjects:
+    def __init__(self, contents, broken=None, n_reads=None):
+        self.contents = contents
+        self.broken = broken
+        self.n_reads = n_reads
+        self.opened = {}
+
+    def open(self, path, mode):
+        assert mode == "r"
+        reader = MockReader(self.contents[path], self.n_reads if path == self.broken else None)
+        self.opened[path] = reader
+        return reader
+
+
+COLL = "/zone/home/user/coll"
+CONTENTS = {COLL + "/a.txt": b"aaaaaaaaaaaa", COLL + "/sub/b.txt": b"0123456789ab"}
+
+
+def _download_session(mock_session, data_objects, checksums=None):
+    checksums = checksums or {path: hashlib.md5(content).hexdigest()
+                              for path, content in CONTENTS.items()}
+    rows = [{kw.COLL_NAME: path.rsplit("/", 1)[0], kw.DATA_NAME: path.rsplit("/", 1)[1],
+             kw.DATA_SIZE: len(content), kw.DATA_CHECKSUM: checksums[path]}
+            for path, content in CONTENTS.items()]
+    session = mock_session(rows)
+    top = [SimpleNamespace(collection=SimpleNamespace(path=COLL), name="a.txt", size=12,
+                           checksum=checksums[COLL + "/a.txt"])]
+    session.irods_session.collections = SimpleNamespace(
+        exists=lambda path: path in (COLL, COLL + "/sub"),
+        get=lambda path: SimpleNamespace(path=path, data_objects=top))
+    session.irods_session.data_objects = data_objects
+    return session
+
+
+def test_resume_download(mock_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_operations, "CHECKPOINT_SIZE", 4)
+    journal_path = tmp_path / "journal.jsonl"
+    broken = MockReadDataObjects(CONTENTS, broken=COLL + "/sub/b.txt", n_reads=2)
+    with raises(RuntimeError):
+        download(_download_session(mock_session, broken), COLL, tmp_path,
+                 journal=journal_path)
+    assert (tmp_path / "coll" / "sub" / "b.txt").read_bytes() == b"01234567"
+
+    data_objects = MockReadDataObjects(CONTENTS)
+    session = _download_session(mock_session, data_objects)
+    stats = download(session, COLL, tmp_path, journal=journal_path)
+    # The plan and checksums come from the journal, the collection is not listed again.
+    assert session.irods_session.n_queries == 0
+    # a.txt is done, b.txt continues after the 8 bytes that were recorded.
+    assert stats.n_files == 1
+    assert list(data_objects.opened) == [COLL + "/sub/b.txt"]
+    assert data_objects.opened[COLL + "/sub/b.txt"].offset == 8
+    assert (tmp_path / "coll" / "a.txt").read_bytes() == CONTENTS[COLL + "/a.txt"]
+    assert (tmp_path / "coll" / "sub" / "b.txt").read_bytes() == CONTENTS[COLL + "/sub/b.txt"]
+
+
+def test_journaled_download_checksum(mock_session, tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    checksums = {COLL + "/a.txt": hashlib.md5(b"other").hexdigest(),
+                 COLL + "/sub/b.txt": ""}
+    session = _download_session(mock_session, MockReadDataObjects(CONTENTS), checksums)
+    with raises(irods.exception.USER_CHKSUM_MISMATCH):
+        download(session, COLL, tmp_path, journal=journal_path)
+    journal = TransferJournal(journal_path)
+    assert not journal.is_done(COLL + "/a.txt")
+    # The next attempt starts over.
+    assert journal.offset(COLL + "/a.txt") == 0
@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+
+from pytest import raises
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.metadata_index import MetadataIndex
+
+ROOT = "/zone/home/user/project"
+OLD = datetime(2024, 1, 1)
+
+
+class Catalog:
+    """Collections, data objects and AVUs, and the catalog rows they give."""
+
+    def __init__(self):
+        self.colls = {1: ROOT, 2: ROOT + "/raw", 3: ROOT + "_old"}
+        # data id -> (collection id, name, checksum, size, modification time)
+        self.data_objs = {10: (1, "a.csv", "sha2:aaa", 10, OLD),
+                          11: (2, "b.csv", "sha2:bbb", 20, OLD),
+                          12: (3, "c.csv", "sha2:ccc", 30, OLD)}
+        # b.csv has two replicas.
+        self.replicas = {11: 2}
+        # (item id, meta id, name, value, units, modification time)
+        self.data_avus = [(10, 100, "experiment", "2024-A", None, OLD),
+                          (11, 101, "experiment", "2023-B", "run", OLD),
+                          (11, 102, "Instrument", "x-ray", None, OLD),
+                          (12, 100, "experiment", "2024-A", None, OLD)]
+        self.coll_avus = [(2, 103, "experiment", "2024-A", None, OLD)]
+
+    def rows(self):
+        rows = [{kw.COLL_ID: coll_id, kw.COLL_NAME: name, kw.COLL_MODIFY_TIME: OLD}
+                for coll_id, name in self.colls.items()]
+        rows += [{kw.DATA_ID: data_id, kw.DATA_REPL_NUM: repl, kw.DATA_COLL_ID: coll_id,
+                  kw.COLL_NAME: self.colls[coll_id], kw.DATA_NAME: name,
+                  kw.DATA_CHECKSUM: checksum, kw.DATA_SIZE: size, kw.DATA_MODIFY_TIME: mtime}
+                 for data_id, (coll_id, name, checksum, size, mtime) in self.data_objs.items()
+                 for repl in range(self.replicas.get(data_id, 1))]
+        rows += [{kw.DATA_ID: data_id, kw.DATA_REPL_NUM: repl,
+                  kw.COLL_NAME: self.colls[self.data_objs[data_id][0]],
+                  kw.META_DATA_ATTR_ID: str(meta_id), kw.META_DATA_ATTR_NAME: name,
+                  kw.META_DATA_ATTR_VALUE: value, kw.META_DATA_ATTR_UNITS: units,
+                  kw.META_DATA_MODIFY_TIME: mtime}
+                 for data_id, meta_id, name, value, units, mtime in self.data_avus
+                 for repl in range(self.replicas.get(data_id, 1))]
+        rows += [{kw.COLL_ID: coll_id, kw.COLL_NAME: self.colls[coll_id],
+                  kw.META_COLL_ATTR_ID: str(meta_id), kw.META_COLL_ATTR_NAME: name,
+                  kw.META_COLL_ATTR_VALUE: value, kw.META_COLL_ATTR_UNITS: units,
+                  kw.META_COLL_MODIFY_TIME: mtime}
+                 for coll_id, meta_id, name, value, units, mtime in self.coll_avus]
+        return rows
+
+
+def _session(mock_session):
+    catalog = Catalog()
+    return mock_session(catalog.rows), catalog
+
+
+def _paths(results):
+    return sorted(res.path for res in results)
+
+
+def test_search(mock_session):
+    session, _ = _session(mock_session)
+    index = MetadataIndex(session, ROOT)
+    # 2 collections, 2 data objects and 4 AVU links; the sibling collection is not indexed.
+    assert index.refresh() == 8
+    assert _paths(index.search_iter(key_vals={"experiment": "2024-%"})) == [
+        ROOT + "/a.csv", ROOT + "/raw"]
+    assert _paths(index.search_iter(key_vals={"experiment": "", "instrument": ""})) == []
+    assert _paths(index.search_iter(key_vals={"experiment": "", "Instrument": "x%"})) == [
+        ROOT + "/raw/b.csv"]
+    assert _paths(index.search_iter(checksum="sha2:b%")) == [ROOT + "/raw/b.csv"]
+    assert _paths(index.search_iter(path=ROOT + "/%")) == [ROOT + "/raw", ROOT + "/raw/b.csv"]
+    assert len(list(index.search_iter(path="%", limit=2, offset=1))) == 2
+    assert index.search(path=ROOT + "/raw") == [
+        {"COLL_NAME": ROOT + "/raw"}, {"DATA_NAME": "b.csv"}, {"D_DATA_CHECKSUM": "sha2:bbb"},
+        {"COLL_NAME": ROOT + "/raw"}]
+    with raises(ValueError):
+        index.search()
+
+
+def test_search_ranges_and_order(mock_session):
+    index = MetadataIndex(_session(mock_session)[0], ROOT)
+    assert [res.size for res in index.search_iter(path="%", order_by="size", descending=True)] \
+        == [20, 10]
+    assert [res.name for res in index.search_iter(min_size=15)] == ["b.csv"]
+    assert list(index.search_iter(modified_after=datetime(2024, 1, 2))) == []
+    results = list(index.search_iter(modified_before=datetime(2024, 1, 2), order_by="name"))
+    assert [res.name for res in results] == ["a.csv", "b.csv"]
+    assert results[0].modify_time == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_incremental_refresh(mock_session):
+    session, catalog = _session(mock_session)
+    index = MetadataIndex(session, ROOT, max_age=3600)
+    index.search(path="%")
+    n_queries = session.irods_session.n_queries
+    # The index is fresh enough, so the catalog is not queried.
+    index.search(path="%")
+    assert session.irods_session.n_queries == n_queries
+    # Without changes a refresh only asks for changes and counts, 2 queries per table.
+    assert index.refresh() == 0
+    assert session.irods_session.n_queries == n_queries + 8
+    assert all(len(query.get_results()) <= 1 for query in session.irods_session.queries[-8:])
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    catalog.data_objs[10] = (1, "a.csv", "sha2:new", 11, now)
+    del catalog.data_objs[11]
+    catalog.data_avus = [avu for avu in catalog.data_avus if avu[0] != 11]
+    catalog.data_avus.append((10, 104, "status", "done", None, now))
+    catalog.coll_avus = []
+    # a.csv changed, b.csv and its 2 AVUs removed, 1 AVU added and 1 collection AVU removed.
+    assert index.refresh() == 6
+    assert index.search(checksum="sha2:new") == [
+        {"COLL_NAME": ROOT}, {"DATA_NAME": "a.csv"}, {"D_DATA_CHECKSUM": "sha2:new"}]
+    assert _paths(index.search_iter(key_vals={"experiment": "%"})) == [ROOT + "/a.csv"]
+    assert _paths(index.search_iter(key_vals={"status": "done"})) == [ROOT + "/a.csv"]
+
+    # A new data object with an existing AVU, whose modification time does not change.
+    catalog.data_objs[13] = (2, "d.csv", "sha2:ddd", 40, now)
+    catalog.data_avus.append((13, 100, "experiment", "2024-A", None, OLD))
+    assert index.refresh() == 2
+    assert _paths(index.search_iter(key_vals={"experiment": "2024-A"})) == [
+        ROOT + "/a.csv", ROOT + "/raw/d.csv"]
+    assert index.refresh(full=True) == 0
+
+
+def test_persistent(mock_session, tmp_path):
+    session, _ = _session(mock_session)
+    db_path = tmp_path / "index.sqlite"
+    with MetadataIndex(session, ROOT, db_path) as index:
+        index.refresh()
+    with MetadataIndex(session, ROOT, db_path) as index:
+        assert index.age < 60
+        assert index.refresh() == 0
+    with raises(ValueError):
+        MetadataIndex(session, ROOT + "/raw", db_path)
@@ -0,0 +1,76 @@
+from pytest import raises
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import _remote_dataobjects
+from ibridges.irodsconnector.query import AnyOf, IrodsQuery, tree_condition
+from ibridges.utils.path import IrodsPath
+
+
+def _rows(n_rows=10):
+    return [{kw.COLL_NAME: "/zone/coll", kw.DATA_NAME: f"obj_{i}", kw.DATA_SIZE: i}
+            for i in range(n_rows)]
+
+
+def test_build(mock_session):
+    session = mock_session(_rows())
+    query = IrodsQuery(session, kw.COLL_NAME, kw.DATA_NAME)
+    filtered = query.filter(kw.LIKE(kw.COLL_NAME, "/zone/%"))
+    assert query.conditions == ()
+    ordered = filtered.order_by(kw.DATA_SIZE, descending=True).sum(kw.DATA_SIZE).limit(5)
+    assert ordered.explain() == ("SELECT COLL_NAME, DATA_NAME, SUM(DATA_SIZE) "
+                                 "WHERE COLL_NAME like '/zone/%' "
+                                 "ORDER BY DATA_SIZE DESC LIMIT 5")
+    assert len(ordered.all()) == 5
+    assert session.irods_session.queries[-1].calls == [
+        ("filter", kw.COLL_NAME, "like", "'/zone/%'"), ("sum", kw.DATA_SIZE),
+        ("order_by", kw.DATA_SIZE, "desc"), ("limit", 5)]
+    with raises(ValueError):
+        IrodsQuery(session)
+    with raises(ValueError):
+        query.aggregate("median", kw.DATA_SIZE)
+    with raises(ValueError):
+        query.page_size(501)
+
+
+def test_any_of():
+    condition = AnyOf(kw.LIKE(kw.DATA_NAME, "%.csv"), kw.DATA_NAME == "table.txt")
+    assert condition.op == "like"
+    assert condition.value == "'%.csv' || = 'table.txt'"
+    with raises(ValueError):
+        AnyOf(kw.DATA_NAME == "a", kw.COLL_NAME == "b")
+
+
+def test_paging_and_hook(mock_session):
+    session = mock_session(_rows())
+    stats = []
+    session.query_hook = stats.append
+    query = IrodsQuery(session, kw.DATA_NAME).page_size(3)
+    assert [len(rows) for rows in query.batches()] == [3, 3, 3, 1]
+    assert stats[-1].n_rows == 10 and stats[-1].n_pages == 4
+    assert stats[-1].explain == "SELECT DATA_NAME"
+
+    # The limit is reached halfway a page, the query is closed on the server.
+    assert [row[kw.DATA_NAME] for row in query.limit(4)] == ["obj_0", "obj_1", "obj_2", "obj_3"]
+    assert session.irods_session.n_closed == 1
+    assert stats[-1].n_rows == 4 and stats[-1].n_pages == 2
+
+    # Stopping early also closes the query.
+    for _ in query:
+        break
+    assert session.irods_session.n_closed == 2
+    assert stats[-1].n_rows == 3
+
+    assert query.first() == {kw.DATA_NAME: "obj_0"}
+    assert session.irods_session.queries[-1].calls == [("limit", 1)]
+    assert IrodsQuery(mock_session([]), kw.DATA_NAME).first() is None
+
+
+def test_tree_condition(mock_session):
+    session = mock_session([{kw.COLL_NAME: coll, kw.DATA_NAME: "x.txt"}
+                            for coll in ["/zone/run1", "/zone/run1/sub", "/zone/run10"]])
+    condition = tree_condition("/zone/run1")
+    assert condition.value == "'/zone/run1' || like '/zone/run1/%'"
+    assert _remote_dataobjects(session, IrodsPath(session, "/zone/run1")) == {
+        "/zone/run1/x.txt", "/zone/run1/sub/x.txt"}
+    # The sibling run10 is excluded by the server.
+    assert len(session.irods_session.queries[-1].get_results()) == 2
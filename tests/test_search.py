@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+from pytest import raises
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.search import SearchResult, search, search_iter
+
+
+MTIME = datetime(2024, 1, 1)
+
+
+def _rows(n_objs=5, n_colls=3):
+    rows = [{kw.COLL_NAME: "/zone/coll", kw.DATA_NAME: f"obj_{i:02}",
+             kw.DATA_CHECKSUM: f"sum_{i}", kw.DATA_SIZE: i,
+             kw.DATA_MODIFY_TIME: MTIME + timedelta(hours=i)} for i in range(n_objs)]
+    return rows + [{kw.COLL_NAME: f"/zone/coll_{i}"} for i in range(n_colls)]
+
+
+def test_search_iter(mock_session):
+    session = mock_session(_rows(), page_size=2)
+    results = list(search_iter(session, path="/zone/%"))
+    # 5 data objects and 4 collections, including the collection of the data objects.
+    assert len(results) == 9
+    # The size and modification time are only selected to filter or order on them.
+    assert results[0] == SearchResult("/zone/coll", "obj_00", "sum_0")
+    assert results[0].path == "/zone/coll/obj_00"
+    assert results[-1] == SearchResult("/zone/coll_2")
+    assert results[-1].path == "/zone/coll_2"
+    assert [res.name for res in search_iter(session, path="/zone/%", checksum="sum%")] == \
+        [f"obj_{i:02}" for i in range(5)]
+    # The path and checksum are filtered by the server.
+    assert [res.path for res in search_iter(session, path="/zone/coll_1")] == ["/zone/coll_1"]
+    assert [res.name for res in search_iter(session, path="/zone/%", checksum="sum_3")] == \
+        ["obj_03"]
+    assert list(search_iter(session, path="/other/%")) == []
+    with raises(ValueError):
+        next(search_iter(session))
+
+
+def test_search_iter_limit_offset(mock_session):
+    session = mock_session(_rows(n_objs=100), page_size=2)
+    catalog = session.irods_session
+    results = list(search_iter(session, path="/zone/%", limit=3, offset=2))
+    assert [res.name for res in results] == ["obj_02", "obj_03", "obj_04"]
+    # A page of offset + limit rows, the rest is not fetched and the query is closed.
+    assert catalog.n_pages == 1
+    assert catalog.n_closed == 1
+    results = list(search_iter(session, path="/zone/%", limit=5, offset=98))
+    assert [res.path for res in results] == ["/zone/coll/obj_98", "/zone/coll/obj_99",
+                                             "/zone/coll", "/zone/coll_0", "/zone/coll_1"]
+
+
+def test_search_iter_replicas(mock_session):
+    rows = _rows(n_objs=3, n_colls=0)
+    # Replicas with another checksum, size or modification time are separate rows.
+    replicas = [{**rows[i], kw.DATA_CHECKSUM: "stale", kw.DATA_SIZE: size}
+                for i, size in [(2, 100), (0, 50)]]
+    session = mock_session(replicas + rows, page_size=2)
+    assert [res.path for res in search_iter(session, path="/zone/coll")] == [
+        "/zone/coll/obj_00", "/zone/coll/obj_01", "/zone/coll/obj_02", "/zone/coll"]
+    assert [res.name for res in search_iter(session, path="/zone/coll", limit=2, offset=1)] == [
+        "obj_01", "obj_02"]
+    # The server does not have to sort the rows before the first page.
+    query = session.irods_session.queries[0]
+    assert not any(call[0] == "order_by" for call in query.calls)
+    assert not any(col is kw.DATA_SIZE for col in query.columns)
+
+    # Ordered on size, the replicas of a data object are not adjacent.
+    largest = search_iter(session, path="/zone/coll", order_by="size", descending=True)
+    assert [(res.name, res.size) for res in largest] == [
+        ("obj_02", 100), ("obj_00", 50), ("obj_01", 1)]
+    assert [res.name for res in search_iter(session, min_size=0)] == [
+        "obj_00", "obj_01", "obj_02"]
+
+
+def test_search_legacy_format(mock_session):
+    session = mock_session(_rows(n_objs=1, n_colls=1))
+    assert search(session, path="/zone/%") == [
+        {"COLL_NAME": "/zone/coll"}, {"DATA_NAME": "obj_00"}, {"D_DATA_CHECKSUM": "sum_0"},
+        {"COLL_NAME": "/zone/coll"}, {"COLL_NAME": "/zone/coll_0"}]
+
+
+def test_search_ranges_and_order(mock_session):
+    session = mock_session(_rows(n_objs=100), page_size=2)
+    catalog = session.irods_session
+    largest = list(search_iter(session, path="/zone/%", order_by="size", descending=True,
+                               limit=3))
+    assert [res.size for res in largest] == [99, 98, 97]
+    # A single page of 3 rows, after which the query is closed.
+    assert catalog.n_pages == 1 and catalog.n_closed == 1
+
+    results = list(search_iter(session, path="/zone/%", min_size=10, max_size=19))
+    assert [res.size for res in results] == list(range(10, 20))
+    recent = list(search_iter(session, modified_after=MTIME + timedelta(hours=98)))
+    assert [res.name for res in recent] == ["obj_98", "obj_99"]
+    assert recent[0].modify_time == (MTIME + timedelta(hours=98)).replace(tzinfo=timezone.utc)
+    old = search(session, modified_before=MTIME + timedelta(hours=1))
+    assert old == [{"COLL_NAME": "/zone/coll"}, {"DATA_NAME": "obj_00"},
+                   {"D_DATA_CHECKSUM": "sum_0"}]
+    with raises(ValueError):
+        next(search_iter(session, path="/zone/%", order_by="owner"))
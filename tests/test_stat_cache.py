@@ -0,0 +1,78 @@
+import time
+from types import SimpleNamespace
+
+from ibridges import IrodsPath
+from ibridges.irodsconnector.stat_cache import COLLECTION, DATAOBJECT, StatCache
+
+
+class CountingExists:
+    def __init__(self, paths):
+        self.paths = paths
+        self.n_calls = 0
+
+    def exists(self, path):
+        self.n_calls += 1
+        return path in self.paths
+
+
+class MockSession:
+    home = "/testzone/home/testuser"
+
+    def __init__(self, colls, data_objs, ttl=60):
+        self.irods_session = SimpleNamespace(collections=CountingExists(colls),
+                                             data_objects=CountingExists(data_objs))
+        self.stat_cache = StatCache(ttl)
+
+
+def test_stat_cache():
+    cache = StatCache(ttl=60)
+    assert cache.get("/zone/a", COLLECTION) is None
+    cache.put("/zone/a", COLLECTION, True)
+    assert cache.get("/zone/a", COLLECTION)
+    assert cache.get("/zone/a", DATAOBJECT) is False
+    cache.put("/zone/a/b/c", DATAOBJECT, False)
+    cache.put("/zone/other", COLLECTION, False)
+    cache.invalidate("/zone/a/b")
+    # Parents and children are forgotten, siblings are kept.
+    assert cache.get("/zone/a", COLLECTION) is None
+    assert cache.get("/zone/a/b/c", DATAOBJECT) is None
+    assert cache.get("/zone/other", COLLECTION) is False
+    assert (cache.hits, cache.misses) == (3, 3)
+    assert cache.round_trips_saved == 3
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_stat_cache_invalidate_tree():
+    cache = StatCache(ttl=60)
+    # Only the leaves are cached, not the collections between them.
+    for i in range(100):
+        cache.put(f"/zone/home/run{i}/sub/obj", DATAOBJECT, True)
+    cache.put("/zone/home", COLLECTION, True)
+    cache.invalidate("/zone/home/run1")
+    assert cache.get("/zone/home/run1/sub/obj", DATAOBJECT) is None
+    assert cache.get("/zone/home", COLLECTION) is None
+    assert cache.get("/zone/home/run10/sub/obj", DATAOBJECT)
+    assert len(cache) == 2 * 99
+    cache.invalidate("/zone/home/run10/sub/obj")
+    assert cache.get("/zone/home/run10/sub/obj", DATAOBJECT) is None
+    cache.invalidate("/zone")
+    assert len(cache) == 0
+
+
+def test_stat_cache_ttl():
+    cache = StatCache(ttl=0.01)
+    cache.put("/zone/a", COLLECTION, True)
+    time.sleep(0.02)
+    assert cache.get("/zone/a", COLLECTION) is None
+
+
+def test_irodspath_stat_cache():
+    session = MockSession(["/zone/coll"], ["/zone/coll/obj"])
+    for _ in range(3):
+        assert IrodsPath(session, "/zone/coll").collection_exists()
+        assert not IrodsPath(session, "/zone/coll").dataobject_exists()
+        assert IrodsPath(session, "/zone/coll/obj").exists()
+    assert session.irods_session.collections.n_calls == 1
+    assert session.irods_session.data_objects.n_calls == 1
+    assert session.stat_cache.hits == 7
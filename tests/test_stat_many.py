@@ -0,0 +1,79 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from pytest import warns
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.data_operations import (
+    exists_many,
+    plan_upload,
+    stat_many,
+    upload,
+)
+from ibridges.irodsconnector.stat_cache import StatCache
+from ibridges.utils.path import IrodsPath
+
+MTIME = datetime(2024, 1, 1)
+
+
+def _rows(colls, data_objs):
+    rows = [{kw.COLL_NAME: coll, kw.COLL_MODIFY_TIME: MTIME} for coll in colls]
+    # Two replicas of every data object.
+    rows += [{kw.COLL_NAME: coll, kw.DATA_NAME: name, kw.DATA_SIZE: str(size),
+              kw.DATA_CHECKSUM: checksum, kw.DATA_MODIFY_TIME: MTIME, kw.DATA_REPL_NUM: repl}
+             for coll, name, size, checksum in data_objs for repl in range(2)]
+    return rows
+
+
+def test_stat_many(mock_session):
+    session = mock_session(_rows(["/zone/home/user", "/zone/home/user/a", "/zone/home/user/b"],
+                                 [("/zone/home/user/a", "x.txt", 10, "sha2:abc"),
+                                  ("/zone/home/user/b", "x.txt", 20, ""),
+                                  ("/zone/home/user/b", "y.txt", 30, None)]))
+    session.stat_cache = StatCache()
+    catalog = session.irods_session
+    paths = ["a", "a/x.txt", "b/x.txt", IrodsPath(session, "b", "y.txt"), "a/y.txt",
+             "/zone/missing/x.txt", "a"]
+    stats = stat_many(session, paths)
+    home = "/zone/home/user/"
+    assert list(stats) == [home + "a", home + "a/x.txt", home + "b/x.txt", home + "b/y.txt",
+                           home + "a/y.txt", "/zone/missing/x.txt"]
+    assert stats[home + "a"].type == "collection"
+    assert stats[home + "a/x.txt"][:3] == ("dataobject", 10, "sha2:abc")
+    assert stats[home + "b/x.txt"][:3] == ("dataobject", 20, None)
+    assert stats[home + "b/y.txt"].size == 30
+    assert stats[home + "a/y.txt"] is None
+    assert stats["/zone/missing/x.txt"] is None
+    assert catalog.n_queries == 2
+    # The answers are added to the stat cache of the session.
+    assert IrodsPath(session, "a", "x.txt").dataobject_exists()
+    assert not IrodsPath(session, "a", "y.txt").exists()
+    assert catalog.n_queries == 2
+
+
+def test_exists_many(mock_session):
+    session = mock_session(_rows(["/zone"], [("/zone", "x.txt", 10, None)]))
+    assert exists_many(session, ["/zone", "/zone/x.txt", "/zone/y.txt"]) == {
+        "/zone": True, "/zone/x.txt": True, "/zone/y.txt": False}
+
+
+def test_plan_upload_collections(mock_session, tmp_path):
+    (tmp_path / "data" / "sub").mkdir(parents=True)
+    for name in ["a.txt", "sub/b.txt"]:
+        (tmp_path / "data" / name).write_bytes(b"abc")
+    session = mock_session(_rows(["/zone/home/user", "/zone/home/user/data"],
+                                 [("/zone/home/user/data", "a.txt", 3, None)]))
+    plan = plan_upload(session, tmp_path / "data", "/zone/home/user")
+    # Only the missing collection is created.
+    assert [str(coll) for coll in plan.collections] == ["/zone/home/user/data/sub"]
+    assert [str(dest) for _, dest, _ in plan.new] == ["/zone/home/user/data/sub/b.txt"]
+    assert [str(dest) for _, dest, _ in plan.skip] == ["/zone/home/user/data/a.txt"]
+
+    # The upload also only creates the missing collection.
+    created = []
+    session.irods_session.collections = SimpleNamespace(create=created.append)
+    session.irods_session.data_objects = SimpleNamespace(put=lambda *args, **kwargs: None)
+    with warns(UserWarning, match="already exists"):
+        stats = upload(session, tmp_path / "data", "/zone/home/user")
+    assert created == ["/zone/home/user/data/sub"]
+    assert stats.n_collections == len(plan.collections) == 1
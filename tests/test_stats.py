@@ -0,0 +1,48 @@
+from ibridges.irodsconnector import keywords as kw
+from ibridges.irodsconnector.stats import collection_stats, size_totals
+
+ROOT = "/zone/home/user/project"
+
+
+def _rows(data_objs):
+    # (data id, collection, name, size, replica number)
+    return [{kw.DATA_ID: data_id, kw.COLL_NAME: coll, kw.DATA_NAME: name,
+             kw.DATA_SIZE: size, kw.DATA_REPL_NUM: repl}
+            for data_id, coll, name, size, repl in data_objs]
+
+
+DATA_OBJS = [(1, ROOT, "a.csv", 100, 0),
+             (2, ROOT + "/raw", "b.dat", 5000, 0),
+             (3, ROOT + "/raw", "c.dat", 300, 0),
+             (4, ROOT + "_old", "d.dat", 10**6, 0)]
+
+
+def test_collection_stats(mock_session):
+    session = mock_session(_rows(DATA_OBJS))
+    stats = collection_stats(session, ROOT)
+    assert stats.total_size == 5400
+    assert stats.n_dataobjects == 3
+    assert stats.largest_size == 5000
+    assert stats.largest_path == ROOT + "/raw/b.dat"
+    assert stats.per_collection is None
+    assert session.irods_session.n_queries == 2
+
+    stats = collection_stats(session, ROOT, per_collection=True)
+    assert stats.per_collection == {ROOT: (100, 1), ROOT + "/raw": (5300, 2)}
+    assert stats.total_size == 5400
+
+    empty = collection_stats(mock_session([]), ROOT)
+    assert empty == (0, 0, 0, None, None)
+
+
+def test_replicas(mock_session):
+    # b.dat has a second replica, which should not be counted twice.
+    session = mock_session(_rows(DATA_OBJS + [(2, ROOT + "/raw", "b.dat", 5000, 1)]))
+    assert size_totals(session, ROOT) == {ROOT: (5400, 3)}
+    assert session.irods_session.n_queries == 2
+    assert size_totals(session, ROOT, per_collection=True) == {
+        ROOT: (100, 1), ROOT + "/raw": (5300, 2)}
+
+    # Only a single replica of a.csv is left, but it is not replica 0.
+    session = mock_session(_rows([(1, ROOT, "a.csv", 100, 1)] + DATA_OBJS[1:]))
+    assert size_totals(session, ROOT) == {ROOT: (5400, 3)}
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from pytest import raises
+
+from ibridges.irodsconnector import keywords as kw
+from ibridges.sync import _diff, _local_states, _remote_states, sync
+from ibridges.utils.checksum import local_checksum
+from ibridges.utils.path import IrodsPath
+
+TESTDATA = Path("tests/testdata")
+
+
+def test_local_states():
+    states = _local_states(TESTDATA)
+    assert set(states) == {"bunny.txt", "subfolder/sun.csv"}
+    size, mtime, checksum = states["bunny.txt"]
+    assert size == (TESTDATA / "bunny.txt").stat().st_size
+    assert mtime > 0
+    assert checksum is None
+
+
+def test_local_checksum():
+    data = (TESTDATA / "bunny.txt").read_bytes()
+    md5 = hashlib.md5(data).hexdigest()
+    sha2 = "sha2:" + base64.b64encode(hashlib.sha256(data).digest()).decode()
+    assert local_checksum(TESTDATA / "bunny.txt", "0" * 32) == md5
+    assert local_checksum(TESTDATA / "bunny.txt", "sha2:xxx") == sha2
+
+
+def test_diff():
+    source = {"new": (1, 10.0, None), "size": (2, 10.0, None), "older": (3, 5.0, None),
+              "same": (4, 20.0, None), "changed": (5, 20.0, None)}
+    target = {"size": (3, 10.0, None), "older": (3, 10.0, None),
+              "same": (4, 10.0, None), "changed": (5, 10.0, None), "extra": (1, 1.0, None)}
+    checked = []
+
+    def _same_content(rel_path):
+        checked.append(rel_path)
+        return rel_path == "same"
+
+    assert _diff(source, target, _same_content) == [
+        ("changed", "checksum"), ("new", "new"), ("size", "size")]
+    # Only files with equal sizes and a newer source are checksummed.
+    assert sorted(checked) == ["changed", "same"]
+
+
+def test_remote_states(mock_session):
+    session = mock_session([{kw.COLL_NAME: coll, kw.DATA_NAME: "x.txt", kw.DATA_SIZE: "3",
+                             kw.DATA_MODIFY_TIME: datetime(2024, 1, 1), kw.DATA_CHECKSUM: None}
+                            for coll in ["/zone/run1", "/zone/run1/sub", "/zone/run10"]])
+    assert sorted(_remote_states(session, IrodsPath(session, "/zone/run1"))) == [
+        "sub/x.txt", "x.txt"]
+    # The sibling run10 is excluded by the server.
+    assert len(session.irods_session.queries[-1].get_results()) == 2
+
+
+def test_sync_missing_source(mock_session, tmp_path):
+    session = mock_session([])
+    with raises(FileNotFoundError):
+        sync(session, tmp_path / "missing", "/zone/home/user/proj")
+    # An iRODS source should be an IrodsPath.
+    with raises(FileNotFoundError):
+        sync(session, "/zone/home/user/proj", tmp_path)
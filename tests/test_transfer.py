@@ -0,0 +1,218 @@
+import threading
+from types import SimpleNamespace
+
+import irods.exception
+from pytest import raises, warns
+
+from ibridges.irodsconnector.data_operations import download, upload
+from ibridges.irodsconnector.transfer import (
+    SizeThreadStrategy,
+    StreamBudget,
+    ThreadStrategy,
+    ROUND_TRIPS_PER_COLLECTION,
+    ROUND_TRIPS_PER_GET,
+    ROUND_TRIPS_PER_PUT,
+    TransferHook,
+    TransferPlan,
+    TransferStats,
+    execute_jobs,
+    largest_first,
+    track_transfer,
+)
+
+
+def test_transfer_stats():
+    stats = TransferStats()
+    stats.add_transferred(100)
+    stats.add_transferred(50)
+    stats.add_skipped()
+    stats.stop()
+    assert stats.n_files == 2
+    assert stats.n_bytes == 150
+    assert stats.n_skipped == 1
+    assert stats.throughput >= 0
+    assert "files=2" in repr(stats)
+
+
+def test_execute_jobs_serial():
+    order = []
+    execute_jobs(order.append, [(i,) for i in range(5)])
+    assert order == list(range(5))
+
+
+def test_execute_jobs_parallel():
+    lock = threading.Lock()
+    results = []
+
+    def _job(i):
+        with lock:
+            results.append(i)
+
+    execute_jobs(_job, [(i,) for i in range(50)], n_workers=4)
+    assert sorted(results) == list(range(50))
+
+
+def test_execute_jobs_error():
+    def _job(i):
+        if i == 3:
+            raise KeyError(i)
+
+    with raises(KeyError):
+        execute_jobs(_job, [(i,) for i in range(10)], n_workers=2)
+    with raises(KeyError):
+        execute_jobs(_job, [(i,) for i in range(10)])
+    with raises(ValueError):
+        execute_jobs(_job, [], n_workers=0)
+
+
+def test_stream_budget():
+    budget = StreamBudget(6)
+    assert budget.acquire(4) == 4
+    assert budget.acquire(4) == 2
+    budget.release(4)
+    assert budget.acquire(1) == 1
+    with raises(ValueError):
+        StreamBudget(0)
+
+
+def test_stream_budget_cap():
+    budget = StreamBudget(3)
+    lock = threading.Lock()
+    in_use = [0, 0]
+
+    def _job(_):
+        granted = budget.acquire(2)
+        with lock:
+            in_use[0] += granted
+            in_use[1] = max(in_use)
+        with lock:
+            in_use[0] -= granted
+        budget.release(granted)
+
+    execute_jobs(_job, [(i,) for i in range(100)], n_workers=8)
+    assert in_use[1] <= 3
+
+
+def test_size_thread_strategy():
+    strategy = SizeThreadStrategy(single_stream_size=100, bytes_per_thread=100, max_threads=8)
+    assert strategy.n_threads(1, 16) == 1
+    assert strategy.n_threads(100, 16) == 1
+    assert strategy.n_threads(101, 16) == 2
+    assert strategy.n_threads(550, 16) == 6
+    assert strategy.n_threads(10**6, 16) == 8
+    assert strategy.n_threads(10**6, 3) == 3
+    assert strategy.n_threads(10**6, 0) == 1
+    with raises(TypeError):
+        ThreadStrategy()
+
+
+def test_stream_budget_reserve():
+    class FixedStrategy(ThreadStrategy):
+        def n_threads(self, size, available):
+            return size
+
+    budget = StreamBudget(8)
+    with budget.reserve(5, FixedStrategy()) as n_streams:
+        assert n_streams == 5
+        assert budget.available == 3
+        with budget.reserve(5, FixedStrategy()) as n_more:
+            assert n_more == 3
+    assert budget.available == 8
+
+
+class RecordingHook(TransferHook):
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, source, dest, size):
+        self.events.append(("start", source, size))
+
+    def on_progress(self, source, n_bytes):
+        self.events.append(("progress", source, n_bytes))
+
+    def on_finish(self, source, dest, size):
+        self.events.append(("finish", source, size))
+
+    def on_skip(self, source, dest):
+        self.events.append(("skip", source))
+
+    def on_error(self, source, dest, error):
+        self.events.append(("error", source))
+
+
+def test_track_transfer():
+    stats = TransferStats()
+    stats.total_bytes = 30
+    hook = RecordingHook()
+    with track_transfer(stats, hook, "a", "b", 10):
+        pass
+    with warns(UserWarning):
+        with track_transfer(stats, hook, "c", "d", 10, skip_warning="exists"):
+            raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+    with raises(KeyError):
+        with track_transfer(stats, hook, "e", "f", 10):
+            raise KeyError("e")
+    with raises(irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG):
+        with track_transfer(stats, hook, "g", "h", 10):
+            raise irods.exception.OVERWRITE_WITHOUT_FORCE_FLAG
+    assert hook.events == [("start", "a", 10), ("progress", "a", 10), ("finish", "a", 10),
+                           ("start", "c", 10), ("skip", "c"),
+                           ("start", "e", 10), ("error", "e"),
+                           ("start", "g", 10), ("error", "g")]
+    assert (stats.n_files, stats.n_bytes, stats.n_skipped, stats.n_errors) == (1, 10, 1, 2)
+    assert stats.eta is None or stats.eta >= 0
+
+
+def test_largest_first():
+    jobs = [("a", "x", 1), ("b", "y", 300), ("c", "z", 20)]
+    assert [job[0] for job in largest_first(jobs)] == ["b", "c", "a"]
+
+
+def test_transfer_plan():
+    new = [("a", "x", 10), ("b", "y", 20)]
+    overwrite = [("c", "z", 5)]
+    skip = [("d", "w", 100)]
+    plan = TransferPlan(True, new, overwrite, skip, ["coll"], 1)
+    assert plan.n_files == 3
+    assert plan.total_bytes == 35
+    assert plan.round_trips == 1 + 3*ROUND_TRIPS_PER_PUT + ROUND_TRIPS_PER_COLLECTION
+    assert "skip=1" in repr(plan)
+    plan = TransferPlan(False, new, [], skip, ["folder"], 4)
+    assert plan.total_bytes == 30
+    assert plan.round_trips == 4 + 2*ROUND_TRIPS_PER_GET
+
+
+class SingleDataObject:
+    """Data objects of a catalog with a single data object of 10 bytes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.n_gets = 0
+        self.downloaded = []
+
+    def get(self, path, local_path=None, **_):
+        if path != self.path:
+            raise irods.exception.DataObjectDoesNotExist(path)
+        if local_path is None:
+            self.n_gets += 1
+            return SimpleNamespace(size=10, checksum=None)
+        self.downloaded.append(path)
+        return None
+
+
+def test_single_transfer_errors(mock_session, tmp_path):
+    session = mock_session()
+    session.irods_session.collections = SimpleNamespace(exists=lambda path: False)
+    data_objects = SingleDataObject("/zone/home/user/a.txt")
+    session.irods_session.data_objects = data_objects
+    with raises(ValueError):
+        upload(session, tmp_path / "missing.txt", "/zone/home/user")
+    with raises(ValueError):
+        download(session, "/zone/home/user/missing.txt", tmp_path)
+
+    hook = RecordingHook()
+    stats = download(session, "/zone/home/user/a.txt", tmp_path, hook=hook)
+    assert stats.total_bytes == 10
+    # The data object is looked up once, not again before the transfer.
+    assert data_objects.n_gets == 1
+    assert data_objects.downloaded == ["/zone/home/user/a.txt"]